@@ -0,0 +1,534 @@
+# backend/aggregates.py
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from alerts import HIGH_RISK_THRESHOLD, fire_rules
+from metrics import timed
+
+# ------------------------------------------------------------
+# Materialized marketplace aggregates
+#
+# Running sums and counts behind the dashboard endpoints, kept per
+# scope (each marketplace, plus None for "all marketplaces"):
+#   by date, by Product_Category, by seller and by (Product_Category,
+#   date) -> risk sum / count, high-risk count (risk_score >=
+#   HIGH_RISK_THRESHOLD)
+#   plus scope totals and the order-side counts used by the health score.
+# Every key column is turned into integer codes once; each grouping is
+# then a single reduction over (scope, key...) codes covering all
+# scopes at the same time, with np.bincount.
+#
+# Risk sums are exact, so they do not depend on how the rows were
+# split: each score is truncated to a multiple of 2^-52 and split into
+# three 21-bit integer limbs (risk_q), and each limb is summed on its
+# own. Limb sums stay far below 2^53, exact in float64 and in SQLite's
+# TOTAL(), and a mean is a fixed function of the limb sums and the
+# count. New rows are folded in with extend(), which only groups the
+# new rows and adds their limb sums; it renders the same JSON as a full
+# build. stats() renders the same JSON as compute_marketplace_stats, and
+# category_risk() / category_trend() the same as their utils
+# counterparts, which use this code too.
+#
+# Rendered outputs are memoized per instance; the memo is shared by the
+# request threads, so lookups and inserts take a lock (the rendering
+# itself runs outside it).
+# ------------------------------------------------------------
+
+ORDER_COLUMNS = ["seller_id", "marketplace_id", "Returned"]
+PRED_COLUMNS = ["seller_id", "marketplace_id", "Product_Category", "risk_score", "risk_label", "timestamp"]
+
+RISK_LIMBS = ["risk_q2", "risk_q1", "risk_q0"]  # most significant first
+RISK_FRACTION_BITS = 52
+RISK_LIMB_BITS = 21
+RISK_MAX = 2.0 ** (63 - RISK_FRACTION_BITS)  # |risk_score| must stay below
+
+_SUM_COLUMNS = RISK_LIMBS + ["count", "high_count"]
+_LIMB_MASK = (1 << RISK_LIMB_BITS) - 1
+
+
+def risk_limbs(values):
+    """(3, n) integer-valued float64 limbs of float `values`: each value
+    truncated to a multiple of 2^-RISK_FRACTION_BITS as an int64 q, split
+    into q >> 42, (q >> 21) & mask and q & mask. NaN gives zeros."""
+    q = np.trunc(np.asarray(values, dtype=np.float64) * 2.0 ** RISK_FRACTION_BITS)
+    q[np.isnan(q)] = 0.0
+    if len(q) and np.abs(q).max() >= 2.0 ** 63:
+        raise ValueError(f"risk_score must be within (-{RISK_MAX:g}, {RISK_MAX:g})")
+    q = q.astype(np.int64)
+    return np.stack([
+        q >> (2 * RISK_LIMB_BITS),
+        (q >> RISK_LIMB_BITS) & _LIMB_MASK,
+        q & _LIMB_MASK,
+    ]).astype(np.float64)
+
+
+def limb_total(q2, q1, q0):
+    """The risk sum held by limb sums (scalars or arrays)."""
+    high = np.multiply(q2, 2.0 ** (2 * RISK_LIMB_BITS)) + np.multiply(q1, 2.0 ** RISK_LIMB_BITS)
+    return (high + q0) * 2.0 ** -RISK_FRACTION_BITS
+
+
+def limb_means(table):
+    """Mean risk per row of a table with RISK_LIMBS and "count" columns."""
+    total = limb_total(*(table[c].to_numpy(dtype=np.float64) for c in RISK_LIMBS))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return total / table["count"].to_numpy()  # NaN where nothing was scored
+
+
+def _codes(values):
+    """(int64 codes, -1 for missing; labels) with labels in sorted order,
+    so code order is also key order. Datetimes are coded by calendar day
+    and labelled with datetime.date, like .dt.date."""
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.is_monotonic_increasing:
+        return values.cat.codes.to_numpy(dtype=np.int64), np.asarray(values.cat.categories, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        days = values.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        valid = ~np.isnat(days)
+        codes = np.full(len(days), -1, dtype=np.int64)
+        if not valid.any():
+            return codes, np.empty(0, dtype=object)
+        offset = days[valid].view(np.int64)
+        first = offset.min()
+        offset = offset - first
+        present = np.flatnonzero(np.bincount(offset))
+        lookup = np.zeros(present[-1] + 1, dtype=np.int64)
+        lookup[present] = np.arange(len(present))
+        codes[valid] = lookup[offset]
+        labels = (present + first).astype("datetime64[D]")
+        return codes, np.asarray(pd.to_datetime(labels).date, dtype=object)
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), np.asarray(labels, dtype=object)
+
+
+def _groups(scope, n_scopes, keys):
+    """Group ids for rows coded by `scope` and each (codes, labels) in `keys`.
+
+    Returns (rows, group_of_row, group_scope, index): the positions of
+    rows with every key present, their group id, and per group its scope
+    code and key label(s). Groups are ordered by scope, then keys."""
+    combo = scope
+    rows = scope >= 0
+    n_bins = n_scopes
+    for codes, labels in keys:
+        combo = combo * len(labels) + codes
+        rows = rows & (codes >= 0)
+        n_bins *= len(labels)
+    rows = np.flatnonzero(rows)
+    combo = combo[rows]
+
+    if n_bins <= 2 * len(combo) + 1024:
+        present = np.flatnonzero(np.bincount(combo, minlength=n_bins))
+        lookup = np.zeros(n_bins, dtype=np.int64)
+        lookup[present] = np.arange(len(present))
+        group_of_row = lookup[combo]
+    else:
+        present, group_of_row = np.unique(combo, return_inverse=True)
+
+    rest, levels = present, []
+    for codes, labels in reversed(keys):
+        levels.append(labels[rest % len(labels)])
+        rest = rest // len(labels)
+    levels.reverse()
+    index = pd.Index(levels[0], dtype=object) if len(levels) == 1 else pd.MultiIndex.from_arrays(levels)
+    return rows, group_of_row, rest, index
+
+
+def _limb_sums(limbs, group_of_row, n_groups):
+    """(3, n_groups) int64 per-group sums of risk_limbs() columns."""
+    return np.stack([
+        np.bincount(group_of_row, weights=limb, minlength=n_groups) for limb in limbs
+    ]).astype(np.int64)
+
+
+def _grouped_max(values, group_of_row, n_groups):
+    """Per-group max of float `values`, skipping NaN (NaN for none)."""
+    out = np.full(n_groups, np.nan)
+    ok = ~np.isnan(values)
+    np.fmax.at(out, group_of_row[ok], values[ok])
+    return out
+
+
+def _split(frame, group_scope, n_scopes):
+    """{scope code: rows of `frame` in that scope}"""
+    bounds = np.searchsorted(group_scope, np.arange(n_scopes + 1))
+    return {s: frame.iloc[bounds[s]:bounds[s + 1]] for s in range(n_scopes)}
+
+
+def _scope_sums(scope, n_scopes, keys, risk, limbs, high):
+    """{scope code: DataFrame(risk_q2, risk_q1, risk_q0, count, high_count)
+    indexed by key}"""
+    rows, group_of_row, group_scope, index = _groups(scope, n_scopes, keys)
+    n = len(index)
+    sums = _limb_sums(limbs[:, rows], group_of_row, n)
+    table = pd.DataFrame({
+        **dict(zip(RISK_LIMBS, sums)),
+        "count": np.bincount(group_of_row[~np.isnan(risk[rows])], minlength=n).astype(np.int64),
+        "high_count": np.bincount(group_of_row, weights=high[rows], minlength=n).astype(np.int64),
+    }, index=index)
+    return _split(table, group_scope, n_scopes)
+
+
+def _scope_codes(df, by):
+    if by is None:
+        return np.zeros(len(df), dtype=np.int64), np.array([None], dtype=object)
+    return _codes(df[by])
+
+
+# grouping name (ScopeAggregates field) -> prediction columns grouped by
+GROUPINGS = {
+    "daily": ("timestamp",),
+    "category": ("Product_Category",),
+    "seller": ("seller_id",),
+    "category_daily": ("Product_Category", "timestamp"),
+}
+
+
+def _prediction_fields(p, by, groupings=tuple(GROUPINGS)):
+    """ScopeAggregates fields from predictions, for every scope of `p[by]`
+    (or the single scope None when `by` is None): {scope: {field: value}};
+    of the grouped tables only `groupings` are filled in."""
+    scope, labels = _scope_codes(p, by)
+    n = len(labels)
+    risk = p["risk_score"].to_numpy(dtype=np.float64)
+    limbs = risk_limbs(risk)
+    high = risk >= HIGH_RISK_THRESHOLD
+    high_label = (p["risk_label"] == "High").to_numpy()
+
+    rows = np.flatnonzero(scope >= 0)
+    s, r = scope[rows], risk[rows]
+    n_rows = np.bincount(s, minlength=n)
+    risk_q = _limb_sums(limbs[:, rows], s, n)
+    risk_count = np.bincount(s[~np.isnan(r)], minlength=n)
+    high_count = np.bincount(s, weights=high[rows], minlength=n)
+    high_label_count = np.bincount(s, weights=high_label[rows], minlength=n)
+    max_risk = _grouped_max(r, s, n)
+
+    codes, tables = {}, {}
+    for name in groupings:
+        for c in GROUPINGS[name]:
+            if c not in codes:
+                codes[c] = _codes(p[c])
+        tables[name] = _scope_sums(scope, n, [codes[c] for c in GROUPINGS[name]], risk, limbs, high)
+
+    return {
+        labels[i]: {
+            "rows": int(n_rows[i]),
+            "risk_q": tuple(int(q) for q in risk_q[:, i]),
+            "risk_count": int(risk_count[i]),
+            "high_count": int(high_count[i]),
+            "high_label_count": int(high_label_count[i]),
+            "max_risk": float(max_risk[i]),
+            **{name: table[i] for name, table in tables.items()},
+        }
+        for i in range(n) if n_rows[i]
+    }
+
+
+def _order_fields(o, by):
+    """ScopeAggregates fields from orders, like _prediction_fields."""
+    scope, labels = _scope_codes(o, by)
+    n = len(labels)
+    returned = o["Returned"].to_numpy(dtype=np.float64)
+
+    rows = np.flatnonzero(scope >= 0)
+    s, ret = scope[rows], returned[rows]
+    n_orders = np.bincount(s, minlength=n)
+    counted = ~np.isnan(ret)
+    returned_sum = np.bincount(s[counted], weights=ret[counted], minlength=n)
+    returned_count = np.bincount(s[counted], minlength=n)
+
+    seller_rows, group_of_row, group_scope, index = _groups(scope, n, [_codes(o["seller_id"])])
+    seller_orders = _split(
+        pd.Series(np.bincount(group_of_row, minlength=len(index)).astype(np.int64), index=index),
+        group_scope, n,
+    )
+
+    return {
+        labels[i]: {
+            "n_orders": int(n_orders[i]),
+            "returned_sum": float(returned_sum[i]),
+            "returned_count": int(returned_count[i]),
+            "seller_orders": seller_orders[i],
+        }
+        for i in range(n) if n_orders[i]
+    }
+
+
+def _add_sums(a, b):
+    if a.empty:
+        return b.sort_index()
+    if b.empty:
+        return a
+    # exact: every column holds integers far below 2^53
+    return a.add(b, fill_value=0).astype("int64").sort_index()
+
+
+TREND_BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(days, bucket):
+    """First day of the day / week (Monday) / month bucket of datetime64[D] `days`."""
+    if bucket == "day":
+        return days
+    if bucket == "week":
+        n = days.astype(np.int64)
+        return (n - (n + 3) % 7).astype("datetime64[D]")  # 1970-01-01 was a Thursday
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"bucket must be one of {TREND_BUCKETS}")
+
+
+def category_series(cats, days, risk_q, count, top_n=6, bucket="day", top_only=False):
+    """Trend payload from per-(category, day) risk limb sums ((3, n), see
+    risk_limbs) and counts, given as parallel arrays sorted by category,
+    then day:
+    {"series": [{"category", "points": [{"date", "avg_risk"}, ...]}, ...],
+     "top_categories": the top_n categories by mean of their point averages}
+    Days are merged into `bucket`s (averaging over the orders they hold)
+    and series are cut at category boundaries in one pass; with
+    `top_only` only the top_n series are returned."""
+    dates = bucket_start(days, bucket)
+    if bucket != "day":
+        # still sorted, so each (category, bucket) run is contiguous
+        starts = np.flatnonzero(np.r_[True, (cats[1:] != cats[:-1]) | (dates[1:] != dates[:-1])])
+        cats, dates = cats[starts], dates[starts]
+        risk_q = np.add.reduceat(risk_q, starts, axis=1)
+        count = np.add.reduceat(count, starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg = limb_total(*risk_q.astype(np.float64)) / count  # NaN for days without scores
+
+    top_categories = (
+        pd.DataFrame({"Product_Category": cats, "risk_score": avg})
+        .groupby("Product_Category")["risk_score"]
+        .mean()
+        .reset_index()
+        .sort_values("risk_score", ascending=False)
+        .head(top_n)
+        .Product_Category
+        .tolist()
+    )
+
+    starts = np.flatnonzero(np.r_[True, cats[1:] != cats[:-1]])
+    ends = np.r_[starts[1:], len(cats)]
+    date_str = np.datetime_as_string(dates, unit="D").tolist()
+    avg = avg.tolist()
+    keep = set(top_categories) if top_only else None
+    series = [
+        {
+            "category": cats[i],
+            "points": [{"date": d, "avg_risk": r} for d, r in zip(date_str[i:j], avg[i:j])],
+        }
+        for i, j in zip(starts, ends)
+        if keep is None or cats[i] in keep
+    ]
+    return {"series": series, "top_categories": top_categories}
+
+
+class ScopeAggregates:
+    def __init__(self, rows=0, risk_q=(0, 0, 0), risk_count=0, high_count=0, high_label_count=0,
+                 max_risk=math.nan, daily=None, category=None, seller=None, category_daily=None,
+                 n_orders=0, returned_sum=0.0, returned_count=0, seller_orders=None):
+        empty = pd.DataFrame({c: pd.Series(dtype="int64") for c in _SUM_COLUMNS})
+        self.rows = rows
+        self.risk_q = risk_q  # exact limb sums, see risk_limbs()
+        self.risk_count = risk_count
+        self.high_count = high_count
+        self.high_label_count = high_label_count
+        self.max_risk = max_risk
+        self.daily = empty if daily is None else daily
+        self.category = empty if category is None else category
+        self.seller = empty if seller is None else seller
+        self.category_daily = empty if category_daily is None else category_daily
+        self.n_orders = n_orders
+        self.returned_sum = returned_sum
+        self.returned_count = returned_count
+        self.seller_orders = pd.Series(dtype="int64") if seller_orders is None else seller_orders
+
+    @classmethod
+    @timed
+    def from_frames(cls, o, p, groupings=tuple(GROUPINGS)):
+        """Aggregates of one scope: all of `o` (None: no order fields) and
+        `p`, with only the `groupings` tables filled in."""
+        fields = _prediction_fields(p, None, groupings).get(None, {})
+        if o is not None:
+            fields.update(_order_fields(o, None).get(None, {}))
+        return cls(**fields)
+
+    @property
+    def risk_sum(self):
+        return float(limb_total(*self.risk_q))
+
+    def merge(self, other):
+        return ScopeAggregates(
+            rows=self.rows + other.rows,
+            risk_q=tuple(a + b for a, b in zip(self.risk_q, other.risk_q)),
+            risk_count=self.risk_count + other.risk_count,
+            high_count=self.high_count + other.high_count,
+            high_label_count=self.high_label_count + other.high_label_count,
+            max_risk=float(np.fmax(self.max_risk, other.max_risk)),
+            daily=_add_sums(self.daily, other.daily),
+            category=_add_sums(self.category, other.category),
+            seller=_add_sums(self.seller, other.seller),
+            category_daily=_add_sums(self.category_daily, other.category_daily),
+            n_orders=self.n_orders + other.n_orders,
+            returned_sum=self.returned_sum + other.returned_sum,
+            returned_count=self.returned_count + other.returned_count,
+            seller_orders=self.seller_orders.add(other.seller_orders, fill_value=0).astype("int64").sort_index(),
+        )
+
+    # ---------------------------------------------------------
+    # Rendering (mirrors the utils.compute_* functions)
+    # ---------------------------------------------------------
+
+    def health_score(self):
+        if self.rows == 0:
+            return 60  # neutral if no predictions
+
+        avg_risk = self.risk_sum / self.risk_count if self.risk_count else 0
+        high_risk_ratio = self.high_label_count / self.rows
+        return_rate = self.returned_sum / self.returned_count if self.returned_count else 0
+
+        means = pd.Series(limb_means(self.daily))
+        slope = means.iloc[-1] - means.iloc[0] if len(means) >= 2 else 0
+
+        score = (
+            (1 - avg_risk) * 40 +
+            (1 - high_risk_ratio) * 25 +
+            (1 - return_rate) * 20 +
+            (1 - slope) * 15
+        )
+        return max(0, min(100, round(score)))
+
+    def alerts(self, rules=None):
+        if self.rows == 0:
+            return []
+        return fire_rules({"seller_id": self.seller, "Product_Category": self.category}, rules)
+
+    @timed
+    def stats(self):
+        def means(table, key_name):
+            return pd.DataFrame({
+                key_name: table.index,
+                "risk_score": limb_means(table),
+            })
+
+        if self.rows:
+            trend = means(self.daily, "date").to_dict(orient="records")
+            cat = means(self.category, "Product_Category").to_dict(orient="records")
+            top = (
+                means(self.seller, "seller_id")
+                .sort_values("risk_score", ascending=False)
+                .to_dict(orient="records")
+            )
+            high_risk_ratio = self.high_count / self.rows
+            max_risk = self.max_risk
+        else:
+            trend, cat, top = [], [], []
+            high_risk_ratio = 0.0
+            max_risk = 0.0
+
+        return {
+            "total_orders": int(self.n_orders),
+            "total_sellers": int((self.seller_orders > 0).sum()),
+            "trend": trend,
+            "category_risk": cat,
+            "top_risky_sellers": top,
+            "health_score": self.health_score(),
+            "alerts": self.alerts(),
+            "high_risk_orders": int(self.high_count),
+            "high_risk_ratio": round(high_risk_ratio, 3),
+            "max_risk": None if math.isnan(max_risk) else round(max_risk, 3),
+        }
+
+    def category_risk(self):
+        """Same output as utils.compute_category_risk."""
+        if self.rows == 0:
+            return []
+        return (
+            pd.DataFrame({
+                "Product_Category": self.category.index,
+                "avg_risk": limb_means(self.category),
+            })
+            .sort_values("avg_risk", ascending=False)
+            .to_dict(orient="records")
+        )
+
+    def category_trend(self, top_n=6, bucket="day", top_only=False):
+        """Same output as utils.compute_category_trend."""
+        if self.rows == 0:
+            return []
+        t = self.category_daily
+        t = t[t.index.get_level_values(0) != ""] if len(t) else t
+        if t.empty:
+            return []
+        return category_series(
+            t.index.get_level_values(0).to_numpy(dtype=object),
+            np.asarray(t.index.get_level_values(1), dtype="datetime64[D]"),
+            t[RISK_LIMBS].to_numpy().T,
+            t["count"].to_numpy(),
+            top_n=top_n, bucket=bucket, top_only=top_only,
+        )
+
+
+class MarketplaceAggregates:
+    """Aggregates for every marketplace scope, as of `n_orders` order rows
+    and `n_preds` prediction rows. Instances are never modified in place;
+    extend() returns a new one so readers can keep using the old state."""
+
+    def __init__(self, scopes, n_orders, n_preds, source=None):
+        self._scopes = scopes
+        self._rendered = {}
+        self._rendered_lock = threading.Lock()
+        self.n_orders = n_orders
+        self.n_preds = n_preds
+        # where the aggregated rows came from, per table (see storage attrs)
+        self.source = source or {}
+
+    @staticmethod
+    def _scope_deltas(o, p):
+        deltas = {}
+        for by in (None, "marketplace_id"):
+            p_fields = _prediction_fields(p, by)
+            o_fields = _order_fields(o, by)
+            for m in set(p_fields) | set(o_fields) | ({None} if by is None else set()):
+                deltas[m] = ScopeAggregates(**p_fields.get(m, {}), **o_fields.get(m, {}))
+        return deltas
+
+    @classmethod
+    @timed
+    def build(cls, orders_df, preds_df, source=None):
+        return cls(cls._scope_deltas(orders_df, preds_df), len(orders_df), len(preds_df), source)
+
+    @timed
+    def extend(self, new_orders, new_preds, source=None):
+        """Fold in rows appended after the ones already aggregated;
+        costs O(new rows) plus O(groups) for each touched scope."""
+        scopes = dict(self._scopes)
+        for m, delta in self._scope_deltas(new_orders, new_preds).items():
+            scopes[m] = scopes[m].merge(delta) if m in scopes else delta
+        return MarketplaceAggregates(
+            scopes, self.n_orders + len(new_orders), self.n_preds + len(new_preds), source
+        )
+
+    def _render(self, name, marketplace_id, *args):
+        key = (name, marketplace_id or None) + args
+        with self._rendered_lock:
+            if key in self._rendered:
+                return self._rendered[key]
+        scope = self._scopes.get(marketplace_id or None, ScopeAggregates())
+        value = getattr(scope, name)(*args)
+        with self._rendered_lock:
+            # another thread may have rendered it meanwhile; keep the first
+            return self._rendered.setdefault(key, value)
+
+    def stats(self, marketplace_id=None):
+        return self._render("stats", marketplace_id)
+
+    def category_risk(self, marketplace_id=None):
+        return self._render("category_risk", marketplace_id)
+
+    def category_trend(self, marketplace_id=None, top_n=6, bucket="day", top_only=False):
+        return self._render("category_trend", marketplace_id, top_n, bucket, top_only)
@@ -0,0 +1,123 @@
+# backend/alerts.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------
+# Rule-based risk alerts
+#
+# A rule fires for every seller / category whose high-risk order count
+# (risk_score >= HIGH_RISK_THRESHOLD) and high-risk ratio pass its
+# minimums. Counts for all rules come from one grouped boolean-column
+# sum per grouping; messages are formatted only for rows that fire.
+#
+# Rule keys:
+#   type            alert "type" in the output
+#   group_by        "seller_id" or "Product_Category"
+#   min_high_count  minimum high-risk orders (default 0)
+#   min_ratio       minimum high-risk share of scored orders (default 0)
+#   min_total       minimum scored orders (default 1)
+#   message         str.format template; fields: key, high_count,
+#                   total, ratio, ratio_pct
+# Set ALERT_RULES_FILE to a JSON list of rules to replace the defaults.
+# ------------------------------------------------------------
+
+HIGH_RISK_THRESHOLD = 0.75
+GROUP_COLUMNS = ("seller_id", "Product_Category")
+
+DEFAULT_ALERT_RULES = [
+    {
+        "type": "seller",
+        "group_by": "seller_id",
+        "min_high_count": 10,
+        "min_ratio": 0.25,
+        "message": "Seller {key} has {high_count} high-risk orders ({ratio_pct:.1f}%)",
+    },
+    {
+        "type": "category",
+        "group_by": "Product_Category",
+        "min_ratio": 0.3,
+        "message": "{key} category has {ratio_pct:.1f}% high-risk orders",
+    },
+]
+
+
+def validate_rules(rules):
+    for rule in rules:
+        missing = [k for k in ("type", "group_by", "message") if k not in rule]
+        if missing:
+            raise ValueError(f"alert rule {rule!r} is missing {missing}")
+        if rule["group_by"] not in GROUP_COLUMNS:
+            raise ValueError(f"alert rule group_by must be one of {GROUP_COLUMNS}, got {rule['group_by']!r}")
+    return rules
+
+
+def load_alert_rules(path=None):
+    path = path or os.environ.get("ALERT_RULES_FILE")
+    if not path:
+        return DEFAULT_ALERT_RULES
+    with open(path) as fh:
+        return validate_rules(json.load(fh))
+
+
+ALERT_RULES = load_alert_rules()
+
+
+def group_high_risk_counts(p, group_by):
+    """Per-group high_count / count of scored orders, without per-group lambdas."""
+    df = pd.DataFrame({
+        "key": p[group_by],
+        "high": (p["risk_score"] >= HIGH_RISK_THRESHOLD).to_numpy(),
+        "risk_score": p["risk_score"],
+    })
+    out = df.groupby("key", observed=True).agg(
+        high_count=("high", "sum"),
+        count=("risk_score", "count"),
+    )
+    out["high_count"] = out["high_count"].astype("int64")
+    return out
+
+
+def fire_rules(counts_by_group, rules=None):
+    """Alerts for `rules` given {group_by: DataFrame(high_count, count)}."""
+    alerts = []
+    for rule in ALERT_RULES if rules is None else rules:
+        counts = counts_by_group.get(rule["group_by"])
+        if counts is None or counts.empty:
+            continue
+
+        high = counts["high_count"].to_numpy()
+        total = counts["count"].to_numpy()
+        scored = total > 0
+        ratio = np.divide(high, total, out=np.zeros(len(total)), where=scored)
+        fired = (
+            scored
+            & (total >= rule.get("min_total", 1))
+            & (high >= rule.get("min_high_count", 0))
+            & (ratio >= rule.get("min_ratio", 0))
+        )
+
+        template = rule["message"]
+        for i in np.flatnonzero(fired):
+            alerts.append({
+                "type": rule["type"],
+                "message": template.format(
+                    key=counts.index[i],
+                    high_count=int(high[i]),
+                    total=int(total[i]),
+                    ratio=ratio[i],
+                    ratio_pct=ratio[i] * 100,
+                ),
+            })
+    return alerts
+
+
+def evaluate_alerts(p, rules=None):
+    """Alerts for a predictions frame."""
+    rules = ALERT_RULES if rules is None else rules
+    if p.empty:
+        return []
+    counts = {g: group_high_risk_counts(p, g) for g in {r["group_by"] for r in rules}}
+    return fire_rules(counts, rules)
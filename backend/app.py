@@ -1,44 +1,254 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import cProfile
+import hashlib
+import io
+import json
 import os
-import pandas as pd
-
+import pstats
+
+from cache import dataset_cache
+from batching import InferenceBatcher
+from ingest import BackgroundCompactor, prediction_log
+from responses import (
+    COMPRESS_MIN_BYTES,
+    RESPONSE_FORMATS,
+    accepted_encoding,
+    compress,
+    compress_stream,
+    dumps,
+    frame_columns,
+    orjson,
+)
+from metrics import (
+    end_trace,
+    family_series,
+    prometheus_counter,
+    prometheus_histogram,
+    request_durations,
+    stage,
+    stage_durations,
+    start_trace,
+)
+from scoring import ModelCache, order_error, score_orders
+from sqlstore import ANALYTICS_BACKEND
 from utils import (
     load_sellers,
     load_orders,
     load_batch_predictions,
-    compute_marketplace_stats,
-    compute_category_risk,
     compute_seller_trend,
-    compute_category_trend,
+    load_marketplace_aggregates,
+    load_seller_features,
+    load_sqlite_store,
+    dataset_version,
     load_model_stats,
     get_seller_marketplace,
-    explain_seller_risk,
+    iter_json_records,
+    order_frame,
+    order_records,
+    load_newest_first,
+    orders_newest_first,
+    select_partition,
+    select_window,
+    parse_time_window,
+    compute_marketplace_stats,
+    compute_category_trend,
+    to_records,
 )
+from aggregates import ORDER_COLUMNS as STATS_ORDER_COLS, PRED_COLUMNS as STATS_PRED_COLS, TREND_BUCKETS
+from storage import ORDERS_SCHEMA
+
+
+class ResponseJSONProvider(DefaultJSONProvider):
+    """jsonify through orjson when installed (see responses.py), recorded
+    as the "jsonify" stage of the request."""
+
+    def dumps(self, obj, **kwargs):
+        with stage("jsonify"):
+            if orjson is not None and not kwargs:
+                return dumps(obj).decode()
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        with stage("jsonify"):
+            body = dumps(obj, indent=indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 
 app = Flask(__name__)
-CORS(app)
+app.json = ResponseJSONProvider(app)
+CORS(app, expose_headers=["X-Next-Cursor", "ETag"])
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 
+model_cache = ModelCache(MODELS_DIR)
+batcher = InferenceBatcher(model_cache)
+log_compactor = BackgroundCompactor(prediction_log(DATA_DIR))
+
+# ?profile=1 (stage timings) / ?profile=cprofile on any route; set
+# PROFILE_REQUESTS=0 to ignore the parameter
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "1") == "1"
+PROFILE_MODES = ("1", "cprofile")
+CPROFILE_LINES = 40
+
+# Column projections: each endpoint reads only what it uses
+CATEGORY_PRED_COLS = ["marketplace_id", "Product_Category", "risk_score", "timestamp"]
+TREND_PRED_COLS = ["seller_id", "risk_score", "risk_label", "timestamp"]
+
+
+def analytics_store():
+    """The SqliteStore when ANALYTICS_BACKEND=sqlite (see sqlstore.py),
+    None when aggregations run in pandas."""
+    if ANALYTICS_BACKEND == "sqlite":
+        return load_sqlite_store(DATA_DIR)
+    return None
+
+
+@app.before_request
+def start_background_work():
+    log_compactor.ensure_running()
+
+
+# ------------------------------------------------------------
+# Response compression
+#
+# Registered before the tracing hooks so that it runs after them, on
+# the final response (after_request hooks run in reverse order).
+# ------------------------------------------------------------
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+@app.after_request
+def compress_response(resp):
+    if (resp.status_code < 200 or resp.status_code in (204, 304) or resp.direct_passthrough
+            or "Content-Encoding" in resp.headers or not (resp.mimetype or "").startswith(COMPRESSIBLE_TYPES)):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = accepted_encoding(request.accept_encodings)
+    if encoding is None:
+        return resp
+    if resp.is_streamed:
+        resp.response = compress_stream(resp.response, encoding)
+    else:
+        data = resp.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return resp
+        with stage("compress"):
+            resp.set_data(compress(data, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+
+# ------------------------------------------------------------
+# Request timing and profiling
+#
+# Every request is traced (see metrics.py): the loaders, aggregations
+# and serialization it runs are recorded per route and stage, and its
+# total time once the response has been sent, streamed bodies included.
+# /metrics exports the histograms in the Prometheus text format (per
+# worker process). ?profile=1 replaces the response with the stage
+# breakdown of this request; ?profile=cprofile with a cProfile summary.
+# ------------------------------------------------------------
+
+@app.before_request
+def start_request_trace():
+    mode = request.args.get("profile") if PROFILE_REQUESTS else None
+    g.profile = mode if mode in PROFILE_MODES else None
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.trace = start_trace(route, keep_stages=g.profile == "1", record=g.profile is None)
+    if g.profile == "cprofile":
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def finish_request_trace(resp):
+    trace = g.get("trace")
+    if trace is None:
+        return resp
+    if g.profile:
+        resp = profile_report(trace, resp)
+    status = resp.status_code
+    resp.call_on_close(lambda: end_trace(trace, status))
+    return resp
+
+
+def profile_report(trace, resp):
+    """The profiling response for `resp`, whose body is produced here
+    (inside the trace) and discarded."""
+    body = resp.get_data()
+    report = {
+        "route": trace.route,
+        "status": resp.status_code,
+        "response_bytes": len(body),
+        "total_ms": round(trace.elapsed_ms(), 3),
+    }
+    if g.profile == "cprofile":
+        g.profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(g.profiler, stream=out).sort_stats("cumulative").print_stats(CPROFILE_LINES)
+        report["cprofile"] = out.getvalue()
+    else:
+        report["stages"] = list(trace.stages)
+    return jsonify(report)
+
+
+@app.route("/metrics")
+def metrics():
+    lines = prometheus_histogram(
+        "returnrisk_request_duration_ms", "Request time until the response was sent, per route and status.",
+        family_series(request_durations),
+    )
+    lines += prometheus_histogram(
+        "returnrisk_stage_duration_ms", "Time spent in each loader, aggregation and serialization stage, per route.",
+        family_series(stage_durations),
+    )
+    lines += prometheus_histogram("returnrisk_predict_batch_size", "Orders per /predict model call.",
+                                  [([], batcher.batch_sizes)])
+    lines += prometheus_histogram("returnrisk_predict_queue_wait_ms", "Time /predict orders waited to be batched.",
+                                  [([], batcher.queue_wait_ms)])
+    cache = dataset_cache.stats()
+    lines += prometheus_counter(
+        "returnrisk_dataset_cache_total", "Dataset cache lookups by outcome.",
+        [([("outcome", k)], cache[k]) for k in ("hits", "misses", "reloads", "updates")],
+    )
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/health")
 def health():
     return jsonify({"status":"ok"})
 
 
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify(dataset_cache.stats())
+
+
+@app.route("/log_stats")
+def log_stats():
+    log = log_compactor.log
+    return jsonify(dict(log_compactor.stats(), segments=len(log.segments()), last_seq=log.last_seq()))
+
+
 @app.route("/marketplace_insights")
 def marketplace_insights():
     marketplace_id = request.args.get("marketplace_id")
     sellers = load_sellers(DATA_DIR)
-    orders = load_orders(DATA_DIR)
+    orders = load_orders(DATA_DIR, columns=["marketplace_id"])
 
     if marketplace_id:
         sellers = sellers[sellers.marketplace_id == marketplace_id]
-        orders = orders[orders.marketplace_id == marketplace_id]
+        orders = select_partition(orders, DATA_DIR, "orders", "marketplace_id", marketplace_id)
 
     return jsonify({
         "total_orders": int(len(orders)),
@@ -48,61 +258,166 @@ def marketplace_insights():
 
 @app.route("/marketplace_stats")
 def marketplace_stats():
+    """
+    Query params:
+      - marketplace_id (optional)
+      - start, end (optional)  -> only orders / predictions in [start, end]
+                                  (ISO dates or datetimes; a date-only end is inclusive)
+    """
     marketplace_id = request.args.get("marketplace_id")
-    orders = load_orders(DATA_DIR)
-    preds = load_batch_predictions(DATA_DIR)
-    stats = compute_marketplace_stats(orders, preds, marketplace_id)
-    return jsonify(stats)
+    try:
+        start, end = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(marketplace_stats_for(marketplace_id, start, end))
+
+
+def marketplace_stats_for(marketplace_id=None, start=None, end=None):
+    store = analytics_store()
+    if store is not None:
+        return store.marketplace_stats(marketplace_id, start, end)
+
+    if start is None and end is None:
+        # stats, category risk and category trend are all served from the
+        # shared materialized aggregates (same output as the utils.compute_* functions)
+        return load_marketplace_aggregates(DATA_DIR).stats(marketplace_id)
+
+    orders = load_orders(DATA_DIR, columns=STATS_ORDER_COLS)
+    preds = load_batch_predictions(DATA_DIR, columns=STATS_PRED_COLS)
+    orders = select_window(orders, DATA_DIR, "orders", "marketplace_id", marketplace_id, start, end)
+    preds = select_window(preds, DATA_DIR, "predictions", "marketplace_id", marketplace_id, start, end)
+    return compute_marketplace_stats(orders, preds)
+
+
+def request_window():
+    """[start, end) int64 ns bounds from the start / end query params."""
+    return parse_time_window(request.args.get("start"), request.args.get("end"))
 
 
 @app.route("/marketplace_category_risk")
 def marketplace_category_risk():
     marketplace_id = request.args.get("marketplace_id")
-    orders = load_orders(DATA_DIR)
-    preds = load_batch_predictions(DATA_DIR)
-    cat = compute_category_risk(orders, preds, marketplace_id)
-    return jsonify(cat)
+    return jsonify(category_risk_rows(marketplace_id))
+
+
+def category_risk_rows(marketplace_id=None):
+    store = analytics_store()
+    if store is not None:
+        return store.category_risk(marketplace_id)
+    return load_marketplace_aggregates(DATA_DIR).category_risk(marketplace_id)
 
 
 @app.route("/sellers")
 def sellers_list():
+    """
+    Query params:
+      - marketplace_id (optional)
+      - format (optional)  -> "json" (default, records) or "columnar" ({column: [values]})
+    """
     marketplace_id = request.args.get("marketplace_id")
+    fmt = request.args.get("format", "json")
+    if fmt not in RESPONSE_FORMATS:
+        return jsonify({"error": "format must be json or columnar"}), 400
+    if fmt == "columnar":
+        return jsonify(frame_columns(sellers_frame(marketplace_id)))
+    return jsonify(list_sellers(marketplace_id))
+
+
+def sellers_frame(marketplace_id=None):
     sellers = load_sellers(DATA_DIR)
 
     if marketplace_id:
         sellers = sellers[sellers.marketplace_id == marketplace_id]
 
-    return jsonify(sellers.fillna("").to_dict(orient="records"))
+    return sellers
+
+
+def list_sellers(marketplace_id=None):
+    return to_records(sellers_frame(marketplace_id))
 
 
 @app.route("/seller_orders")
 def seller_orders():
+    """
+    Query params:
+      - seller_id (optional)
+      - limit (optional)   -> page size; the next page's cursor is sent in X-Next-Cursor
+      - cursor (optional)  -> continue after the last order of a previous page
+      - fields (optional)  -> comma-separated columns to return
+      - format (optional)  -> "json" (default, array), "ndjson" or "columnar"
+                              ({column: [values]} for the page, not streamed)
+    Orders are newest first (order_timestamp, then Order_ID) and the
+    json / ndjson response is streamed, so memory stays flat regardless
+    of seller size.
+    """
     seller_id = request.args.get("seller_id")
-    orders = load_orders(DATA_DIR)
+    fields = request.args.get("fields")
+    fmt = request.args.get("format", "json")
+
+    try:
+        limit = request.args.get("limit", type=int)
+        if limit is not None and limit <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if fmt not in ("json", "ndjson", "columnar"):
+        return jsonify({"error": "format must be json, ndjson or columnar"}), 400
+
+    columns = None
+    if fields:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in ORDERS_SCHEMA]
+        if unknown:
+            return jsonify({"error": "unknown fields", "fields": unknown}), 400
+        columns = list(dict.fromkeys(fields + ["seller_id", "order_timestamp", "Order_ID"]))
+    else:
+        fields = None
 
-    if seller_id:
-        orders = orders[orders.seller_id == seller_id]
+    orders = load_orders(DATA_DIR, columns=columns)
+    orders = select_partition(orders, DATA_DIR, "orders", "seller_id", seller_id)
 
-    # sort but do NOT LIMIT
-    if "order_timestamp" in orders.columns:
-        orders["order_timestamp"] = pd.to_datetime(orders["order_timestamp"], errors="coerce")
-        orders = orders.sort_values("order_timestamp", ascending=False)
-        orders["order_timestamp"] = orders["order_timestamp"].astype(str)
-    else:
-        orders = orders.sort_values("Order_ID", ascending=False)
+    try:
+        positions, next_cursor = orders_newest_first(
+            orders, request.args.get("cursor"), limit, order=load_newest_first(DATA_DIR, seller_id)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify(orders.fillna("").to_dict(orient="records"))
+    if fmt == "columnar":
+        resp = jsonify(frame_columns(order_frame(orders, positions, fields)))
+    else:
+        body = iter_json_records(orders, positions, fields, ndjson=(fmt == "ndjson"))
+        mimetype = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+        resp = Response(stream_with_context(body), mimetype=mimetype)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
 
 @app.route("/seller_trend")
 def seller_trend():
+    """
+    Query params:
+      - seller_id (optional)
+      - start, end (optional)  -> date window, as on /marketplace_stats
+    """
     seller_id = request.args.get("seller_id")
-    preds = load_batch_predictions(DATA_DIR)
+    try:
+        start, end = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(seller_trend_points(seller_id, start, end))
 
-    if seller_id:
-        preds = preds[preds.seller_id == seller_id]
 
-    trend = compute_seller_trend(preds)
-    return jsonify(trend)
+def seller_trend_points(seller_id=None, start=None, end=None):
+    store = analytics_store()
+    if store is not None:
+        return store.seller_trend(seller_id, start, end)
+
+    preds = load_batch_predictions(DATA_DIR, columns=TREND_PRED_COLS)
+
+    preds = select_window(preds, DATA_DIR, "predictions", "seller_id", seller_id, start, end)
+
+    return compute_seller_trend(preds)
 
 
 @app.route("/seller_model_stats")
@@ -112,40 +427,197 @@ def seller_model_stats():
     return jsonify(stats)
 
 
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    Body: one order object, a list of them, or {"orders": [...]}.
+    Each order needs seller_id plus the model FEATURES columns.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and "orders" in payload:
+        payload = payload["orders"]
+
+    single = isinstance(payload, dict)
+    orders = [payload] if single else payload
+    if not isinstance(orders, list) or not all(isinstance(o, dict) for o in orders):
+        return jsonify({"error": "expected an order object or a list of orders"}), 400
+
+    # malformed orders get their error here; the rest are scored
+    results = [order_error(o) for o in orders]
+    valid = [o for o, r in zip(orders, results) if r is None]
+    # coalesce with concurrent requests unless batching is disabled (window 0)
+    if batcher.window > 0:
+        scored = iter(batcher.score(valid))
+    else:
+        scored = iter(score_orders(valid, model_cache))
+    results = [next(scored) if r is None else r for r in results]
+    return jsonify(results[0] if single else results)
+
+
+@app.route("/model_cache_stats")
+def model_cache_stats():
+    return jsonify(model_cache.stats())
+
+
+@app.route("/batching_stats")
+def batching_stats():
+    return jsonify(batcher.stats())
+
+
 @app.route("/marketplace_category_trend")
 def marketplace_category_trend():
     """
     Query params:
       - marketplace_id (optional)
       - category (optional)  -> if present, API will filter to that category's series only
+      - top_n (optional)     -> size of top_categories (default 8)
+      - series (optional)    -> "all" (default) or "top": only the top_n categories' series
+      - bucket (optional)    -> "day" (default), "week" or "month" points
+      - start, end (optional) -> date window, as on /marketplace_stats
     """
     marketplace_id = request.args.get("marketplace_id")
     category = request.args.get("category")
-
-    orders = load_orders(DATA_DIR)
-    preds = load_batch_predictions(DATA_DIR)
-
-    res = compute_category_trend(orders, preds, marketplace_id=marketplace_id, top_n=8)
+    try:
+        options = trend_options(request.args)
+        start, end = request_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(category_trend_series(marketplace_id, category, start=start, end=end, **options))
+
+
+def trend_options(args):
+    """top_n / bucket / top_only for the category trend from query params."""
+    top_n = args.get("top_n", 8, type=int)
+    if top_n is None or top_n <= 0:
+        raise ValueError("top_n must be a positive integer")
+    bucket = args.get("bucket", "day")
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(TREND_BUCKETS)}")
+    series = args.get("series", "all")
+    if series not in ("all", "top"):
+        raise ValueError("series must be all or top")
+    return {"top_n": top_n, "bucket": bucket, "top_only": series == "top"}
+
+
+def category_trend_series(marketplace_id=None, category=None, top_n=8, bucket="day", top_only=False,
+                          start=None, end=None):
+    store = analytics_store()
+    if store is not None:
+        res = store.category_trend(marketplace_id, top_n, bucket, top_only, start, end)
+    elif start is None and end is None:
+        res = load_marketplace_aggregates(DATA_DIR).category_trend(
+            marketplace_id, top_n=top_n, bucket=bucket, top_only=top_only
+        )
+    else:
+        orders = load_orders(DATA_DIR, columns=["marketplace_id"])
+        preds = load_batch_predictions(DATA_DIR, columns=CATEGORY_PRED_COLS)
+        preds = select_window(preds, DATA_DIR, "predictions", "marketplace_id", marketplace_id, start, end)
+        res = compute_category_trend(orders, preds, top_n=top_n, bucket=bucket, top_only=top_only)
 
     # If user requested a single category, return just that one series (if available)
     if category:
+        res = res or {}
         found = [s for s in res.get("series", []) if s["category"] == category]
-        return jsonify({"series": found, "requested_category": category, "top_categories": res.get("top_categories", [])})
+        return {"series": found, "requested_category": category, "top_categories": res.get("top_categories", [])}
+
+    return res
 
-    return jsonify(res)
 
 @app.route("/seller_explanation")
 def seller_explanation():
     seller_id = request.args.get("seller_id")
+    return jsonify(seller_reasons(seller_id))
 
+
+def seller_reasons(seller_id):
     if not seller_id:
-        return jsonify([])
+        return []
+
+    store = analytics_store()
+    if store is not None:
+        return store.seller_explanation(seller_id)
+
+    return load_seller_features(DATA_DIR).reasons(seller_id)
 
-    orders = load_orders(DATA_DIR)
-    preds = load_batch_predictions(DATA_DIR)
 
-    reasons = explain_seller_risk(orders, preds, seller_id)
-    return jsonify(reasons)
+@app.route("/marketplace_explanations")
+def marketplace_explanations():
+    """
+    Explanations for every seller of a marketplace in one response.
+    Query params:
+      - marketplace_id (optional) -> all sellers when omitted
+    Returns [{"seller_id", "reasons", "features"}], features being the
+    per-seller signals (return rate, COD share, mean rating, mean risk,
+    delivery-day / discount-share percentiles) the reasons are based on.
+    """
+    marketplace_id = request.args.get("marketplace_id")
+    seller_ids = [s["seller_id"] for s in list_sellers(marketplace_id)]
+    return jsonify(load_seller_features(DATA_DIR).explanations(seller_ids))
+
+
+@app.route("/dashboard")
+def dashboard():
+    """
+    Everything one dashboard page needs, in one response.
+    Query params:
+      - seller_id (optional)       -> seller view: orders, trend, model_stats, explanation
+      - marketplace_id (optional)  -> marketplace view (default): stats, category_risk,
+                                      category_trend, sellers
+      - category, top_n, series, bucket (optional)
+                                   -> category_trend options, as on /marketplace_category_trend
+    The ETag is derived from the dataset version and the query, so a
+    client revalidating an unchanged dashboard gets a 304 before any
+    data is loaded or aggregated.
+    """
+    seller_id = request.args.get("seller_id")
+    marketplace_id = request.args.get("marketplace_id") or None
+    category = request.args.get("category") or None
+    try:
+        options = trend_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if seller_id:
+        view = ["seller", seller_id]
+        tables = ["orders", "predictions"]
+        extra = [os.path.join(MODELS_DIR, f"model_{seller_id}_stats.json")]
+    else:
+        view = ["marketplace", marketplace_id, category, options]
+        tables = ["sellers", "orders", "predictions"]
+        extra = []
+
+    version = dataset_version(DATA_DIR, tables, extra)
+    etag = hashlib.sha1(json.dumps([version] + view).encode()).hexdigest()[:20]
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        if seller_id:
+            orders = select_partition(load_orders(DATA_DIR), DATA_DIR, "orders", "seller_id", seller_id)
+            positions, _ = orders_newest_first(orders, order=load_newest_first(DATA_DIR, seller_id))
+            body = {
+                "seller_id": seller_id,
+                "orders": order_records(orders, positions),
+                "trend": seller_trend_points(seller_id),
+                "model_stats": load_model_stats(MODELS_DIR, seller_id),
+                "explanation": seller_reasons(seller_id),
+            }
+        else:
+            body = {
+                "marketplace_id": marketplace_id,
+                "stats": marketplace_stats_for(marketplace_id),
+                "category_risk": category_risk_rows(marketplace_id),
+                "category_trend": category_trend_series(marketplace_id, category, **options),
+                "sellers": list_sellers(marketplace_id),
+            }
+        resp = jsonify(dict(body, version=version))
+        # the files changed while building: the body may mix versions, so don't tag it
+        if dataset_version(DATA_DIR, tables, extra) != version:
+            etag = None
+
+    if etag:
+        resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 if __name__ == "__main__":
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -0,0 +1,195 @@
+# backend/batch_score.py
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureMatrix
+from scoring import (
+    HIGH_RISK_THRESHOLD,
+    MEDIUM_RISK_THRESHOLD,
+    ModelCache,
+    predict_proba_for_bundle,
+    predict_proba_matrix,
+)
+from ingest import prediction_log
+from storage import PREDICTIONS_SCHEMA, read_meta
+from utils import current_feature_matrix
+
+# ------------------------------------------------------------
+# Batch scoring: orders.csv + models/model_*.joblib -> prediction log
+#
+# Orders are streamed in chunks; each chunk is grouped by seller and
+# scored with one predict_proba call per seller model. Only orders
+# without a prediction (in batch_predictions.csv or the ingestion log)
+# are scored, and each chunk's results are appended to the log as one
+# segment (see ingest.py), so memory stays bounded by the chunk size
+# (plus 8 bytes per existing prediction for the already-scored lookup)
+# and the API never sees a partially written batch. If the shared
+# feature matrix (features.py) is already on disk and current (training
+# builds it), model input is sliced from it by table position; it is
+# never built here, as that would encode the whole table in memory.
+# Otherwise, and for rows it does not cover, each chunk is encoded on
+# the fly.
+# ------------------------------------------------------------
+
+PRED_COLUMNS = list(PREDICTIONS_SCHEMA)
+DEFAULT_CHUNK_ROWS = 200_000
+
+_worker_models = None
+_worker_features = None
+
+
+def _hash_ids(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def scored_order_hashes(preds_path, log=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Sorted uint64 hashes of every Order_ID that already has a prediction."""
+    parts = []
+    if os.path.exists(preds_path) and os.path.getsize(preds_path) > 0:
+        parts = [
+            _hash_ids(chunk["Order_ID"].to_numpy())
+            for chunk in pd.read_csv(preds_path, usecols=["Order_ID"], dtype=str, chunksize=chunk_rows)
+        ]
+    if log is not None:
+        # one segment at a time: only the hashes of all of them are kept
+        parts += [_hash_ids(df["Order_ID"].to_numpy()) for df in log.iter_read(["Order_ID"])]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint64)
+
+
+def risk_labels(scores):
+    return np.select(
+        [scores >= HIGH_RISK_THRESHOLD, scores >= MEDIUM_RISK_THRESHOLD],
+        ["High", "Medium"],
+        default="Low",
+    )
+
+
+def _init_worker(models_dir, max_model_bytes, features_dir=None):
+    global _worker_models, _worker_features
+    # large per-seller groups: sklearn's compiled predictor beats the NumPy walk
+    _worker_models = ModelCache(models_dir, max_bytes=max_model_bytes, prefer="joblib")
+    _worker_features = FeatureMatrix.open(features_dir) if features_dir else None
+
+
+def encoded_rows(bundle, group):
+    """Model input for `group` (orders indexed by table position) sliced
+    from the feature matrix, or None if it does not cover them."""
+    if _worker_features is None:
+        return None
+    rows = _worker_features.rows_for(group.index.to_numpy())
+    cols = _worker_features.columns_for(bundle["encoder"].categories_)
+    if cols is None or (rows < 0).any():
+        return None
+    return _worker_features.take(rows, cols)
+
+
+def score_chunk(chunk):
+    """Predictions frame for one chunk of orders (sellers without a model are left out)."""
+    parts = []
+    for seller_id, group in chunk.groupby("seller_id", sort=False):
+        bundle = _worker_models.get(str(seller_id))
+        if bundle is None:
+            continue
+        X = encoded_rows(bundle, group)
+        scores = predict_proba_for_bundle(bundle, group) if X is None else predict_proba_matrix(bundle, X)
+        scores = np.round(scores, 4)
+        parts.append(pd.DataFrame({
+            "Order_ID": group["Order_ID"].to_numpy(),
+            "seller_id": group["seller_id"].to_numpy(),
+            "marketplace_id": group["marketplace_id"].to_numpy(),
+            "Product_Category": group["Product_Category"].to_numpy(),
+            "Customer_Type": group["Customer_Type"].to_numpy(),
+            "Payment_Method": group["Payment_Method"].to_numpy(),
+            "risk_score": scores,
+            "risk_label": risk_labels(scores),
+            "timestamp": group["order_timestamp"].to_numpy(),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=PRED_COLUMNS), len(chunk)
+    out = pd.concat(parts, ignore_index=True)
+    return out, len(chunk) - len(out)
+
+
+def _pending_chunks(orders_path, scored, chunk_rows, first_row=0):
+    """Unscored orders, chunk by chunk, indexed by their position in the
+    orders table (orders.csv's rows start at `first_row`)."""
+    for chunk in pd.read_csv(orders_path, dtype=str, chunksize=chunk_rows):
+        chunk.index += first_row
+        if len(scored):
+            hashes = _hash_ids(chunk["Order_ID"].to_numpy())
+            pos = np.searchsorted(scored, hashes).clip(max=len(scored) - 1)
+            chunk = chunk[scored[pos] != hashes]
+        if not chunk.empty:
+            yield chunk
+
+
+def batch_score(data_dir, models_dir, workers=1, chunk_rows=DEFAULT_CHUNK_ROWS,
+                max_model_bytes=512 * 1024 * 1024):
+    orders_path = os.path.join(data_dir, "orders.csv")
+    preds_path = os.path.join(data_dir, "batch_predictions.csv")
+    if not os.path.exists(orders_path):
+        print("No orders.csv in data_dir")
+        return
+
+    log = prediction_log(data_dir)
+    start = time.perf_counter()
+    matrix = current_feature_matrix(data_dir)
+    features_dir = matrix.path if matrix is not None else None
+    # orders.csv holds only the rows appended after a columnar-only store
+    first_row = (read_meta(data_dir, "orders") or {}).get("csv_first_row", 0)
+    scored = scored_order_hashes(preds_path, log, chunk_rows)
+    print(f"{len(scored)} orders already scored")
+
+    written = unscored = 0
+    chunks = _pending_chunks(orders_path, scored, chunk_rows, first_row)
+    if workers <= 1:
+        _init_worker(models_dir, max_model_bytes, features_dir)
+        results = map(score_chunk, chunks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(models_dir, max_model_bytes, features_dir)
+        )
+        results = _bounded_map(pool, score_chunk, chunks, in_flight=workers * 2)
+    try:
+        for preds, missing in results:
+            if len(preds):
+                log.append(preds)
+            written += len(preds)
+            unscored += missing
+            print(f"  +{len(preds)} predictions ({written} total)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    merged = log.compact()
+    print(f"Scored {written} orders in {time.perf_counter() - start:.1f}s "
+          f"({unscored} skipped: no model for seller; {merged} log segments merged)")
+    return {"written": written, "skipped_no_model": unscored}
+
+
+def _bounded_map(pool, fn, items, in_flight):
+    """pool.map that keeps at most `in_flight` items submitted, in order."""
+    pending = []
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= in_flight:
+            yield pending.pop(0).result()
+    for fut in pending:
+        yield fut.result()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score orders that have no prediction yet.")
+    parser.add_argument("data_dir", nargs="?", default="./data")
+    parser.add_argument("models_dir", nargs="?", default="./models")
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="orders read and scored per chunk")
+    args = parser.parse_args()
+    batch_score(args.data_dir, args.models_dir, workers=args.workers, chunk_rows=args.chunk_rows)
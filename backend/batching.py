@@ -0,0 +1,156 @@
+# backend/batching.py
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pandas as pd
+
+from metrics import Histogram, LATENCY_BUCKETS_MS, SIZE_BUCKETS
+from scoring import error_results, score_seller_rows
+
+# ------------------------------------------------------------
+# Micro-batching for online scoring
+#
+# Concurrent /predict calls submit orders here instead of calling the
+# model directly. Orders are queued per seller and flushed as one
+# vectorized encode + predict_proba when the seller's oldest queued
+# order has waited `window_ms`, or when `max_batch` orders are queued.
+# Due batches run on a small thread pool, so a seller whose model is
+# still loading does not hold up the other sellers' batches. A batch
+# that fails, or an order not answered within the timeout, gets
+# per-order error results rather than an exception. If the dispatch
+# thread itself dies, the orders it had queued fail the same way and
+# the next submit() starts a new one.
+# ------------------------------------------------------------
+
+DEFAULT_WINDOW_MS = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "5"))
+DEFAULT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "256"))
+DEFAULT_WORKERS = int(os.environ.get("PREDICT_WORKERS", "4"))
+
+
+class InferenceBatcher:
+    def __init__(self, model_cache, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 workers=DEFAULT_WORKERS):
+        self.model_cache = model_cache
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.workers = workers
+        self._pending = {}  # seller_id -> [(order, future, enqueued_at), ...]
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._pool = None
+        self.batch_sizes = Histogram(SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    def _ensure_worker(self):
+        # started lazily (and again after a fork) so gunicorn workers each get one
+        if self._worker_pid != os.getpid():
+            self._pending = {}  # queued in the parent process; nobody here waits on it
+            self._worker = None
+            self._worker_pid = os.getpid()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        if self._worker is None or not self._worker.is_alive():
+            # anything still queued is picked up by the new thread
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, order):
+        """Queue one order dict; returns a Future resolving to its result dict."""
+        future = Future()
+        seller_id = order.get("seller_id")
+        with self._cond:
+            self._ensure_worker()
+            queue = self._pending.setdefault(seller_id, [])
+            queue.append((order, future, time.monotonic()))
+            if len(queue) >= self.max_batch or len(queue) == 1:
+                self._cond.notify()
+        return future
+
+    def score(self, orders, timeout=30):
+        """Blocking helper: results for `orders`, in input order."""
+        futures = [self.submit(o) for o in orders]
+        deadline = time.monotonic() + timeout
+        results = []
+        for order, future in zip(orders, futures):
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                results.append({"Order_ID": order.get("Order_ID"), "seller_id": order.get("seller_id"),
+                                "error": "timeout"})
+        return results
+
+    def _take_due(self):
+        """Pop every queue that is full or past its window; else seconds to wait."""
+        now = time.monotonic()
+        due, next_wait = [], None
+        for seller_id, queue in list(self._pending.items()):
+            wait = queue[0][2] + self.window - now
+            if len(queue) >= self.max_batch or wait <= 0:
+                due.append((seller_id, queue[: self.max_batch]))
+                rest = queue[self.max_batch:]
+                if rest:
+                    self._pending[seller_id] = rest
+                else:
+                    del self._pending[seller_id]
+            elif next_wait is None or wait < next_wait:
+                next_wait = wait
+        return due, next_wait
+
+    def _run(self):
+        try:
+            self._dispatch()
+        except BaseException:
+            # fail what is queued instead of leaving it to time out
+            with self._cond:
+                stranded, self._pending = self._pending, {}
+                self._worker = None  # the next submit() starts a new thread
+            for seller_id, queue in stranded.items():
+                self._fail(seller_id, queue)
+            raise
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                due, next_wait = self._take_due()
+                while not due:
+                    self._cond.wait(timeout=next_wait)
+                    due, next_wait = self._take_due()
+            for i, (seller_id, batch) in enumerate(due):
+                try:
+                    self._pool.submit(self._execute, seller_id, batch)
+                except BaseException:
+                    for seller_id, batch in due[i:]:
+                        self._fail(seller_id, batch)  # already taken off the queue
+                    raise
+
+    def _execute(self, seller_id, batch):
+        started = time.monotonic()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.queue_wait_ms.observe((started - enqueued_at) * 1000.0)
+        try:
+            rows = pd.DataFrame([order for order, _, _ in batch])
+            results = score_seller_rows(seller_id, rows, self.model_cache)
+        except Exception:
+            self._fail(seller_id, batch)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _fail(seller_id, batch):
+        """Answer every order of `batch` with a "scoring_failed" error."""
+        rows = pd.DataFrame({"Order_ID": [order.get("Order_ID") for order, _, _ in batch]})
+        for (_, future, _), result in zip(batch, error_results(rows, seller_id, {"error": "scoring_failed"})):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
@@ -0,0 +1,344 @@
+# backend/benchmarks.py
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+
+import app as api
+from batching import InferenceBatcher
+from cache import dataset_cache
+from features import features_path
+from generate_mock_data import generate
+from ingest import BackgroundCompactor, prediction_log
+from scoring import ModelCache
+from train_seller_models import FEATURES, plan_workers, train_for_seller
+from utils import (
+    compute_category_risk,
+    compute_category_trend,
+    compute_marketplace_health,
+    compute_marketplace_stats,
+    compute_risk_alerts,
+    compute_seller_trend,
+    explain_seller_risk,
+    load_batch_predictions,
+    load_feature_matrix,
+    load_orders,
+    orders_newest_first,
+    select_partition,
+)
+
+# ------------------------------------------------------------
+# Benchmark suite
+#
+# Times every utils aggregation, every Flask route (through the test
+# client, warm dataset cache) and train_for_seller against generated
+# datasets of each requested size, e.g.
+#
+#   python benchmarks.py --sizes 10k,1m --save bench.json
+#   python benchmarks.py --sizes 10k,1m --baseline bench.json --threshold 0.2
+#
+# Datasets are generated once (fixed seed and end date, columnar store
+# only) under --data-root/<size>/ and reused while their parameters
+# match. Each case reports the first call, latency percentiles over
+# --repeat calls, peak traced Python/NumPy memory of one extra call and
+# rows/sec (input rows / median latency). With --baseline, a case whose
+# median is more than --threshold slower than in the baseline file is a
+# regression, and the exit status is 1.
+# ------------------------------------------------------------
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_SIZES = "10k"
+DEFAULT_REPEAT = 20
+DEFAULT_THRESHOLD = 0.2
+PERCENTILES = (50, 90, 99)
+
+END_DATE = date(2025, 12, 31)
+SEED = 42
+SKEW = 0.5
+PARAMS_FILE = "bench_params.json"
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text in SIZES:
+        return SIZES[text]
+    return int(float(text))
+
+
+def dataset_params(rows):
+    """Generator arguments for a `rows`-row benchmark dataset: one seller
+    per 5k orders (10..1000) over 90 days."""
+    return {
+        "rows": rows,
+        "n_sellers": min(1000, max(10, rows // 5000)),
+        "n_marketplaces": 3,
+        "days": 90,
+        "end_date": END_DATE.isoformat(),
+        "skew": SKEW,
+        "seed": SEED,
+    }
+
+
+def ensure_dataset(data_root, rows):
+    """Data dir holding a `rows`-row dataset, generated unless it exists."""
+    data_dir = os.path.join(data_root, str(rows))
+    params = dataset_params(rows)
+    params_path = os.path.join(data_dir, PARAMS_FILE)
+    try:
+        with open(params_path) as fh:
+            if json.load(fh) == params:
+                return data_dir
+    except (OSError, ValueError):
+        pass
+
+    print(f"Generating {rows} rows in {data_dir}")
+    generate(data_dir, **dict(params, end_date=END_DATE), fmt="columnar")
+    with open(params_path, "w") as fh:
+        json.dump(params, fh)
+    return data_dir
+
+
+# ------------------------------------------------------------
+# Measuring
+# ------------------------------------------------------------
+
+def measure(fn, repeat, rows):
+    """Timing and memory summary of calling `fn()`."""
+    start = time.perf_counter()
+    fn()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+
+    # separate call: tracing slows allocations down
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    times = np.asarray(times)
+    p50 = float(np.percentile(times, 50))
+    out = {"rows": int(rows), "repeat": repeat, "first_ms": round(first_ms, 3)}
+    out.update({f"p{q}_ms": round(float(np.percentile(times, q)), 3) for q in PERCENTILES})
+    out["max_ms"] = round(float(times.max()), 3)
+    out["peak_mb"] = round(peak / 2**20, 3)
+    out["rows_per_s"] = round(rows / (p50 / 1000)) if p50 > 0 else None
+    return out
+
+
+def _get(client, url):
+    def call():
+        resp = client.get(url)
+        resp.get_data()  # drain streamed bodies
+        if resp.status_code >= 400:
+            raise RuntimeError(f"GET {url} -> {resp.status_code}")
+    return call
+
+
+def _post(client, url, payload):
+    def call():
+        resp = client.post(url, json=payload)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"POST {url} -> {resp.status_code}")
+    return call
+
+
+# ------------------------------------------------------------
+# Cases
+# ------------------------------------------------------------
+
+def point_app_at(data_dir, models_dir):
+    """Serve `data_dir` / `models_dir` from the app module."""
+    api.DATA_DIR = data_dir
+    api.MODELS_DIR = models_dir
+    api.model_cache = ModelCache(models_dir)
+    api.batcher = InferenceBatcher(api.model_cache)
+    api.log_compactor = BackgroundCompactor(prediction_log(data_dir))
+    dataset_cache.invalidate()
+
+
+def benchmark_size(rows, data_dir, models_dir, repeat, train_repeat, only=None):
+    point_app_at(data_dir, models_dir)
+    orders = load_orders(data_dir)
+    preds = load_batch_predictions(data_dir)
+
+    seller_id = orders["seller_id"].value_counts().index[0]  # largest seller
+    s_orders = select_partition(orders, data_dir, "orders", "seller_id", seller_id)
+    s_preds = select_partition(preds, data_dir, "predictions", "seller_id", seller_id)
+    marketplace_id = s_orders["marketplace_id"].iloc[0]
+    m_orders = orders[orders["marketplace_id"] == marketplace_id]
+    m_preds = preds[preds["marketplace_id"] == marketplace_id]
+    end = END_DATE.isoformat()
+    start = (END_DATE - timedelta(days=29)).isoformat()
+
+    # the frame-based train_for_seller path gets CSV-like object columns
+    train_df = s_orders.astype({c: object for c in s_orders.columns if str(s_orders[c].dtype) == "category"})
+    _, n_jobs = plan_workers(1)
+    order = s_orders.iloc[0]
+    payload = {"seller_id": seller_id, **{f: order[f].item() if hasattr(order[f], "item") else order[f]
+                                         for f in FEATURES}}
+
+    client = api.app.test_client()
+    mp, sid = f"marketplace_id={marketplace_id}", f"seller_id={seller_id}"
+    n, n_m, n_s = len(orders), len(m_orders), len(s_orders)
+
+    def load_cold():
+        dataset_cache.invalidate()
+        load_orders(data_dir)
+
+    def build_features():
+        shutil.rmtree(features_path(data_dir), ignore_errors=True)
+        dataset_cache.invalidate(("feature_matrix", data_dir))
+        return load_feature_matrix(data_dir)
+
+    # (name, fn, input rows, repeat); training runs first so /predict has a model
+    cases = [
+        ("train_for_seller", lambda: train_for_seller(train_df, seller_id, models_dir, n_jobs=n_jobs),
+         n_s, train_repeat),
+        ("train_for_seller (feature matrix)",
+         lambda: train_for_seller(None, seller_id, models_dir, n_jobs=n_jobs, features=load_feature_matrix(data_dir)),
+         n_s, train_repeat),
+        ("load_feature_matrix (build)", build_features, n, max(1, repeat // 4)),
+        ("load_orders (cold)", load_cold, n, repeat),
+        ("compute_marketplace_stats", lambda: compute_marketplace_stats(orders, preds), n, repeat),
+        ("compute_marketplace_stats (marketplace)",
+         lambda: compute_marketplace_stats(orders, preds, marketplace_id), n, repeat),
+        ("compute_category_risk", lambda: compute_category_risk(orders, preds, marketplace_id), n, repeat),
+        ("compute_seller_trend", lambda: compute_seller_trend(s_preds), n_s, repeat),
+        ("compute_category_trend", lambda: compute_category_trend(orders, preds, marketplace_id), n, repeat),
+        ("compute_marketplace_health", lambda: compute_marketplace_health(m_orders, m_preds), n_m, repeat),
+        ("compute_risk_alerts", lambda: compute_risk_alerts(m_preds, m_orders), n_m, repeat),
+        ("explain_seller_risk", lambda: explain_seller_risk(orders, preds, seller_id), n, repeat),
+        ("orders_newest_first", lambda: orders_newest_first(s_orders), n_s, repeat),
+    ]
+    routes = [
+        ("/health", 0),
+        ("/cache_stats", 0),
+        ("/log_stats", 0),
+        ("/model_cache_stats", 0),
+        ("/batching_stats", 0),
+        ("/metrics", 0),
+        (f"/marketplace_insights?{mp}", n_m),
+        ("/marketplace_stats", n),
+        (f"/marketplace_stats?{mp}", n_m),
+        (f"/marketplace_stats?{mp}&start={start}&end={end}", n_m),
+        (f"/marketplace_category_risk?{mp}", n_m),
+        (f"/sellers?{mp}", 0),
+        (f"/sellers?{mp}&format=columnar", 0),
+        (f"/seller_orders?{sid}", n_s),
+        (f"/seller_orders?{sid}&limit=50", n_s),
+        (f"/seller_orders?{sid}&format=columnar", n_s),
+        (f"/seller_trend?{sid}", n_s),
+        (f"/seller_trend?{sid}&start={start}&end={end}", n_s),
+        (f"/seller_model_stats?{sid}", 0),
+        (f"/marketplace_category_trend?{mp}", n_m),
+        (f"/marketplace_category_trend?{mp}&bucket=week&series=top", n_m),
+        (f"/seller_explanation?{sid}", n_s),
+        (f"/marketplace_explanations?{mp}", n_m),
+        (f"/dashboard?{mp}", n_m),
+        (f"/dashboard?{sid}", n_s),
+    ]
+    cases += [(f"GET {url}", _get(client, url), r, repeat) for url, r in routes]
+    cases.append(("POST /predict", _post(client, "/predict", payload), 1, repeat))
+
+    covered = {name.split()[1].split("?")[0] for name, *_ in cases if name.startswith(("GET ", "POST "))}
+    missing = sorted(str(r) for r in api.app.url_map.iter_rules() if str(r) not in covered | {"/static/<path:filename>"})
+    if missing:
+        print(f"  routes without a benchmark case: {', '.join(missing)}")
+
+    results = {}
+    for name, fn, case_rows, case_repeat in cases:
+        if only and not any(o in name for o in only):
+            continue
+        results[name] = measure(fn, case_repeat, case_rows)
+        r = results[name]
+        print(f"  {name:<58} p50 {r['p50_ms']:>10.2f} ms  p99 {r['p99_ms']:>10.2f} ms  "
+              f"peak {r['peak_mb']:>8.1f} MB")
+    return results
+
+
+# ------------------------------------------------------------
+# Baseline comparison
+# ------------------------------------------------------------
+
+def compare(current, baseline, threshold):
+    """[(size, case, baseline p50, current p50, ratio)] for cases whose
+    median got more than `threshold` (0.2 = 20%) slower."""
+    regressions = []
+    for size, cases in current["results"].items():
+        for name, r in cases.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old or not old.get("p50_ms"):
+                continue
+            ratio = r["p50_ms"] / old["p50_ms"]
+            if ratio > 1 + threshold:
+                regressions.append((size, name, old["p50_ms"], r["p50_ms"], ratio))
+    return regressions
+
+
+def run(sizes, data_root, repeat=DEFAULT_REPEAT, train_repeat=1, only=None):
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": {},
+        "max_rss_mb": None,
+    }
+    for rows in sizes:
+        data_dir = ensure_dataset(data_root, rows)
+        models_dir = os.path.join(data_dir, "models")
+        print(f"Benchmarking {rows} rows")
+        report["results"][str(rows)] = benchmark_size(rows, data_dir, models_dir, repeat, train_repeat, only)
+    # ru_maxrss is KiB on Linux
+    report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark aggregations, routes and training.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma-separated dataset sizes, e.g. 10k,1m,10m")
+    parser.add_argument("--data-root", default="./bench_data",
+                        help="where generated datasets are kept between runs")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per case")
+    parser.add_argument("--train-repeat", type=int, default=1, help="timed calls of train_for_seller")
+    parser.add_argument("--only", default=None, help="comma-separated substrings of case names to run")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed median slowdown vs the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    report = run(sizes, args.data_root, repeat=args.repeat, train_repeat=args.train_repeat, only=only)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Saved {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.threshold)
+        for size, name, old, new, ratio in regressions:
+            print(f"REGRESSION [{size} rows] {name}: {old:.2f} ms -> {new:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
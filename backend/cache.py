@@ -0,0 +1,109 @@
+# backend/cache.py
+import os
+import threading
+
+# ------------------------------------------------------------
+# In-process dataset cache
+#
+# Each dataset is parsed once and kept in memory until the file
+# on disk changes (mtime or size). Frames handed out by the cache
+# are shared between requests, so callers must treat them as
+# read-only and build new frames instead of assigning columns.
+# ------------------------------------------------------------
+
+def file_signature(path):
+    if isinstance(path, (list, tuple)):
+        return tuple(file_signature(p) for p in path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class DatasetCache:
+    def __init__(self):
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.updates = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _lookup(self, key, signature):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return True, entry[1]
+        return False, None
+
+    def get(self, key, path, loader, update=None):
+        """Return the cached value for `key`, calling `loader()` when
+        `path` (a path or a tuple of paths) is new or has changed since
+        it was last loaded.
+
+        If `update` is given it is tried first on a change, as
+        `update(old_value, old_signature, new_signature)`, and may return
+        an incrementally refreshed value, or None to fall back to `loader()`.
+        """
+        signature = file_signature(path)
+
+        with self._lock:
+            found, value = self._lookup(key, signature)
+            if found:
+                self.hits += 1
+                return value
+
+        # one loader per key; other threads wait and then reuse its result
+        with self._key_lock(key):
+            signature = file_signature(path)
+            with self._lock:
+                found, value = self._lookup(key, signature)
+                if found:
+                    self.hits += 1
+                    return value
+                old = self._entries.get(key)
+
+            value = None
+            if old is not None and update is not None:
+                value = update(old[1], old[0], signature)
+            updated = value is not None
+            if not updated:
+                value = loader()
+
+            with self._lock:
+                self._entries[key] = (signature, value)
+                if updated:
+                    self.updates += 1
+                elif old is not None:
+                    self.reloads += 1
+                else:
+                    self.misses += 1
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "updates": self.updates,
+                "entries": len(self._entries),
+            }
+
+
+dataset_cache = DatasetCache()
@@ -0,0 +1,163 @@
+# backend/compact_model.py
+import glob
+import json
+import os
+import shutil
+import sys
+
+import joblib
+import numpy as np
+
+from features import is_missing_category, one_hot
+
+# ------------------------------------------------------------
+# Compact model artifacts
+#
+# A fitted RandomForest + OneHotEncoder bundle flattened into plain
+# arrays: every tree's nodes are concatenated (feature, threshold,
+# left/right child, per-class leaf probabilities) and stored as .npy
+# files in model_{seller_id}.compact/. Loading is a memory-mapped
+# np.load (no unpickling, pages are read on demand and shared between
+# processes) and prediction is a vectorized NumPy walk of all trees.
+# ------------------------------------------------------------
+
+META_FILE = "meta.json"
+ARRAYS = ["feature", "threshold", "left", "right", "value", "roots"]
+
+
+def compact_path(models_dir, seller_id):
+    return os.path.join(models_dir, f"model_{seller_id}.compact")
+
+
+class CompactEncoder:
+    """One-hot encoder with OneHotEncoder(handle_unknown="ignore") output.
+    A None category (how meta.json stores sklearn's NaN one) becomes NaN."""
+
+    def __init__(self, categories):
+        self.categories_ = [
+            np.asarray([np.nan if v is None else v for v in c], dtype=object) for c in categories
+        ]
+
+    def transform(self, X):
+        return one_hot(X, self.categories_)
+
+
+class CompactForest:
+    """predict_proba-compatible forest over flattened node arrays."""
+
+    def __init__(self, arrays, classes, max_depth):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.classes_ = np.asarray(classes)
+        self.max_depth = max_depth
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def apply(self, X):
+        """Leaf node index for every (row, tree)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        flat_X = X.ravel()
+        # one entry per (row, tree) pair; pairs drop out once they reach a leaf
+        nodes = np.tile(np.asarray(self.roots), n_rows)
+        offsets = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        active = np.arange(n_rows * n_trees)
+        while len(active):
+            cur = nodes[active]
+            go_left = flat_X[offsets[active] + self.feature[cur]] <= self.threshold[cur]
+            nxt = np.where(go_left, self.left[cur], self.right[cur])
+            nodes[active] = nxt
+            active = active[nxt != cur]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].mean(axis=1)
+
+
+def flatten_forest(model):
+    """Node arrays for a fitted sklearn forest of decision trees.
+    Leaves point to themselves, which is how the walk detects them."""
+    parts = {name: [] for name in ARRAYS if name != "roots"}
+    roots, offset, max_depth = [], 0, 0
+    for est in model.estimators_:
+        t = est.tree_
+        n = t.node_count
+        ids = np.arange(n)
+        leaf = t.children_left == -1
+
+        value = t.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+
+        parts["feature"].append(np.where(leaf, 0, t.feature).astype(np.int32))
+        parts["threshold"].append(np.where(leaf, np.inf, t.threshold).astype(np.float64))
+        parts["left"].append((np.where(leaf, ids, t.children_left) + offset).astype(np.int32))
+        parts["right"].append((np.where(leaf, ids, t.children_right) + offset).astype(np.int32))
+        parts["value"].append(value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, int(t.max_depth))
+
+    arrays = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+    arrays["roots"] = np.asarray(roots, dtype=np.int32)
+    return arrays, max_depth
+
+
+def save_compact(bundle, path):
+    """Write a joblib-style bundle ({'model', 'encoder', 'features'}) as a
+    compact artifact directory, replacing any previous one atomically."""
+    arrays, max_depth = flatten_forest(bundle["model"])
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    meta = {
+        "features": list(bundle["features"]),
+        "classes": [int(c) for c in bundle["model"].classes_],
+        "max_depth": max_depth,
+        # the missing-value category stays missing (null), not the string "nan"
+        "categories": [
+            [None if is_missing_category(v) else str(v) for v in cats] for cats in bundle["encoder"].categories_
+        ],
+    }
+    with open(os.path.join(tmp, META_FILE), "w") as fh:
+        json.dump(meta, fh)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_compact(path, mmap_mode="r"):
+    """Bundle with the same keys as the joblib one, backed by mapped arrays."""
+    with open(os.path.join(path, META_FILE)) as fh:
+        meta = json.load(fh)
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    return {
+        "model": CompactForest(arrays, meta["classes"], meta["max_depth"]),
+        "encoder": CompactEncoder(meta["categories"]),
+        "features": meta["features"],
+    }
+
+
+def convert_models(models_dir):
+    for path in sorted(glob.glob(os.path.join(models_dir, "model_*.joblib"))):
+        target = path[: -len(".joblib")] + ".compact"
+        save_compact(joblib.load(path), target)
+        print(f"Wrote {target}")
+
+
+if __name__ == "__main__":
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else "./models"
+    convert_models(models_dir)
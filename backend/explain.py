@@ -0,0 +1,189 @@
+# backend/explain.py
+import math
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+# ------------------------------------------------------------
+# Seller explanation features
+#
+# One row per seller with the signals behind /seller_explanation:
+# return rate, COD share, mean product rating and mean predicted risk
+# (kept as sums and counts, so appended rows are simply added on), plus
+# the median and 90th percentile of delivery days and of the discount
+# as a share of the price. Percentiles cannot be merged from partial
+# results, so extend() recomputes them only for the sellers that the
+# new orders belong to. Explanations are a lookup into this table; the
+# reasons use the same thresholds explain_seller_risk always has.
+# ------------------------------------------------------------
+
+ORDER_COLUMNS = [
+    "seller_id", "Returned", "Payment_Method", "Product_Rating",
+    "Delivery_Time_Days", "Product_Price", "Discount_Applied",
+]
+PRED_COLUMNS = ["seller_id", "risk_score"]
+
+_ORDER_SUMS = ["n_orders", "returned_sum", "returned_count", "cod_count", "rating_sum", "rating_count"]
+_PRED_SUMS = ["n_preds", "risk_sum", "risk_count"]
+_COUNTS = {"n_orders", "returned_count", "cod_count", "rating_count", "n_preds", "risk_count"}
+
+PERCENTILES = (50, 90)
+PERCENTILE_COLUMNS = [
+    f"{name}_p{q}" for name in ("delivery_days", "discount_share") for q in PERCENTILES
+]
+
+FEATURE_COLUMNS = ["n_orders", "n_preds", "return_rate", "cod_share", "mean_rating", "mean_risk"] + PERCENTILE_COLUMNS
+
+# (reason, test on the feature table); checked in this order
+REASONS = [
+    ("High return rate", lambda t: (t["n_orders"] > 0) & (t["return_rate"] > 0.3)),
+    ("High COD usage", lambda t: (t["n_orders"] > 0) & (t["cod_share"] > 0.5)),
+    ("Low average product rating", lambda t: (t["n_orders"] > 0) & (t["mean_rating"] < 3)),
+    ("Consistently high predicted risk", lambda t: (t["n_preds"] > 0) & (t["mean_risk"] > 0.7)),
+]
+
+
+def _order_sums(o):
+    df = pd.DataFrame({
+        "seller_id": o["seller_id"],
+        "returned": o["Returned"].astype(float),
+        "cod": (o["Payment_Method"] == "COD").to_numpy(),
+        "rating": o["Product_Rating"].astype(float),
+    })
+    g = df.groupby("seller_id", observed=True)
+    out = pd.DataFrame({
+        "n_orders": g.size(),
+        "returned_sum": g["returned"].sum(),
+        "returned_count": g["returned"].count(),
+        "cod_count": g["cod"].sum(),
+        "rating_sum": g["rating"].sum(),
+        "rating_count": g["rating"].count(),
+    })
+    return _object_index(out)
+
+
+def _pred_sums(p):
+    g = pd.DataFrame({"seller_id": p["seller_id"], "risk": p["risk_score"]}).groupby("seller_id", observed=True)
+    out = pd.DataFrame({"n_preds": g.size(), "risk_sum": g["risk"].sum(), "risk_count": g["risk"].count()})
+    return _object_index(out)
+
+
+def _percentiles(o):
+    """Delivery-day and discount-share percentiles per seller; NaN where
+    the columns were not loaded."""
+    if o.empty or not {"Delivery_Time_Days", "Product_Price", "Discount_Applied"} <= set(o.columns):
+        return pd.DataFrame(columns=PERCENTILE_COLUMNS, dtype=float)
+    price = o["Product_Price"].astype(float)
+    df = pd.DataFrame({
+        "seller_id": o["seller_id"],
+        "delivery_days": o["Delivery_Time_Days"].astype(float),
+        "discount_share": (o["Discount_Applied"].astype(float) / price).where(price > 0),
+    })
+    q = (
+        df.groupby("seller_id", observed=True)[["delivery_days", "discount_share"]]
+        .quantile([q / 100 for q in PERCENTILES])
+        .unstack()
+    )
+    q.columns = [f"{name}_p{round(level * 100)}" for name, level in q.columns]
+    return _object_index(q[PERCENTILE_COLUMNS])
+
+
+def _object_index(df):
+    df.index = pd.Index(np.asarray(df.index, dtype=object), name="seller_id")
+    return df.sort_index()
+
+
+def _combine(sums, percentiles):
+    table = sums.join(percentiles.reindex(columns=PERCENTILE_COLUMNS), how="left")
+    for col in _COUNTS & set(table.columns):
+        table[col] = table[col].astype("int64")
+    return table
+
+
+def _add(a, b):
+    out = a.add(b, fill_value=0)
+    for col in _COUNTS & set(out.columns):
+        out[col] = out[col].astype("int64")
+    return out.sort_index()
+
+
+class SellerFeatures:
+    """Per-seller sums and percentiles as of `n_orders` order rows and
+    `n_preds` prediction rows; extend() returns a new instance."""
+
+    def __init__(self, table, n_orders, n_preds, source=None):
+        self._table = table
+        self._features = None
+        self.n_orders = n_orders
+        self.n_preds = n_preds
+        # where the rows came from, per table (see storage attrs)
+        self.source = source or {}
+
+    @classmethod
+    @timed
+    def build(cls, o, p, source=None):
+        sums = _order_sums(o).join(_pred_sums(p), how="outer").fillna(0)
+        return cls(_combine(sums, _percentiles(o)), len(o), len(p), source)
+
+    @timed
+    def extend(self, new_o, new_p, orders_of, source=None):
+        """Add appended rows; `orders_of(seller_ids)` must return every
+        current order of those sellers (for their percentiles)."""
+        old = self._table
+        sums = _add(old[_ORDER_SUMS + _PRED_SUMS], _order_sums(new_o).join(_pred_sums(new_p), how="outer").fillna(0))
+        percentiles = old[PERCENTILE_COLUMNS].reindex(sums.index)
+        touched = pd.unique(new_o["seller_id"].dropna().astype(object))
+        if len(touched):
+            fresh = _percentiles(orders_of(touched))
+            percentiles.loc[fresh.index, PERCENTILE_COLUMNS] = fresh
+        return SellerFeatures(
+            _combine(sums, percentiles), self.n_orders + len(new_o), self.n_preds + len(new_p), source
+        )
+
+    def features(self):
+        """FEATURE_COLUMNS for every seller, computed once per instance."""
+        if self._features is None:
+            t = self._table
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._features = pd.DataFrame({
+                    "n_orders": t["n_orders"],
+                    "n_preds": t["n_preds"],
+                    "return_rate": t["returned_sum"] / t["returned_count"],
+                    "cod_share": t["cod_count"] / t["n_orders"],
+                    "mean_rating": t["rating_sum"] / t["rating_count"],
+                    "mean_risk": t["risk_sum"] / t["risk_count"],
+                    **{c: t[c] for c in PERCENTILE_COLUMNS},
+                }, index=t.index)
+        return self._features
+
+    @timed
+    def explanations(self, seller_ids):
+        """[{"seller_id", "reasons", "features"}] for `seller_ids`, with
+        every reason test applied to all of them at once. Sellers without
+        any rows get no reasons and features None."""
+        t = self.features().reindex(pd.Index(list(seller_ids), dtype=object))
+        flags = [(reason, test(t).to_numpy()) for reason, test in REASONS]
+        present = t["n_orders"].notna().to_numpy()
+        records = t.astype(object).to_dict(orient="records")
+
+        out = []
+        for i, seller_id in enumerate(t.index):
+            features = None
+            if present[i]:
+                features = {
+                    k: (None if isinstance(v, float) and math.isnan(v) else v)
+                    for k, v in records[i].items()
+                }
+                features["n_orders"] = int(features["n_orders"])
+                features["n_preds"] = int(features["n_preds"])
+            out.append({
+                "seller_id": seller_id,
+                "reasons": [reason for reason, fired in flags if fired[i]],
+                "features": features,
+            })
+        return out
+
+    def reasons(self, seller_id):
+        return self.explanations([seller_id])[0]["reasons"]
@@ -0,0 +1,219 @@
+# backend/features.py
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from storage import COLUMNAR_DIR, replace_dir
+
+# ------------------------------------------------------------
+# Model feature matrix
+#
+# Model input is the NUMERIC_FEATURES followed by the one-hot encoded
+# CATEGORICAL_FEATURES, as float32 (RandomForest works in float32
+# anyway). encode_frame() builds it for any frame and category lists;
+# training, batch scoring and /predict all go through it.
+#
+# FeatureMatrix encodes the whole orders table once, with one global
+# category vocabulary, and keeps it on disk under
+# data/columnar/features/:
+#   X.npy      float32 [n_rows, n_columns]
+#   y.npy      int8 Returned labels
+#   order.npy  int64 orders-table position of each matrix row
+#   meta.json  vocabulary, column names, seller offsets, source signature
+# Rows are grouped by seller (stable, so each seller's rows keep table
+# order), which makes one seller's rows a contiguous slice: opened with
+# mmap_mode="r", training slices X and y without copying and worker
+# processes share the pages. A model whose encoder categories differ
+# from the vocabulary maps onto it with columns_for().
+# ------------------------------------------------------------
+
+FEATURES = [
+    "Product_Category","Product_Price","Discount_Applied",
+    "Delivery_Time_Days","Customer_Type","Payment_Method",
+    "Customer_Return_Rate","Product_Rating"
+]
+NUMERIC_FEATURES = ['Product_Price','Discount_Applied','Delivery_Time_Days','Customer_Return_Rate','Product_Rating']
+CATEGORICAL_FEATURES = ['Product_Category','Customer_Type','Payment_Method']
+
+MATRIX_COLUMNS = ["seller_id", "Returned"] + FEATURES
+FEATURES_DIR = "features"
+META_FILE = "meta.json"
+BUILD_CHUNK_ROWS = 1_000_000
+
+
+def features_path(data_dir):
+    return os.path.join(data_dir, COLUMNAR_DIR, FEATURES_DIR)
+
+
+def numeric_block(df):
+    """NUMERIC_FEATURES of `df` as float32, bad or missing values -> 0."""
+    out = np.empty((len(df), len(NUMERIC_FEATURES)), dtype=np.float32)
+    for j, col in enumerate(NUMERIC_FEATURES):
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors="coerce")
+        out[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    out[np.isnan(out)] = 0.0
+    return out
+
+
+def is_missing_category(value):
+    """True for the missing-value category sklearn puts last (NaN or None)."""
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def one_hot(df, categories, out=None):
+    """One column per category of each CATEGORICAL_FEATURES column, as
+    OneHotEncoder(handle_unknown="ignore") would: unknown values -> zeros,
+    missing values -> the NaN category if the encoder was fit with one."""
+    width = sum(len(c) for c in categories)
+    if out is None:
+        out = np.zeros((len(df), width), dtype=np.float32)
+    offset = 0
+    rows = np.arange(len(df))
+    for col, cats in zip(CATEGORICAL_FEATURES, categories):
+        known = [c for c in cats if not is_missing_category(c)]
+        codes = pd.Index(known, dtype=object).get_indexer(df[col])  # unknown or missing -> -1
+        hit = codes >= 0
+        out[rows[hit], offset + codes[hit]] = 1.0
+        if len(known) < len(cats):  # sklearn puts NaN last
+            out[rows[df[col].isna().to_numpy()], offset + len(known)] = 1.0
+        offset += len(cats)
+    return out
+
+
+def encode_frame(df, categories):
+    """Model input for `df`: numeric features, then one-hot categoricals."""
+    return np.hstack([numeric_block(df), one_hot(df, categories)])
+
+
+def vocabulary_of(df):
+    """Sorted category values per CATEGORICAL_FEATURES column of `df`."""
+    vocab = {}
+    for col in CATEGORICAL_FEATURES:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = np.unique(values.cat.codes.to_numpy())
+            values = values.cat.categories[codes[codes >= 0]]
+        else:
+            values = pd.unique(values.dropna())
+        vocab[col] = sorted(str(v) for v in values)
+    return vocab
+
+
+def column_names(vocabulary):
+    return NUMERIC_FEATURES + [f"{col}={v}" for col in CATEGORICAL_FEATURES for v in vocabulary[col]]
+
+
+class FeatureMatrix:
+    """The encoded orders table of one data version (see above)."""
+
+    def __init__(self, X, y, order, meta, path=None):
+        self.path = path
+        self.X = X
+        self.y = y
+        self.order = order
+        self.vocabulary = meta["vocabulary"]
+        self.columns = meta["columns"]
+        self.source = meta.get("source")
+        self.sellers = {s: (a, b) for s, a, b in meta["sellers"]}
+        self._row_of = None
+
+    @classmethod
+    def build(cls, orders, path, source=None, chunk_rows=BUILD_CHUNK_ROWS):
+        """Encode `orders` (the whole table, MATRIX_COLUMNS at least) into
+        `path`, a chunk of rows at a time, and open the result."""
+        vocab = vocabulary_of(orders)
+        columns = column_names(vocab)
+        categories = [vocab[c] for c in CATEGORICAL_FEATURES]
+
+        seller = pd.Categorical(orders["seller_id"])
+        order = np.argsort(seller.codes, kind="stable")
+        counts = np.bincount(seller.codes[seller.codes >= 0], minlength=len(seller.categories))
+        n_missing = int((seller.codes < 0).sum())  # rows without a seller sort first
+        ends = n_missing + np.cumsum(counts)
+        sellers = [[str(s), int(e - n), int(e)] for s, n, e in zip(seller.categories, counts, ends) if n]
+
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        X = np.lib.format.open_memmap(
+            os.path.join(tmp, "X.npy"), mode="w+", dtype=np.float32, shape=(len(orders), len(columns))
+        )
+        for start in range(0, len(orders), chunk_rows):
+            chunk = orders.iloc[order[start:start + chunk_rows]]
+            block = X[start:start + len(chunk)]
+            block[:, :len(NUMERIC_FEATURES)] = numeric_block(chunk)
+            block[:, len(NUMERIC_FEATURES):] = 0.0
+            one_hot(chunk, categories, out=block[:, len(NUMERIC_FEATURES):])
+        X.flush()
+        del X
+
+        returned = pd.to_numeric(orders["Returned"], errors="coerce").fillna(0).to_numpy()
+        np.save(os.path.join(tmp, "y.npy"), returned[order].astype(np.int8))
+        np.save(os.path.join(tmp, "order.npy"), order.astype(np.int64))
+        meta = {"vocabulary": vocab, "columns": columns, "sellers": sellers, "n_rows": len(orders), "source": source}
+        with open(os.path.join(tmp, META_FILE), "w") as fh:
+            json.dump(meta, fh)
+        replace_dir(tmp, path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        """The matrix stored at `path`, or None if there is none."""
+        try:
+            with open(os.path.join(path, META_FILE)) as fh:
+                meta = json.load(fh)
+            arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ("X", "y", "order")]
+        except (OSError, ValueError):
+            return None
+        return cls(*arrays, meta, path=path)
+
+    def __len__(self):
+        return len(self.order)
+
+    def categories(self):
+        """Category lists in CATEGORICAL_FEATURES order (an encoder's categories_)."""
+        return [self.vocabulary[c] for c in CATEGORICAL_FEATURES]
+
+    def seller_rows(self, seller_id):
+        """(X, y) views of one seller's rows, in table order; empty if unknown."""
+        a, b = self.sellers.get(str(seller_id), (0, 0))
+        return self.X[a:b], self.y[a:b]
+
+    def rows_for(self, positions):
+        """Matrix rows of orders-table `positions` (-1 where not encoded)."""
+        if self._row_of is None:
+            row_of = np.empty(len(self.order), dtype=np.int64)
+            row_of[self.order] = np.arange(len(self.order))
+            self._row_of = row_of
+        positions = np.asarray(positions, dtype=np.int64)
+        inside = (positions >= 0) & (positions < len(self._row_of))
+        return np.where(inside, self._row_of[np.where(inside, positions, 0)], -1)
+
+    def columns_for(self, categories):
+        """Column indices that lay X out for an encoder with `categories`,
+        or None if it has a category the vocabulary lacks."""
+        index = {name: i for i, name in enumerate(self.columns)}
+        cols = list(range(len(NUMERIC_FEATURES)))
+        for col, cats in zip(CATEGORICAL_FEATURES, categories):
+            for v in cats:
+                i = index.get(f"{col}={v}")
+                if i is None:
+                    return None
+                cols.append(i)
+        return np.asarray(cols)
+
+    def take(self, rows, cols=None):
+        """X[rows][:, cols], as a view when both are contiguous ranges."""
+        rows = np.asarray(rows)
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and (np.diff(rows) == 1).all():
+            X = self.X[rows[0]:rows[-1] + 1]
+        else:
+            X = self.X[rows]
+        if cols is None or (len(cols) == X.shape[1] and (cols == np.arange(X.shape[1])).all()):
+            return X
+        return X[:, cols]
@@ -1,130 +1,275 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import random
-import os
-
-os.makedirs("./data", exist_ok=True)
-# ------------------------------
-# SETTINGS
-# ------------------------------
-TOTAL_ROWS = 5000
-DAYS_BACK = 90
-
-marketplaces = {
-    "M001": ["S001", "S002", "S003", "S004", "S005"],
-    "M002": ["S006", "S007", "S008"],
-    "M003": ["S009", "S010"]
-}
-
-categories = ["Electronics", "Clothing", "Home", "Beauty", "Grocery", "Footwear"]
-customer_types = ["New", "Returning"]
-payments = ["COD", "UPI", "Card", "Wallet"]
-
-# risk distribution: SPICY profile
-# ~35% high, ~30% medium, ~35% low
-def generate_risk():
-    r = random.random()
-    if r < 0.35:
-        score = round(random.uniform(0.75, 0.98), 4)
-        label = "High"
-    elif r < 0.65:
-        score = round(random.uniform(0.45, 0.75), 4)
-        label = "Medium"
-    else:
-        score = round(random.uniform(0.05, 0.45), 4)
-        label = "Low"
-    return score, label
-
-
-# ------------------------------
-# Generate sellers.csv
-# ------------------------------
-seller_rows = []
-
-for m, seller_list in marketplaces.items():
-    for seller in seller_list:
-        seller_rows.append({
-            "seller_id": seller,
-            "seller_name": f"Seller_{seller}",
-            "marketplace_id": m
-        })
-
-sellers_df = pd.DataFrame(seller_rows)
-sellers_df.to_csv("./data/sellers.csv", index=False)
-
-print("Created sellers.csv")
-
-# ------------------------------
-# Generate orders.csv
-# ------------------------------
-orders = []
-
-start_date = datetime.now() - timedelta(days=DAYS_BACK)
-
-for i in range(TOTAL_ROWS):
-    # pick marketplace
-    marketplace = random.choice(list(marketplaces.keys()))
-    seller = random.choice(marketplaces[marketplace])
-    
-    # random date in last 90 days
-    order_time = start_date + timedelta(days=random.random()*DAYS_BACK)
-    
-    category = random.choice(categories)
-    price = round(random.uniform(200, 5000), 2)
-    discount = round(price * random.uniform(0.05, 0.35), 2)
-    delivery = random.randint(1, 7)
-    cust_type = random.choice(customer_types)
-    payment = random.choice(payments)
-    ret_rate = round(random.uniform(0.01, 0.25), 2)
-    rating = round(random.uniform(1.0, 5.0), 1)
-    returned = np.random.choice([0, 1], p=[0.8, 0.2])
-
-    Order_ID = f"ORD{i+1:05d}"
-
-    orders.append({
-        "Order_ID": Order_ID,
-        "Product_Category": category,
-        "Product_Price": price,
-        "Discount_Applied": discount,
-        "Delivery_Time_Days": delivery,
-        "Customer_Type": cust_type,
-        "Payment_Method": payment,
-        "Customer_Return_Rate": ret_rate,
-        "Product_Rating": rating,
-        "Returned": returned,
-        "seller_id": seller,
-        "marketplace_id": marketplace,
-        "order_timestamp": order_time.strftime("%Y-%m-%d")
-    })
-
-orders_df = pd.DataFrame(orders)
-orders_df.to_csv("./data/orders.csv", index=False)
-
-print("Created orders.csv")
-
-# ------------------------------
-# Generate batch_predictions.csv
-# ------------------------------
-
-pred_rows = []
-for row in orders:
-    risk_score, risk_label = generate_risk()
-    
-    pred_rows.append({
-        "Order_ID": row["Order_ID"],
-        "seller_id": row["seller_id"],
-        "marketplace_id": row["marketplace_id"],
-        "Product_Category": row["Product_Category"],
-        "Customer_Type": row["Customer_Type"],
-        "Payment_Method": row["Payment_Method"],
-        "risk_score": risk_score,
-        "risk_label": risk_label,
-        "timestamp": row["order_timestamp"]
-    })
-
-pred_df = pd.DataFrame(pred_rows)
-pred_df.to_csv("./data/batch_predictions.csv", index=False)
-
-print("Created batch_predictions.csv")
-print("All mock data generated successfully!")
+# backend/generate_mock_data.py
+import argparse
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from cache import file_signature
+from ingest import log_path, prediction_log
+from storage import (
+    ORDERS_SCHEMA, PREDICTIONS_SCHEMA, ColumnWriter, csv_path, read_table, replace_dir,
+    source_fingerprint, start_csv, store_path,
+)
+
+# ------------------------------------------------------------
+# Synthetic data generator
+#
+# Writes sellers.csv, orders.csv and batch_predictions.csv (and/or the
+# columnar store, see storage.py) for any number of rows, sellers,
+# marketplaces and categories. Rows are drawn in vectorized chunks from
+# one seeded generator and streamed out chunk by chunk, so memory stays
+# flat whatever the row count; the same arguments (including
+# --chunk-rows) always produce the same data.
+#
+# Seller popularity follows a Zipf-like curve: seller k gets weight
+# 1 / k**skew (skew 0 = uniform). Each seller belongs to one
+# marketplace; sellers are split into contiguous blocks per marketplace.
+#
+# --append-days N instead adds N "new days" after the last existing
+# order: orders are appended to orders.csv and their predictions go to
+# the ingestion log (see ingest.py), one segment per day, the same way
+# batch_score.py adds them. A columnar-only dataset first gets a
+# header-only orders.csv that its store is marked as built from, so the
+# appended rows are read as a tail on top of the store. Order IDs keep
+# the width the dataset was generated with.
+# ------------------------------------------------------------
+
+DEFAULT_ROWS = 5000
+DEFAULT_SELLERS = 10
+DEFAULT_MARKETPLACES = 3
+DEFAULT_DAYS = 90
+DEFAULT_CHUNK_ROWS = 500_000
+
+BASE_CATEGORIES = ["Electronics", "Clothing", "Home", "Beauty", "Grocery", "Footwear"]
+CUSTOMER_TYPES = ["New", "Returning"]
+PAYMENTS = ["COD", "UPI", "Card", "Wallet"]
+
+# risk distribution: SPICY profile
+# ~35% high, ~30% medium, ~35% low
+RISK_BANDS = [  # (cumulative share, low, high, label)
+    (0.35, 0.75, 0.98, "High"),
+    (0.65, 0.45, 0.75, "Medium"),
+    (1.00, 0.05, 0.45, "Low"),
+]
+
+
+def _ids(prefix, n, width=3):
+    width = max(width, len(str(n)))
+    return [f"{prefix}{i:0{width}d}" for i in range(1, n + 1)]
+
+
+def make_sellers(n_sellers, n_marketplaces):
+    sellers = _ids("S", n_sellers)
+    marketplaces = _ids("M", n_marketplaces)
+    block = np.arange(n_sellers) * n_marketplaces // n_sellers
+    return pd.DataFrame({
+        "seller_id": sellers,
+        "seller_name": [f"Seller_{s}" for s in sellers],
+        "marketplace_id": np.asarray(marketplaces, dtype=object)[block],
+    })
+
+
+def make_categories(n):
+    return (BASE_CATEGORIES + _ids("Category_", max(0, n - len(BASE_CATEGORIES))))[:n]
+
+
+def seller_weights(n_sellers, skew):
+    w = 1.0 / np.arange(1, n_sellers + 1) ** skew
+    return w / w.sum()
+
+
+def _pick(rng, labels, n, p=None):
+    """Categorical of `n` draws from `labels`, with sorted categories."""
+    labels = np.asarray(labels, dtype=object)
+    order = np.argsort(labels)
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[order] = np.arange(len(labels))
+    codes = rank[rng.choice(len(labels), size=n, p=p)]
+    return pd.Categorical.from_codes(codes, categories=labels[order])
+
+
+def generate_orders(rng, n, first_id, id_width, sellers, weights, categories, first_day, n_days):
+    """Typed orders frame (ORDERS_SCHEMA) of `n` rows."""
+    seller_idx = rng.choice(len(sellers), size=n, p=weights)
+    seller_ids = sellers["seller_id"].to_numpy(dtype=object)
+    marketplace_ids = sellers["marketplace_id"].to_numpy(dtype=object)
+
+    price = np.round(rng.uniform(200, 5000, n), 2)
+    days = np.datetime64(first_day, "D") + rng.integers(0, n_days, n)
+    ids = np.char.add("ORD", np.char.zfill(np.arange(first_id, first_id + n).astype(str), id_width))
+    return pd.DataFrame({
+        "Order_ID": ids.astype(object),
+        "Product_Category": _pick(rng, categories, n),
+        "Product_Price": price,
+        "Discount_Applied": np.round(price * rng.uniform(0.05, 0.35, n), 2),
+        "Delivery_Time_Days": rng.integers(1, 8, n),
+        "Customer_Type": _pick(rng, CUSTOMER_TYPES, n),
+        "Payment_Method": _pick(rng, PAYMENTS, n),
+        "Customer_Return_Rate": np.round(rng.uniform(0.01, 0.25, n), 2),
+        "Product_Rating": np.round(rng.uniform(1.0, 5.0, n), 1),
+        "Returned": (rng.random(n) < 0.2).astype(np.int64),
+        "seller_id": pd.Categorical(seller_ids[seller_idx], categories=sorted(seller_ids)),
+        "marketplace_id": pd.Categorical(marketplace_ids[seller_idx], categories=sorted(set(marketplace_ids))),
+        "order_timestamp": days.astype("datetime64[ns]"),
+    }, columns=list(ORDERS_SCHEMA))
+
+
+def generate_predictions(rng, orders):
+    """Typed predictions frame (PREDICTIONS_SCHEMA) for `orders`."""
+    n = len(orders)
+    u = rng.random(n)
+    band = np.searchsorted([b[0] for b in RISK_BANDS], u, side="right")
+    low = np.array([b[1] for b in RISK_BANDS])[band]
+    high = np.array([b[2] for b in RISK_BANDS])[band]
+    labels = [b[3] for b in RISK_BANDS]
+    label_order = np.argsort(labels)
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[label_order] = np.arange(len(labels))
+    return pd.DataFrame({
+        "Order_ID": orders["Order_ID"],
+        "seller_id": orders["seller_id"],
+        "marketplace_id": orders["marketplace_id"],
+        "Product_Category": orders["Product_Category"],
+        "Customer_Type": orders["Customer_Type"],
+        "Payment_Method": orders["Payment_Method"],
+        "risk_score": np.round(rng.uniform(low, high), 4),
+        "risk_label": pd.Categorical.from_codes(rank[band], categories=np.asarray(labels)[label_order]),
+        "timestamp": orders["order_timestamp"],
+    }, columns=list(PREDICTIONS_SCHEMA))
+
+
+def _csv_frame(df):
+    """Dates as YYYY-MM-DD, like the original mock data."""
+    out = df.copy()
+    for col in ("order_timestamp", "timestamp"):
+        if col in out.columns:
+            out[col] = out[col].dt.strftime("%Y-%m-%d")
+    return out
+
+
+def _store_meta(path):
+    """Columnar store metadata that marks it as built from the CSV at `path`."""
+    size = os.path.getsize(path)
+    return {
+        "source_signature": list(file_signature(path)),
+        "source_bytes": size,
+        "source_fingerprint": source_fingerprint(path, size),
+    }
+
+
+def generate(data_dir, rows=DEFAULT_ROWS, n_sellers=DEFAULT_SELLERS, n_marketplaces=DEFAULT_MARKETPLACES,
+             n_categories=len(BASE_CATEGORIES), days=DEFAULT_DAYS, end_date=None, skew=0.0, seed=0,
+             chunk_rows=DEFAULT_CHUNK_ROWS, fmt="csv"):
+    """Write a fresh dataset into `data_dir`; fmt is "csv", "columnar" or "both"."""
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    end_date = end_date or date.today()
+    first_day = end_date - timedelta(days=days - 1)
+
+    sellers = make_sellers(n_sellers, n_marketplaces)
+    sellers.to_csv(csv_path(data_dir, "sellers"), index=False)
+    print("Created sellers.csv")
+
+    categories = make_categories(n_categories)
+    weights = seller_weights(n_sellers, skew)
+    id_width = max(5, len(str(rows)))
+
+    # a fresh dataset: drop the old CSVs and ingestion log
+    paths = {t: csv_path(data_dir, t) for t in ("orders", "predictions")}
+    for path in paths.values():
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(log_path(data_dir), ignore_errors=True)
+
+    writers = {}
+    if fmt in ("columnar", "both"):
+        cats = {
+            "Product_Category": sorted(categories),
+            "Customer_Type": sorted(CUSTOMER_TYPES),
+            "Payment_Method": sorted(PAYMENTS),
+            "seller_id": sorted(sellers["seller_id"]),
+            "marketplace_id": sorted(set(sellers["marketplace_id"])),
+            "risk_label": sorted(b[3] for b in RISK_BANDS),
+        }
+        for table, schema in (("orders", ORDERS_SCHEMA), ("predictions", PREDICTIONS_SCHEMA)):
+            tmp = f"{store_path(data_dir, table)}.tmp-{os.getpid()}"
+            writers[table] = ColumnWriter(
+                tmp, schema, rows, {c: cats[c] for c, k in schema.items() if k == "category"},
+                {"Order_ID": 3 + id_width},
+            )
+
+    start = time.perf_counter()
+    for first in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - first)
+        orders = generate_orders(rng, n, first + 1, id_width, sellers, weights, categories, first_day, days)
+        preds = generate_predictions(rng, orders)
+        for table, df in (("orders", orders), ("predictions", preds)):
+            if fmt in ("csv", "both"):
+                _csv_frame(df).to_csv(paths[table], mode="a", header=(first == 0), index=False)
+            if table in writers:
+                writers[table].write(df)
+        print(f"  {first + n}/{rows} rows ({time.perf_counter() - start:.1f}s)")
+
+    for table, writer in writers.items():
+        meta = _store_meta(paths[table]) if fmt == "both" else {}
+        writer.close(**meta)
+        replace_dir(writer.path, store_path(data_dir, table))
+    print("All mock data generated successfully!")
+
+
+def append_days(data_dir, n_days=1, rows_per_day=DEFAULT_ROWS, n_categories=len(BASE_CATEGORIES),
+                skew=0.0, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Add `n_days` days of orders after the last one in `data_dir`."""
+    existing = read_table(data_dir, "orders", ["Order_ID", "order_timestamp"])
+    last = existing["order_timestamp"].max()
+    next_day = (last + pd.Timedelta(days=1)).date() if pd.notna(last) else date.today()
+    next_id = len(existing) + 1
+    id_width = int(existing["Order_ID"].dropna().str.len().max() - len("ORD")) if len(existing) else 5
+    del existing
+    start_csv(data_dir, "orders")
+
+    sellers = pd.read_csv(csv_path(data_dir, "sellers"), dtype=str)
+    categories = make_categories(n_categories)
+    weights = seller_weights(len(sellers), skew)
+    log = prediction_log(data_dir)
+    rng = np.random.default_rng([seed, next_id])
+
+    for d in range(n_days):
+        day = next_day + timedelta(days=d)
+        for first in range(0, rows_per_day, chunk_rows):
+            n = min(chunk_rows, rows_per_day - first)
+            orders = generate_orders(rng, n, next_id, id_width, sellers, weights, categories, day, 1)
+            _csv_frame(orders).to_csv(csv_path(data_dir, "orders"), mode="a", header=False, index=False)
+            log.append(generate_predictions(rng, orders))
+            next_id += n
+        print(f"  appended {rows_per_day} orders for {day}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic sellers, orders and predictions.")
+    parser.add_argument("data_dir", nargs="?", default="./data")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help="orders to generate (per day with --append-days)")
+    parser.add_argument("--sellers", type=int, default=DEFAULT_SELLERS)
+    parser.add_argument("--marketplaces", type=int, default=DEFAULT_MARKETPLACES)
+    parser.add_argument("--categories", type=int, default=len(BASE_CATEGORIES))
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="date span, ending at --end-date")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="YYYY-MM-DD (default today)")
+    parser.add_argument("--skew", type=float, default=0.0, help="seller popularity skew (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--format", choices=["csv", "columnar", "both"], default="csv")
+    parser.add_argument("--append-days", type=int, default=0,
+                        help="append this many new days to the existing data instead")
+    args = parser.parse_args()
+
+    if args.append_days:
+        append_days(args.data_dir, args.append_days, args.rows, args.categories, args.skew, args.seed,
+                    args.chunk_rows)
+    else:
+        generate(args.data_dir, args.rows, args.sellers, args.marketplaces, args.categories, args.days,
+                 args.end_date, args.skew, args.seed, args.chunk_rows, args.format)
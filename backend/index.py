@@ -0,0 +1,161 @@
+# backend/index.py
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------
+# Partition index
+#
+# Maps every value of a key column (seller_id, marketplace_id) to the
+# ascending row positions holding it, so one partition can be pulled
+# out of a table without scanning every row. The index only stores
+# positions; the table's column buffers are never copied.
+# ------------------------------------------------------------
+
+def _group_positions(keys, offset=0):
+    """{key: ascending positions} for one key column, in a single sort."""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        codes = keys.cat.codes.to_numpy()
+        uniques = keys.cat.categories
+    else:
+        codes, uniques = pd.factorize(keys)
+
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate([[0], bounds]) if len(order) else bounds
+
+    groups = {}
+    for start, rows in zip(starts, np.split(order.astype(np.int64) + offset, bounds)):
+        code = sorted_codes[start]
+        if code < 0:
+            continue  # missing key
+        groups[uniques[code]] = rows
+    return groups
+
+
+class PartitionIndex:
+    def __init__(self, groups, n_rows, source=None):
+        self._groups = groups
+        self.n_rows = n_rows
+        # where the indexed rows came from (see storage.read_csv_typed attrs)
+        self.source = source or {}
+
+    @classmethod
+    def build(cls, keys, source=None):
+        return cls(_group_positions(keys), len(keys), source)
+
+    def extend(self, new_keys, source=None):
+        """Index with `new_keys` appended after the current rows.
+
+        Costs O(len(new_keys)) plus a concatenate for each touched key;
+        the current index is left unchanged for readers still using it.
+        """
+        groups = dict(self._groups)
+        for key, rows in _group_positions(new_keys, offset=self.n_rows).items():
+            old = groups.get(key)
+            groups[key] = rows if old is None else np.concatenate([old, rows])
+        return PartitionIndex(groups, self.n_rows + len(new_keys), source)
+
+    def keys(self):
+        return list(self._groups)
+
+    def rows(self, key):
+        return self._groups.get(key, np.empty(0, dtype=np.int64))
+
+    def take(self, df, key):
+        """Rows of `df` for `key`. `df` may be a newer, longer version of
+        the indexed table; positions past its end are ignored."""
+        rows = self.rows(key)
+        if len(rows) and rows[-1] >= len(df):
+            rows = rows[: np.searchsorted(rows, len(df))]
+        return df.iloc[rows]
+
+    def counts(self):
+        return {k: len(v) for k, v in self._groups.items()}
+
+
+# ------------------------------------------------------------
+# Time index
+#
+# Like the partition index, but each key's positions are ordered by a
+# timestamp column and kept next to those sorted timestamps, so a
+# [start, end) window of one partition is two binary searches. The key
+# None covers the whole table. Rows without a timestamp are left out.
+# ------------------------------------------------------------
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _time_groups(keys, times, offset=0):
+    """{key: (ascending int64 ns timestamps, positions)}, plus None for all rows."""
+    ns = times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    rows = np.flatnonzero(ns != _NAT)
+    ns = ns[rows]
+
+    order = np.argsort(ns, kind="stable")
+    groups = {None: (ns[order], rows[order] + offset)}
+    if keys is None:
+        return groups
+
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        codes = keys.cat.codes.to_numpy()[rows]
+        uniques = keys.cat.categories
+    else:
+        codes, uniques = pd.factorize(keys)
+        codes = codes[rows]
+
+    order = np.lexsort((ns, codes))
+    sorted_codes = codes[order]
+    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate([[0], bounds]) if len(order) else bounds
+    for start, part in zip(starts, np.split(order, bounds)):
+        code = sorted_codes[start]
+        if code < 0:
+            continue  # missing key
+        groups[uniques[code]] = (ns[part], rows[part] + offset)
+    return groups
+
+
+class TimeIndex:
+    def __init__(self, groups, n_rows, source=None):
+        self._groups = groups
+        self.n_rows = n_rows
+        # where the indexed rows came from (see storage.read_csv_typed attrs)
+        self.source = source or {}
+
+    @classmethod
+    def build(cls, keys, times, source=None):
+        """`keys` may be None to index the whole table only."""
+        return cls(_time_groups(keys, times), len(times), source)
+
+    def extend(self, new_keys, new_times, source=None):
+        """Index with rows appended after the current ones. Appended rows
+        are usually the newest, which is a plain concatenate; otherwise
+        the touched keys are re-sorted."""
+        groups = dict(self._groups)
+        for key, (ts, rows) in _time_groups(new_keys, new_times, offset=self.n_rows).items():
+            old = groups.get(key)
+            if old is not None and len(old[0]):
+                old_ts, old_rows = old
+                ts, rows = np.concatenate([old_ts, ts]), np.concatenate([old_rows, rows])
+                if len(ts) > len(old_ts) and ts[len(old_ts)] < old_ts[-1]:
+                    order = np.argsort(ts, kind="stable")
+                    ts, rows = ts[order], rows[order]
+            groups[key] = (ts, rows)
+        return TimeIndex(groups, self.n_rows + len(new_times), source)
+
+    def window(self, key, start=None, end=None):
+        """Ascending positions of `key`'s rows with start <= timestamp < end
+        (int64 ns; None leaves that side open)."""
+        ts, rows = self._groups.get(key, (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)))
+        lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+        hi = len(ts) if end is None else np.searchsorted(ts, end, side="left")
+        return np.sort(rows[lo:hi])
+
+    def take(self, df, key, start=None, end=None):
+        """Rows of `df` for `key` within the window, in table order. `df`
+        may be a newer, longer version of the indexed table."""
+        rows = self.window(key, start, end)
+        if len(rows) and rows[-1] >= len(df):
+            rows = rows[: np.searchsorted(rows, len(df))]
+        return df.iloc[rows]
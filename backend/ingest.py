@@ -0,0 +1,311 @@
+# backend/ingest.py
+import fcntl
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from storage import META_FILE, PREDICTIONS_SCHEMA, apply_schema, concat_frames, empty_frame, read_columns, write_columns
+
+# ------------------------------------------------------------
+# Prediction ingestion log
+#
+# New prediction batches are written as immutable segments under
+# data/predictions_log/, each a columnar directory (see storage.py)
+# named seg-<first>-<last> after the range of append sequence numbers
+# it holds. A segment is written under a dot-prefixed temporary name
+# and renamed into place, so readers only ever see complete segments
+# and never take a lock. Writers hold .lock only to pick the next
+# sequence number and rename.
+#
+# compact() merges runs of small segments into one larger segment
+# (same rows, same order) and then removes the inputs. Readers pick the
+# widest segments covering each sequence range, so a listing taken
+# mid-compaction still sees every row exactly once; a segment removed
+# between listing and reading just triggers a re-list.
+#
+# Predictions as served by the API are batch_predictions.csv followed
+# by the log's rows in sequence order.
+# ------------------------------------------------------------
+
+LOG_DIR = "predictions_log"
+LOCK_FILE = ".lock"
+SMALL_SEGMENT_ROWS = 50_000
+TARGET_SEGMENT_ROWS = 1_000_000
+MIN_COMPACT_SEGMENTS = 4
+COMPACT_INTERVAL_S = float(os.environ.get("LOG_COMPACT_INTERVAL_S", "60"))
+
+_SEGMENT_RE = re.compile(r"^seg-(\d{12})-(\d{12})$")
+
+
+def log_path(data_dir):
+    return os.path.join(data_dir, LOG_DIR)
+
+
+def segment_name(first, last):
+    return f"seg-{first:012d}-{last:012d}"
+
+
+class PredictionLog:
+    def __init__(self, path, schema=PREDICTIONS_SCHEMA):
+        self.path = path
+        self.schema = schema
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ---------------------------------------------------------
+    # Listing
+    # ---------------------------------------------------------
+
+    def _listing(self):
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            m = _SEGMENT_RE.match(name)
+            if m:
+                found.append((int(m.group(1)), int(m.group(2)), name))
+        return found
+
+    def segments(self):
+        """[(first, last, name)] covering every sequence number once, widest
+        segments first where a compacted segment and its inputs coexist."""
+        covered, out = 0, []
+        for first, last, name in sorted(self._listing(), key=lambda s: (s[0], -s[1])):
+            if last <= covered:
+                continue  # inside a segment already taken
+            out.append((first, last, name))
+            covered = last
+        return out
+
+    def last_seq(self):
+        return max((last for _, last, _ in self._listing()), default=0)
+
+    # ---------------------------------------------------------
+    # Writing
+    # ---------------------------------------------------------
+
+    def _write_tmp(self, df, parts):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, f".tmp-{os.getpid()}-{uuid.uuid4().hex}")
+        write_columns(df, self.schema, tmp, parts=parts)
+        return tmp
+
+    def append(self, df):
+        """Write `df` as a new segment; returns its sequence number."""
+        df = apply_schema(df, self.schema)
+        tmp = self._write_tmp(df, parts=None)
+        with self._locked():
+            seq = self.last_seq() + 1
+            self._set_parts(tmp, [[seq, seq, int(len(df))]])
+            os.rename(tmp, os.path.join(self.path, segment_name(seq, seq)))
+        return seq
+
+    @staticmethod
+    def _set_parts(path, parts):
+        meta_path = os.path.join(path, META_FILE)
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        meta["parts"] = parts
+        with open(meta_path, "w") as fh:
+            json.dump(meta, fh)
+
+    # ---------------------------------------------------------
+    # Reading
+    # ---------------------------------------------------------
+
+    def _read_meta(self, name):
+        with open(os.path.join(self.path, name, META_FILE)) as fh:
+            return json.load(fh)
+
+    def read(self, columns=None, after=0):
+        """Typed frame of every row with sequence number > `after`, in
+        sequence order, with attrs["log_seq"] set to the last sequence
+        number read. None if the log no longer holds a boundary at
+        `after` (it was truncated or rewritten)."""
+        columns = list(self.schema) if columns is None else list(columns)
+        for _ in range(5):
+            try:
+                return self._read(columns, after)
+            except FileNotFoundError:
+                continue  # a segment was compacted away after listing
+        return self._read(columns, after)
+
+    def _read_segment(self, first, name, columns, after):
+        """The segment's rows with sequence number > `after`; None if no
+        part of it starts right after `after`."""
+        meta = self._read_meta(name)
+        df = read_columns(os.path.join(self.path, name), self.schema, meta, columns)
+        if first <= after:
+            # keep only the parts appended after `after`
+            skip = 0
+            for p_first, p_last, rows in meta["parts"]:
+                if p_last <= after:
+                    skip += rows
+                elif p_first <= after:
+                    return None
+            df = df.iloc[skip:]
+        return df
+
+    def _read(self, columns, after):
+        frames, last_seq = [], after
+        segments = self.segments()
+        if (segments[-1][1] if segments else 0) < after:
+            return None
+        for first, last, name in segments:
+            if last <= after:
+                continue
+            df = self._read_segment(first, name, columns, after)
+            if df is None:
+                return None
+            frames.append(df)
+            last_seq = last
+
+        df = concat_frames(frames) if frames else empty_frame(self.schema, columns)
+        df.attrs["log_seq"] = last_seq
+        return df
+
+    def iter_read(self, columns=None):
+        """Every row, like read(), but yielded one segment at a time so
+        only one segment's columns are in memory at once. A segment
+        compacted away meanwhile is picked up from the merged segment."""
+        columns = list(self.schema) if columns is None else list(columns)
+        done, retries = 0, 0
+        while True:
+            try:
+                for first, last, name in self.segments():
+                    if last <= done:
+                        continue
+                    df = self._read_segment(first, name, columns, done)
+                    if df is None:
+                        raise RuntimeError(f"prediction log {self.path} was rewritten while being read")
+                    done = last
+                    yield df
+                return
+            except FileNotFoundError:
+                retries += 1
+                if retries > 5:
+                    raise
+
+    def read_onto(self, base, columns=None, after=0):
+        """`base` followed by the log rows after `after`; the result keeps
+        base's attrs plus log_seq and log_rows (log rows included)."""
+        tail = self.read(columns, after)
+        if tail is None:
+            return None
+        # never touch `base` itself: it may be a cached, shared frame
+        out = base.copy(deep=False) if tail.empty else concat_frames([base, tail])
+        out.attrs = dict(base.attrs)
+        out.attrs["log_seq"] = tail.attrs["log_seq"]
+        out.attrs["log_rows"] = base.attrs.get("log_rows", 0) + len(tail)
+        return out
+
+    # ---------------------------------------------------------
+    # Compaction
+    # ---------------------------------------------------------
+
+    def _compaction_runs(self, segments, metas, small_rows, target_rows, min_segments):
+        runs, run, rows = [], [], 0
+        for seg in segments:
+            n = metas[seg[2]]["rows"]
+            if n < small_rows and rows + n <= target_rows:
+                run.append(seg)
+                rows += n
+                continue
+            if len(run) >= min_segments:
+                runs.append(run)
+            run, rows = ([seg], n) if n < small_rows else ([], 0)
+        if len(run) >= min_segments:
+            runs.append(run)
+        return runs
+
+    def compact(self, small_rows=SMALL_SEGMENT_ROWS, target_rows=TARGET_SEGMENT_ROWS,
+                min_segments=MIN_COMPACT_SEGMENTS):
+        """Merge runs of at least `min_segments` adjacent small segments.
+        Returns the number of segments merged away."""
+        segments = self.segments()
+        try:
+            metas = {name: self._read_meta(name) for _, _, name in segments}
+        except FileNotFoundError:
+            return 0  # another compaction is running
+        merged = 0
+        for run in self._compaction_runs(segments, metas, small_rows, target_rows, min_segments):
+            try:
+                frames = [read_columns(os.path.join(self.path, name), self.schema, metas[name])
+                          for _, _, name in run]
+            except FileNotFoundError:
+                continue
+            parts = [p for _, _, name in run for p in metas[name]["parts"]]
+            tmp = self._write_tmp(concat_frames(frames), parts)
+            target = os.path.join(self.path, segment_name(run[0][0], run[-1][1]))
+            with self._locked():
+                inputs_present = all(os.path.exists(os.path.join(self.path, n)) for _, _, n in run)
+                if not inputs_present or os.path.exists(target):
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    continue
+                os.rename(tmp, target)
+            # readers now prefer the merged segment; the inputs can go
+            for _, _, name in run:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+            merged += len(run)
+        return merged
+
+
+def prediction_log(data_dir):
+    return PredictionLog(log_path(data_dir))
+
+
+class BackgroundCompactor:
+    """Runs log.compact() every `interval_s` seconds in a daemon thread,
+    started lazily (and again after a fork)."""
+
+    def __init__(self, log, interval_s=COMPACT_INTERVAL_S):
+        self.log = log
+        self.interval = interval_s
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.merged = 0
+
+    def ensure_running(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="log-compactor", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.merged += self.log.compact()
+                self.runs += 1
+            except Exception as e:
+                print(f"log compaction failed: {e}", file=sys.stderr)
+
+    def stats(self):
+        return {"interval_s": self.interval, "runs": self.runs, "segments_merged": self.merged}
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    log = prediction_log(data_dir)
+    print(f"Merged {log.compact()} segments; {len(log.segments())} segments remain")
@@ -0,0 +1,189 @@
+# backend/metrics.py
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ------------------------------------------------------------
+# Histograms
+# ------------------------------------------------------------
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds inclusive, plus +Inf)."""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """{"buckets": [[upper_bound, cumulative_count], ...], "count", "sum"}"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = [], 0
+        for bound, n in zip(self.buckets + [float("inf")], counts):
+            running += n
+            cumulative.append([bound, running])
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+
+# ------------------------------------------------------------
+# Request stage timing
+#
+# app.py starts a RequestTrace for every request; code wrapped in
+# stage("name") or decorated with @timed (loaders, aggregations,
+# serialization) then records its wall time into a per-(route, stage)
+# histogram, exported by /metrics. Stages nest, so a stage's time
+# includes the stages inside it. Outside a request (CLIs, the batcher
+# thread) both are a plain call. With keep_stages the trace also keeps
+# the individual timings, for ?profile=1; profiled requests are not
+# recorded in the histograms (record=False), being slower than usual.
+# ------------------------------------------------------------
+
+class RequestTrace:
+    def __init__(self, route, keep_stages=False, record=True):
+        self.route = route
+        self.record = record
+        self.started = time.perf_counter()
+        self.stages = [] if keep_stages else None
+        self.depth = 0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+class HistogramFamily:
+    """Histograms keyed by a tuple of label values, created on first use."""
+
+    def __init__(self, label_names, buckets=LATENCY_BUCKETS_MS):
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        hist = self._histograms.get(labels)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(labels, Histogram(self.buckets))
+        hist.observe(value)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+
+_current_trace = ContextVar("request_trace", default=None)
+
+stage_durations = HistogramFamily(["route", "stage"])
+request_durations = HistogramFamily(["route", "status"])
+
+
+def start_trace(route, keep_stages=False, record=True):
+    """Make a new trace current for this thread / context and return it."""
+    trace = RequestTrace(route, keep_stages, record)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace(trace, status):
+    """Record the request's total time and stop tracing."""
+    if trace.record:
+        request_durations.observe((trace.route, str(status)), trace.elapsed_ms())
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+
+
+@contextmanager
+def stage(name):
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    entry = None
+    if trace.stages is not None:
+        entry = {"stage": name, "depth": trace.depth, "start_ms": round(trace.elapsed_ms(), 3)}
+        trace.stages.append(entry)
+    depth = trace.depth
+    trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        trace.depth = depth
+        if trace.record:
+            stage_durations.observe((trace.route, name), ms)
+        if entry is not None:
+            entry["ms"] = round(ms, 3)
+
+
+def timed(fn):
+    """Run `fn` as a stage named after it."""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return fn(*args, **kwargs)
+        with stage(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# ------------------------------------------------------------
+# Prometheus text exposition
+# ------------------------------------------------------------
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def prometheus_histogram(name, help_text, series):
+    """Text lines for one histogram metric; `series` is a list of
+    ([(label, value), ...], Histogram)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for pairs, hist in series:
+        snap = hist.snapshot()
+        for bound, count in snap["buckets"]:
+            lines.append(f"{name}_bucket{_labels(list(pairs) + [('le', _bound(bound))])} {count}")
+        lines.append(f"{name}_sum{_labels(pairs)} {snap['sum']!r}")
+        lines.append(f"{name}_count{_labels(pairs)} {snap['count']}")
+    return lines
+
+
+def family_series(family):
+    return [(list(zip(family.label_names, labels)), hist) for labels, hist in family.items()]
+
+
+def prometheus_counter(name, help_text, series):
+    """`series` is a list of ([(label, value), ...], number)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{_labels(pairs)} {value}" for pairs, value in series]
+    return lines
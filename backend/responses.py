@@ -0,0 +1,164 @@
+# backend/responses.py
+import dataclasses
+import decimal
+import gzip
+import os
+import uuid
+import zlib
+from datetime import date
+
+import numpy as np
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # plain json via Flask's provider
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ------------------------------------------------------------
+# JSON response encoding
+#
+# Responses are encoded with orjson when it is installed: NumPy arrays
+# and scalars, NaN (as null) and non-str keys are handled natively,
+# and keys are sorted as Flask does. Dates and datetimes keep Flask's
+# HTTP-date rendering so existing payloads do not change.
+#
+# Frames are turned into JSON from their column arrays: records
+# (the default shape, missing values as "") are zipped from per-column
+# lists instead of going through DataFrame.to_dict, and the columnar
+# shape ({column: [values]}, missing values as null) hands numeric
+# columns to orjson as arrays, with no per-row objects at all.
+#
+# Bodies of at least COMPRESS_MIN_BYTES are compressed with brotli
+# (if installed) or gzip when the client accepts it; streamed bodies
+# are compressed as they are produced.
+# ------------------------------------------------------------
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "4096"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+RESPONSE_FORMATS = ("json", "columnar")  # ?format=; "json" is the records shape
+
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS
+    )
+
+
+def _default(o):
+    """Types orjson leaves to us, rendered as Flask's provider does."""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=False):
+    """`obj` as JSON bytes (requires orjson)."""
+    option = ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+# ------------------------------------------------------------
+# Frames
+# ------------------------------------------------------------
+
+def _plain_dtype(series):
+    return series.dtype.kind in "biuf" and isinstance(series.dtype, np.dtype)
+
+
+def record_values(series):
+    """Column as a list of the values DataFrame.astype(object) would give,
+    missing values as ""."""
+    if _plain_dtype(series):
+        values = series.to_numpy().tolist()
+    else:
+        values = series.to_numpy(dtype=object).tolist()
+    missing = series.isna().to_numpy()
+    if missing.any():
+        for i in np.flatnonzero(missing):
+            values[i] = ""
+    return values
+
+
+def frame_records(df):
+    """[{column: value}] for every row, missing values as ""."""
+    columns = [record_values(df[c]) for c in df.columns]
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def column_values(series):
+    """Column for the columnar shape: numeric columns as arrays (lists
+    without orjson), everything else as a list, missing values as null."""
+    if _plain_dtype(series):
+        values = np.ascontiguousarray(series.to_numpy())
+        if orjson is not None:
+            return values  # NaN -> null
+        return [None if v != v else v for v in values.tolist()]
+    values = series.to_numpy(dtype=object).tolist()
+    missing = series.isna().to_numpy()
+    if missing.any():
+        for i in np.flatnonzero(missing):
+            values[i] = None
+    return values
+
+
+def frame_columns(df):
+    """{column: values} for the columnar response shape."""
+    return {c: column_values(df[c]) for c in df.columns}
+
+
+def frame_payload(df, fmt="json"):
+    return frame_columns(df) if fmt == "columnar" else frame_records(df)
+
+
+# ------------------------------------------------------------
+# Compression
+# ------------------------------------------------------------
+
+def accepted_encoding(accept_encodings):
+    """"br", "gzip" or None for a request's Accept-Encoding (werkzeug)."""
+    offered = (["br"] if brotli is not None else []) + ["gzip"]
+    return accept_encodings.best_match(offered)
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding):
+    """Compressed `chunks` (str or bytes), emitted as they fill up; closes
+    `chunks` when done, as the server would have."""
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = c.process, c.finish
+    else:
+        c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = c.compress, c.flush
+    try:
+        for chunk in chunks:
+            out = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,260 @@
+# backend/scoring.py
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from cache import file_signature
+from compact_model import META_FILE as COMPACT_META_FILE, compact_path, load_compact
+from features import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from train_seller_models import encode_features, prepare_features
+
+# ------------------------------------------------------------
+# Online scoring with the per-seller model bundles
+#
+# Bundles ({'model', 'encoder', 'features'}, written by
+# train_seller_models.py) are loaded on first use and kept in an LRU
+# cache bounded by an estimate of their resident size, so only the
+# recently used sellers' forests stay in memory. A seller's compact
+# artifact (compact_model.py) is preferred over its joblib file.
+# ------------------------------------------------------------
+
+# same bands as the batch predictions
+HIGH_RISK_THRESHOLD = 0.75
+MEDIUM_RISK_THRESHOLD = 0.45
+
+DEFAULT_MODEL_CACHE_BYTES = int(os.environ.get("MODEL_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+def model_path(models_dir, seller_id):
+    return os.path.join(models_dir, f"model_{seller_id}.joblib")
+
+
+def risk_label(score):
+    if score >= HIGH_RISK_THRESHOLD:
+        return "High"
+    if score >= MEDIUM_RISK_THRESHOLD:
+        return "Medium"
+    return "Low"
+
+
+def bundle_nbytes(bundle, path=None):
+    """Approximate resident size of a model bundle: the node and value
+    arrays of every tree, or the file size for other estimators."""
+    model = bundle["model"]
+    if hasattr(model, "nbytes"):
+        return model.nbytes
+    trees = getattr(model, "estimators_", None)
+    if trees is not None and hasattr(trees[0], "tree_"):
+        total = 0
+        for est in trees:
+            state = est.tree_.__getstate__()
+            total += state["nodes"].nbytes + state["values"].nbytes
+        return total
+    return os.path.getsize(path) if path else 0
+
+
+class ModelCache:
+    def __init__(self, models_dir, max_bytes=DEFAULT_MODEL_CACHE_BYTES, prefer="compact"):
+        self.models_dir = models_dir
+        self.max_bytes = max_bytes
+        # "compact": memory-mapped arrays, fastest to load and for small batches;
+        # "joblib": sklearn's compiled predictor, faster on large batches
+        self.prefer = prefer
+        self._entries = OrderedDict()  # seller_id -> (signature, bundle, nbytes)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key_lock(self, seller_id):
+        with self._lock:
+            lock = self._key_locks.get(seller_id)
+            if lock is None:
+                lock = self._key_locks[seller_id] = threading.Lock()
+            return lock
+
+    def _lookup(self, seller_id, signature):
+        entry = self._entries.get(seller_id)
+        if entry is not None and entry[0] == signature:
+            self._entries.move_to_end(seller_id)
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def _locate(self, seller_id):
+        """(signature, loader) for the seller's artifact, or (None, None)."""
+        compact = compact_path(self.models_dir, seller_id)
+        path = model_path(self.models_dir, seller_id)
+        candidates = [
+            ("compact", os.path.join(compact, COMPACT_META_FILE), lambda: load_compact(compact)),
+            ("joblib", path, lambda: joblib.load(path)),
+        ]
+        if self.prefer == "joblib":
+            candidates.reverse()
+        for kind, marker, loader in candidates:
+            signature = file_signature(marker)
+            if signature is not None:
+                return (kind, signature), loader
+        return None, None
+
+    def get(self, seller_id):
+        """The seller's bundle, or None if no model has been trained for it."""
+        signature, loader = self._locate(seller_id)
+        if signature is None:
+            return None
+
+        with self._lock:
+            bundle = self._lookup(seller_id, signature)
+            if bundle is not None:
+                return bundle
+
+        with self._key_lock(seller_id):
+            with self._lock:
+                bundle = self._lookup(seller_id, signature)
+                if bundle is not None:
+                    return bundle
+
+            bundle = loader()
+            nbytes = bundle_nbytes(bundle, model_path(self.models_dir, seller_id))
+
+            with self._lock:
+                old = self._entries.pop(seller_id, None)
+                if old is not None:
+                    self.bytes -= old[2]
+                self._entries[seller_id] = (signature, bundle, nbytes)
+                self.bytes += nbytes
+                self.misses += 1
+                # evict least recently used, but always keep the one just loaded
+                while self.bytes > self.max_bytes and len(self._entries) > 1:
+                    _, (_, _, freed) = self._entries.popitem(last=False)
+                    self.bytes -= freed
+                    self.evictions += 1
+            return bundle
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+    return False
+
+
+def order_error(order):
+    """Error dict for an order that cannot be scored as sent, else None:
+    seller_id must be a string or integer, numeric features numbers (or
+    numeric strings) and categorical features strings; null is allowed."""
+    seller_id = order.get("seller_id")
+    invalid = []
+    if seller_id is not None and (isinstance(seller_id, bool) or not isinstance(seller_id, (str, int))):
+        invalid.append("seller_id")
+    for c in NUMERIC_FEATURES:
+        value = order.get(c)
+        if value is not None and not _is_number(value):
+            invalid.append(c)
+    for c in CATEGORICAL_FEATURES:
+        value = order.get(c)
+        if value is not None and not isinstance(value, str):
+            invalid.append(c)
+    if not invalid:
+        return None
+    order_id = order.get("Order_ID")
+    return {
+        "Order_ID": order_id if isinstance(order_id, (str, int, float)) else None,
+        "seller_id": seller_id if "seller_id" not in invalid else None,
+        "error": "invalid_fields",
+        "invalid": invalid,
+    }
+
+
+def error_results(rows, seller_id, error):
+    """One result dict per row of `rows` carrying `error`."""
+    order_ids = rows["Order_ID"] if "Order_ID" in rows.columns else [None] * len(rows)
+    return [{"Order_ID": oid, "seller_id": seller_id, **error} for oid in order_ids]
+
+
+def predict_proba_for_bundle(bundle, df):
+    """P(returned) for each row of `df` with one vectorized model call."""
+    return predict_proba_matrix(bundle, encode_features(prepare_features(df), bundle["encoder"]))
+
+
+def predict_proba_matrix(bundle, X):
+    """P(returned) for already encoded rows (see features.py)."""
+    model = bundle["model"]
+    proba = model.predict_proba(X)
+    classes = list(model.classes_)
+    if 1 not in classes:
+        return np.zeros(len(X))
+    return proba[:, classes.index(1)]
+
+
+def score_seller_rows(seller_id, rows, model_cache):
+    """Result dicts for `rows` (a DataFrame of one seller's orders),
+    scored with a single vectorized call on the seller's model. A model
+    that fails to load or predict gives every row a "scoring_failed" error."""
+    order_ids = rows["Order_ID"] if "Order_ID" in rows.columns else [None] * len(rows)
+
+    if seller_id is None or pd.isna(seller_id):
+        return error_results(rows, None, {"error": "missing_seller_id"})
+    try:
+        bundle = model_cache.get(str(seller_id))
+        if bundle is None:
+            return error_results(rows, seller_id, {"error": "no_model"})
+        missing = [c for c in bundle["features"] if c not in rows.columns]
+        if missing:
+            return error_results(rows, seller_id, {"error": "missing_features", "missing": missing})
+        scores = predict_proba_for_bundle(bundle, rows)
+    except Exception:
+        return error_results(rows, seller_id, {"error": "scoring_failed"})
+    return [
+        {
+            "Order_ID": oid,
+            "seller_id": seller_id,
+            "risk_score": round(float(score), 4),
+            "risk_label": risk_label(score),
+        }
+        for oid, score in zip(order_ids, scores)
+    ]
+
+
+def score_orders(orders, model_cache):
+    """Score a list of order dicts, routing each to its seller's model.
+
+    Returns one result dict per order, in input order: risk_score and
+    risk_label, or an "error" for orders that cannot be scored.
+    """
+    df = pd.DataFrame(orders)
+    results = [None] * len(df)
+    if df.empty:
+        return results
+    if "seller_id" not in df.columns:
+        df["seller_id"] = None
+
+    for seller_id, group in df.groupby("seller_id", sort=False, dropna=False):
+        positions = df.index.get_indexer(group.index)
+        for i, result in zip(positions, score_seller_rows(seller_id, group, model_cache)):
+            results[i] = result
+    return results
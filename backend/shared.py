@@ -0,0 +1,126 @@
+# backend/shared.py
+import fcntl
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+
+from storage import COLUMNAR_DIR, META_FILE, TABLES, read_columns, write_columns
+
+# ------------------------------------------------------------
+# Shared dataset snapshots
+#
+# With SHARED_DATASET=1, orders and predictions are published once as
+# a columnar snapshot (see storage.write_columns) and every worker
+# process memory-maps it read-only instead of holding its own copy:
+# numeric, categorical-code and timestamp columns are views onto the
+# page cache, shared by all workers. Point SHARED_DATASET_DIR at a
+# tmpfs such as /dev/shm to keep the snapshots in shared memory rather
+# than on disk. Only "str" columns (Order_ID, seller_name) become
+# Python objects in each process that reads them.
+#
+# <dir>/<table>/STATE is the version counter:
+#   {"version": N, "dataset_version": ..., "source": read attrs}
+# and v<N>/ holds the columns of version N. Publishing (under .lock)
+# writes the next version, then replaces STATE; workers re-attach when
+# STATE changes. Mapped snapshots stay valid after they are removed,
+# so only the last KEEP_VERSIONS are kept.
+# ------------------------------------------------------------
+
+SHARED_DATASET = os.environ.get("SHARED_DATASET", "0") == "1"
+SHARED_TABLES = ("orders", "predictions")
+STATE_FILE = "STATE"
+LOCK_FILE = ".lock"
+KEEP_VERSIONS = 2
+
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+
+def shared_dir(data_dir):
+    return os.environ.get("SHARED_DATASET_DIR") or os.path.join(data_dir, COLUMNAR_DIR, "shared")
+
+
+class SharedTable:
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.state_path = os.path.join(path, STATE_FILE)
+
+    def state(self):
+        """The published state; {} before the first publish."""
+        try:
+            with open(self.state_path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, state):
+        tmp = f"{self.state_path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as fh:
+            json.dump(state, fh, default=int)
+        os.replace(tmp, self.state_path)
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ---------------------------------------------------------
+    # Publishing (call with the lock held)
+    # ---------------------------------------------------------
+
+    def publish(self, df, dataset_version):
+        """Write `df` as the next version and make it current."""
+        version = self.state().get("version", 0) + 1
+        tmp = os.path.join(self.path, f".tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        write_columns(df, self.schema, tmp)
+        os.rename(tmp, os.path.join(self.path, f"v{version}"))
+        self._write_state({"version": version, "dataset_version": dataset_version, "source": dict(df.attrs)})
+        self._prune(version)
+        return version
+
+    def relabel(self, dataset_version, source):
+        """Record that the current version is also current for
+        `dataset_version` (the files changed, the rows did not)."""
+        state = self.state()
+        self._write_state(dict(state, dataset_version=dataset_version, source=source))
+
+    def _prune(self, version):
+        for name in os.listdir(self.path):
+            m = _VERSION_RE.match(name)
+            if m and int(m.group(1)) <= version - KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    # ---------------------------------------------------------
+    # Attaching
+    # ---------------------------------------------------------
+
+    def attach(self, columns=None):
+        """Read-only, memory-mapped frame of the current version with the
+        attrs of the read it was published from."""
+        for attempt in range(5):
+            state = self.state()
+            if not state:
+                return None
+            path = os.path.join(self.path, f"v{state['version']}")
+            try:
+                with open(os.path.join(path, META_FILE)) as fh:
+                    meta = json.load(fh)
+                df = read_columns(path, self.schema, meta, columns, mmap_mode="r")
+            except FileNotFoundError:
+                if attempt == 4:
+                    raise
+                continue  # pruned after a newer publish; re-read STATE
+            df.attrs.update(state["source"])
+            return df
+
+
+def shared_table(data_dir, table):
+    return SharedTable(os.path.join(shared_dir(data_dir), table), TABLES[table][1])
@@ -0,0 +1,414 @@
+# backend/sqlstore.py
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from aggregates import RISK_FRACTION_BITS, RISK_LIMB_BITS, ScopeAggregates, limb_total, risk_limbs
+from alerts import HIGH_RISK_THRESHOLD
+from metrics import timed
+from storage import ORDERS_SCHEMA, PREDICTIONS_SCHEMA
+
+# ------------------------------------------------------------
+# SQLite analytics backend
+#
+# With ANALYTICS_BACKEND=sqlite the aggregation endpoints are answered
+# by queries against one on-disk SQLite file (data/analytics.sqlite,
+# or ANALYTICS_SQLITE_PATH) instead of pandas over loaded frames, so
+# workers hold no table in memory and all of them share the same file.
+#
+# The file holds the columns the aggregations use, with timestamps as
+# int64 ns plus a `day` column (days since 1970-01-01), and indexes on
+# seller_id, marketplace_id, the timestamp and Product_Category. It is
+# brought up to date by utils.load_sqlite_store: appended rows are
+# inserted, anything else rebuilds the table, each in one transaction
+# (readers keep seeing the previous state until it commits).
+#
+# Results are identical to the pandas path: grouped rows come back as
+# ScopeAggregates tables and are rendered by the same code, and risk
+# sums are the exact limb sums of aggregates.risk_limbs, computed by
+# SQLite itself (integer casts and shifts summed with TOTAL()), so no
+# Python runs per row. A day whose risk scores are all missing has
+# avg_risk None, as the pandas path renders it.
+#
+# Each thread reading a store gets its own read-only connection. When a
+# sync replaces the store, close() closes them; one that is running a
+# query is closed when the query returns, and a thread still holding
+# the old store afterwards gets a one-off connection per query.
+# ------------------------------------------------------------
+
+ANALYTICS_BACKENDS = ("pandas", "sqlite")
+ANALYTICS_BACKEND = os.environ.get("ANALYTICS_BACKEND", "pandas")
+if ANALYTICS_BACKEND not in ANALYTICS_BACKENDS:
+    raise ValueError(f"ANALYTICS_BACKEND must be one of {ANALYTICS_BACKENDS}, got {ANALYTICS_BACKEND!r}")
+
+SQLITE_FILE = "analytics.sqlite"
+BUSY_TIMEOUT_S = 300  # a writer may be rebuilding a table
+INSERT_CHUNK_ROWS = 50_000
+
+SQL_SCHEMAS = {"orders": ORDERS_SCHEMA, "predictions": PREDICTIONS_SCHEMA}
+SQL_COLUMNS = {
+    "orders": ["seller_id", "marketplace_id", "Payment_Method", "Product_Rating", "Returned", "order_timestamp"],
+    "predictions": ["seller_id", "marketplace_id", "Product_Category", "risk_score", "risk_label", "timestamp"],
+}
+TIME_COLUMNS = {"orders": "order_timestamp", "predictions": "timestamp"}
+INDEXES = {
+    "orders": ["seller_id", "marketplace_id", "order_timestamp"],
+    "predictions": ["seller_id", "marketplace_id", "timestamp", "Product_Category"],
+}
+
+_SQL_TYPES = {"str": "TEXT", "category": "TEXT", "float": "REAL", "int": "INTEGER", "datetime": "INTEGER"}
+_NAT = np.iinfo(np.int64).min
+_NS_PER_DAY = 86_400 * 10**9
+_EPOCH = date(1970, 1, 1)
+
+# grouping name (ScopeAggregates field) -> prediction columns grouped by
+GROUPINGS = {
+    "daily": ("day",),
+    "category": ("Product_Category",),
+    "seller": ("seller_id",),
+    "category_daily": ("Product_Category", "day"),
+}
+
+
+def sqlite_path(data_dir):
+    return os.environ.get("ANALYTICS_SQLITE_PATH") or os.path.join(data_dir, SQLITE_FILE)
+
+
+# risk_score as the int64 q of aggregates.risk_limbs (CAST truncates
+# toward zero, >> sign-extends), and the sums of its three limbs
+_RISK_Q = f"CAST(risk_score * {float(2 ** RISK_FRACTION_BITS)!r} AS INTEGER)"
+RISK_LIMB_SUMS = ", ".join([
+    f"TOTAL({_RISK_Q} >> {2 * RISK_LIMB_BITS})",
+    f"TOTAL(({_RISK_Q} >> {RISK_LIMB_BITS}) & {(1 << RISK_LIMB_BITS) - 1})",
+    f"TOTAL({_RISK_Q} & {(1 << RISK_LIMB_BITS) - 1})",
+])
+
+
+def _sql_values(df, table):
+    """Column lists for INSERT: missing values as None, timestamps as
+    int64 ns followed by their day number."""
+    schema = SQL_SCHEMAS[table]
+    out = []
+    for col in SQL_COLUMNS[table]:
+        kind = schema[col]
+        s = df[col]
+        if kind == "datetime":
+            ns = s.to_numpy(dtype="datetime64[ns]").view(np.int64)
+            missing = ns == _NAT
+            ns_values = ns.astype(object)
+            ns_values[missing] = None
+            day_values = (ns // _NS_PER_DAY).astype(object)
+            day_values[missing] = None
+            out += [ns_values.tolist(), day_values.tolist()]
+        elif kind == "float":
+            floats = s.to_numpy(dtype=np.float64)
+            if col == "risk_score":
+                risk_limbs(floats)  # same range check as the pandas path
+            values = floats.astype(object)
+            values[np.isnan(floats)] = None
+            out.append(values.tolist())
+        elif kind == "int":
+            floats = s.to_numpy(dtype=np.float64)
+            missing = np.isnan(floats)
+            values = np.where(missing, 0, floats).astype(np.int64).astype(object)
+            values[missing] = None
+            out.append(values.tolist())
+        else:
+            out.append(s.astype(object).where(s.notna(), None).tolist())
+    return out
+
+
+def _sql_columns(table):
+    cols = []
+    for col in SQL_COLUMNS[table]:
+        cols.append((col, _SQL_TYPES[SQL_SCHEMAS[table][col]]))
+        if col == TIME_COLUMNS[table]:
+            cols.append(("day", "INTEGER"))
+    return cols
+
+
+def _day_label(day):
+    return _EPOCH + timedelta(days=day)
+
+
+def _window(key_column, key, time_column, start, end):
+    """WHERE clause and parameters for `key_column = key` (skipped when key
+    is empty) and a [start, end) int64 ns window on `time_column`."""
+    clauses, params = [], []
+    if key:
+        clauses.append(f"{key_column} = ?")
+        params.append(key)
+    if start is not None:
+        clauses.append(f"{time_column} >= ?")
+        params.append(int(start))
+    if end is not None:
+        clauses.append(f"{time_column} < ?")
+        params.append(int(end))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._readers = set()  # every thread's reader connection
+        self._busy = set()     # readers running a query
+        self._closed = False
+
+    # ---------------------------------------------------------
+    # Connections
+    # ---------------------------------------------------------
+
+    def _connect(self):
+        # closed by close(), possibly from another thread
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_S, check_same_thread=False
+        )
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            conn = getattr(self._local, "conn", None)
+            if conn is None or self._closed:
+                conn = self._connect()
+                if not self._closed:
+                    self._local.conn = conn
+                    self._readers.add(conn)
+            self._busy.add(conn)
+            return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._busy.discard(conn)
+            if self._closed:
+                self._readers.discard(conn)
+                conn.close()
+
+    def query(self, sql, params=()):
+        conn = self._acquire()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Close the reader connections (see above)."""
+        with self._lock:
+            self._closed = True
+            for conn in self._readers - self._busy:
+                conn.close()
+            self._readers &= self._busy
+
+    def source(self):
+        """What the store holds: {"version", "orders": attrs, "predictions":
+        attrs} as recorded by the last sync; {} before the first one."""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            rows = self.query("SELECT value FROM meta WHERE key = 'source'")
+        except sqlite3.OperationalError:
+            return {}  # created but not yet synced
+        return json.loads(rows[0][0]) if rows else {}
+
+    @contextmanager
+    def writing(self):
+        """Write transaction; holds SQLite's write lock, so one process
+        updates the file at a time and readers keep the last committed state."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            for table in SQL_COLUMNS:
+                cols = ", ".join(f"{name} {kind}" for name, kind in _sql_columns(table))
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def write_source(conn, source):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)",
+            (json.dumps(source, default=int),),
+        )
+
+    @staticmethod
+    def append_rows(conn, table, df):
+        names = [name for name, _ in _sql_columns(table)]
+        sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        for start in range(0, len(df), INSERT_CHUNK_ROWS):
+            conn.executemany(sql, zip(*_sql_values(df.iloc[start:start + INSERT_CHUNK_ROWS], table)))
+
+    @classmethod
+    def replace_rows(cls, conn, table, df):
+        for col in INDEXES[table]:
+            conn.execute(f"DROP INDEX IF EXISTS {table}_{col}")
+        conn.execute(f"DELETE FROM {table}")
+        cls.append_rows(conn, table, df)
+        for col in INDEXES[table]:
+            conn.execute(f"CREATE INDEX {table}_{col} ON {table} ({col})")
+
+    # ---------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------
+
+    def _grouped(self, where, params, keys):
+        """DataFrame(risk_q2, risk_q1, risk_q0, count, high_count) indexed like
+        ScopeAggregates' tables: one row per present key, in key order."""
+        key_list = ", ".join(keys)
+        present = " AND ".join(f"{k} IS NOT NULL" for k in keys)
+        result = self.query(
+            f"SELECT {key_list}, {RISK_LIMB_SUMS}, COUNT(risk_score), COALESCE(SUM(risk_score >= ?), 0)"
+            f" FROM predictions{where}{' AND' if where else ' WHERE'} {present}"
+            f" GROUP BY {key_list} ORDER BY {key_list}",
+            [HIGH_RISK_THRESHOLD] + params,
+        )
+        n_keys = len(keys)
+        levels = [
+            [_day_label(r[i]) if key == "day" else r[i] for r in result]
+            for i, key in enumerate(keys)
+        ]
+        if n_keys == 1:
+            index = pd.Index(levels[0], dtype=object)
+        else:
+            index = pd.MultiIndex.from_arrays([np.asarray(level, dtype=object) for level in levels])
+        sums = np.array([r[n_keys:] for r in result], dtype=np.float64).reshape(-1, 5)
+        return pd.DataFrame({
+            "risk_q2": sums[:, 0].astype(np.int64),
+            "risk_q1": sums[:, 1].astype(np.int64),
+            "risk_q0": sums[:, 2].astype(np.int64),
+            "count": sums[:, 3].astype(np.int64),
+            "high_count": sums[:, 4].astype(np.int64),
+        }, index=index)
+
+    @timed
+    def scope_aggregates(self, marketplace_id=None, start=None, end=None, groupings=tuple(GROUPINGS), orders=True):
+        """ScopeAggregates of one marketplace (None: all) within [start, end)
+        (int64 ns, None leaves that side open), with only the `groupings`
+        tables filled in and the order-side fields only with `orders`."""
+        where, params = _window("marketplace_id", marketplace_id, "timestamp", start, end)
+
+        n_rows, q2, q1, q0, risk_count, high_count, high_label_count, max_risk = self.query(
+            f"SELECT COUNT(*), {RISK_LIMB_SUMS}, COUNT(risk_score), COALESCE(SUM(risk_score >= ?), 0),"
+            f" COALESCE(SUM(risk_label = 'High'), 0), MAX(risk_score) FROM predictions{where}",
+            [HIGH_RISK_THRESHOLD] + params,
+        )[0]
+        fields = {}
+        if n_rows:
+            fields = {
+                "rows": n_rows,
+                "risk_q": (int(q2), int(q1), int(q0)),
+                "risk_count": risk_count,
+                "high_count": high_count,
+                "high_label_count": high_label_count,
+                "max_risk": np.nan if max_risk is None else float(max_risk),
+            }
+            for name in groupings:
+                fields[name] = self._grouped(where, params, GROUPINGS[name])
+
+        if orders:
+            where, params = _window("marketplace_id", marketplace_id, "order_timestamp", start, end)
+            n_orders, returned_sum, returned_count = self.query(
+                f"SELECT COUNT(*), TOTAL(Returned), COUNT(Returned) FROM orders{where}", params
+            )[0]
+            if n_orders:
+                per_seller = self.query(
+                    f"SELECT seller_id, COUNT(*) FROM orders{where}"
+                    f"{' AND' if where else ' WHERE'} seller_id IS NOT NULL GROUP BY seller_id ORDER BY seller_id",
+                    params,
+                )
+                fields.update(
+                    n_orders=n_orders,
+                    returned_sum=float(returned_sum),
+                    returned_count=returned_count,
+                    seller_orders=pd.Series(
+                        np.array([n for _, n in per_seller], dtype=np.int64),
+                        index=pd.Index([s for s, _ in per_seller], dtype=object),
+                    ),
+                )
+        return ScopeAggregates(**fields)
+
+    def marketplace_stats(self, marketplace_id=None, start=None, end=None):
+        """Same output as utils.compute_marketplace_stats."""
+        return self.scope_aggregates(marketplace_id, start, end).stats()
+
+    def category_risk(self, marketplace_id=None):
+        """Same output as utils.compute_category_risk."""
+        return self.scope_aggregates(marketplace_id, groupings=("category",), orders=False).category_risk()
+
+    def category_trend(self, marketplace_id=None, top_n=6, bucket="day", top_only=False, start=None, end=None):
+        """Same output as utils.compute_category_trend."""
+        agg = self.scope_aggregates(marketplace_id, start, end, groupings=("category_daily",), orders=False)
+        return agg.category_trend(top_n, bucket, top_only)
+
+    @timed
+    def seller_trend(self, seller_id=None, start=None, end=None):
+        """Same output as utils.compute_seller_trend."""
+        where, params = _window("seller_id", seller_id, "timestamp", start, end)
+        result = self.query(
+            f"SELECT day, {RISK_LIMB_SUMS}, COUNT(risk_score), COALESCE(SUM(risk_label = 'High'), 0)"
+            f" FROM predictions{where}{' AND' if where else ' WHERE'} day IS NOT NULL GROUP BY day ORDER BY day",
+            params,
+        )
+        return [
+            {
+                "date": _day_label(day),
+                "avg_risk": float(limb_total(q2, q1, q0) / count) if count else None,
+                "high_count": high,
+            }
+            for day, q2, q1, q0, count, high in result
+        ]
+
+    @timed
+    def seller_explanation(self, seller_id):
+        """Same output as utils.explain_seller_risk."""
+        n, returned, cod, rating = self.query(
+            "SELECT COUNT(*), AVG(Returned), AVG(COALESCE(Payment_Method = 'COD', 0)), AVG(Product_Rating)"
+            " FROM orders WHERE seller_id = ?",
+            (seller_id,),
+        )[0]
+        n_preds, avg_risk = self.query(
+            "SELECT COUNT(*), AVG(risk_score) FROM predictions WHERE seller_id = ?", (seller_id,)
+        )[0]
+
+        reasons = []
+
+        if n:
+            if returned is not None and returned > 0.3:
+                reasons.append("High return rate")
+
+            if cod > 0.5:
+                reasons.append("High COD usage")
+
+            if rating is not None and rating < 3:
+                reasons.append("Low average product rating")
+
+        if n_preds:
+            if avg_risk is not None and avg_risk > 0.7:
+                reasons.append("Consistently high predicted risk")
+
+        return reasons
+
+
+if __name__ == "__main__":
+    import sys
+
+    from utils import load_sqlite_store
+
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    store = load_sqlite_store(data_dir)
+    print(f"Synced {store.path}: version {store.source().get('version')}")
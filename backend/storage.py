@@ -0,0 +1,499 @@
+# backend/storage.py
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cache import file_signature
+
+# ------------------------------------------------------------
+# Typed schemas
+#
+# Every loader returns frames with these dtypes, whether the data
+# comes from the raw CSVs or from the columnar store below.
+#   str      -> python strings
+#   category -> pandas Categorical
+#   float    -> float64
+#   int      -> float64 holding whole numbers; missing values stay NaN,
+#               as with the CSV's astype(float), so means skip them
+#   datetime -> datetime64[ns] (unparseable values become NaT)
+# ------------------------------------------------------------
+
+SELLERS_SCHEMA = {
+    "seller_id": "str",
+    "seller_name": "str",
+    "marketplace_id": "category",
+}
+
+ORDERS_SCHEMA = {
+    "Order_ID": "str",
+    "Product_Category": "category",
+    "Product_Price": "float",
+    "Discount_Applied": "float",
+    "Delivery_Time_Days": "int",
+    "Customer_Type": "category",
+    "Payment_Method": "category",
+    "Customer_Return_Rate": "float",
+    "Product_Rating": "float",
+    "Returned": "int",
+    "seller_id": "category",
+    "marketplace_id": "category",
+    "order_timestamp": "datetime",
+}
+
+PREDICTIONS_SCHEMA = {
+    "Order_ID": "str",
+    "seller_id": "category",
+    "marketplace_id": "category",
+    "Product_Category": "category",
+    "Customer_Type": "category",
+    "Payment_Method": "category",
+    "risk_score": "float",
+    "risk_label": "category",
+    "timestamp": "datetime",
+}
+
+TABLES = {
+    "sellers": ("sellers.csv", SELLERS_SCHEMA),
+    "orders": ("orders.csv", ORDERS_SCHEMA),
+    "predictions": ("batch_predictions.csv", PREDICTIONS_SCHEMA),
+}
+
+COLUMNAR_DIR = "columnar"
+META_FILE = "_meta.json"
+# 2: "int" columns stored as float64 with NaN for missing (1 stored 0)
+STORE_FORMAT = 2
+
+
+def csv_path(data_dir, table):
+    return os.path.join(data_dir, TABLES[table][0])
+
+
+def store_path(data_dir, table):
+    return os.path.join(data_dir, COLUMNAR_DIR, table)
+
+
+def _csv_dtypes(schema):
+    dtypes = {}
+    for col, kind in schema.items():
+        if kind in ("str", "datetime"):
+            dtypes[col] = str
+        elif kind == "category":
+            dtypes[col] = "category"
+        elif kind in ("float", "int"):
+            dtypes[col] = "float64"
+    return dtypes
+
+
+def coerce_column(series, kind):
+    if kind == "str":
+        return series.astype(object).where(series.notna(), None)
+    if kind == "category":
+        return series.astype("category")
+    if kind == "float":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if kind == "int":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if kind == "datetime":
+        return pd.to_datetime(series, errors="coerce").astype("datetime64[ns]")
+    raise ValueError(f"unknown column kind: {kind}")
+
+
+def empty_frame(schema, columns=None):
+    columns = list(schema) if columns is None else columns
+    return pd.DataFrame({c: coerce_column(pd.Series([], dtype=object), schema[c]) for c in columns})
+
+
+def apply_schema(df, schema, columns=None):
+    """Coerce a raw frame to `schema`, adding any missing column as all-null."""
+    columns = list(schema) if columns is None else columns
+    out = {}
+    for c in columns:
+        raw = df[c] if c in df.columns else pd.Series([None] * len(df), index=df.index, dtype=object)
+        out[c] = coerce_column(raw, schema[c])
+    return pd.DataFrame(out, index=df.index)
+
+
+class _BoundedReader(io.RawIOBase):
+    """Exposes the next `length` bytes of an open binary file."""
+
+    def __init__(self, fh, length):
+        self._fh = fh
+        self._left = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = min(len(buf), self._left)
+        if n <= 0:
+            return 0
+        data = self._fh.read(n)
+        buf[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+def _complete_lines_end(fh, size, block=1 << 16):
+    """Offset just past the last newline in the first `size` bytes, so a
+    line that is still being written is never parsed."""
+    pos = size
+    while pos > 0:
+        step = min(block, pos)
+        fh.seek(pos - step)
+        chunk = fh.read(step)
+        nl = chunk.rfind(b"\n")
+        if nl >= 0:
+            return pos - step + nl + 1
+        pos -= step
+    return 0
+
+
+def source_fingerprint(path, end, window=4096):
+    """Hash of the bytes just before `end`; used to tell an append (the
+    prefix is untouched) from a rewrite of the file."""
+    with open(path, "rb") as fh:
+        start = max(0, end - window)
+        fh.seek(start)
+        return hashlib.sha1(fh.read(end - start)).hexdigest()
+
+
+def is_append_of(path, source_bytes, fingerprint):
+    """True if `path` still starts with the `source_bytes` bytes that were
+    read earlier, i.e. it has only had rows appended since."""
+    if not source_bytes or not fingerprint:
+        return False
+    try:
+        if os.path.getsize(path) < source_bytes:
+            return False
+        return source_fingerprint(path, source_bytes) == fingerprint
+    except OSError:
+        return False
+
+
+def read_csv_header(path):
+    with open(path, newline="") as fh:
+        return next(csv.reader(fh), [])
+
+
+def read_csv_typed(path, schema, columns=None, start=0):
+    """Typed read of a CSV from byte offset `start` (0 = whole file).
+
+    Only complete lines are read. The offset just past the last line
+    consumed is kept in `df.attrs["source_bytes"]`, so a later call can
+    pick up rows appended after it.
+    """
+    columns = list(schema) if columns is None else list(columns)
+    if not os.path.exists(path):
+        return empty_frame(schema, columns)
+
+    with open(path, "rb") as fh:
+        end = _complete_lines_end(fh, os.fstat(fh.fileno()).st_size)
+        if end <= start:
+            df = empty_frame(schema, columns)
+            df.attrs["source_bytes"] = start
+            df.attrs["source_fingerprint"] = source_fingerprint(path, start)
+            return df
+
+        names = read_csv_header(path) if start > 0 else None
+        fh.seek(start)
+        dtypes = _csv_dtypes(schema)
+        df = pd.read_csv(
+            io.BufferedReader(_BoundedReader(fh, end - start)),
+            header=None if names else "infer",
+            names=names,
+            dtype={c: t for c, t in dtypes.items() if c in columns},
+            usecols=lambda c: c in columns,
+        )
+
+    df = apply_schema(df, schema, columns)
+    df.attrs["source_bytes"] = end
+    df.attrs["source_fingerprint"] = source_fingerprint(path, end)
+    return df
+
+
+def concat_frames(frames):
+    """Concatenate typed frames (same columns), keeping categoricals
+    categorical with lexically sorted categories."""
+    first = frames[0]
+    out = {}
+    for col in first.columns:
+        parts = [f[col] for f in frames]
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            cats = set(first[col].cat.categories)
+            for p in parts[1:]:
+                cats.update(p.cat.categories)
+            if len(cats) != len(first[col].cat.categories):
+                # new category values: recode every part onto the sorted union
+                cats = sorted(cats)
+            else:
+                cats = first[col].cat.categories
+            parts = [p.cat.set_categories(cats) for p in parts]
+        out[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(out, columns=first.columns, copy=False)
+
+
+def concat_typed(old, new):
+    """Append `new` rows to `old`; the result keeps `new`'s attrs."""
+    df = concat_frames([old, new])
+    df.attrs.update(new.attrs)
+    return df
+
+
+# ------------------------------------------------------------
+# Columnar store
+#
+# One directory per table under data/columnar/, holding one .npy
+# file per column plus _meta.json. Categoricals are stored as integer
+# codes with their categories in the metadata and timestamps as int64
+# nanoseconds, so reads are a straight np.load of the projected columns.
+# ------------------------------------------------------------
+
+def store_signature(data_dir, table):
+    return file_signature(os.path.join(store_path(data_dir, table), META_FILE))
+
+
+def read_meta(data_dir, table):
+    path = os.path.join(store_path(data_dir, table), META_FILE)
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def store_is_current(data_dir, table, meta=None):
+    """The store is usable if it was built, in the current format, from the
+    CSV as it is on disk now (or the CSV has been removed and only the
+    store remains)."""
+    meta = read_meta(data_dir, table) if meta is None else meta
+    if meta is None:
+        return False
+    source = file_signature(csv_path(data_dir, table))
+    if source is None:
+        return True
+    return list(source) == meta.get("source_signature") and meta.get("format") == STORE_FORMAT
+
+
+def write_columns(df, schema, path, **meta):
+    """Write typed `df` into the new directory `path`: one .npy per column
+    plus META_FILE, which gets `meta` merged in. Returns the metadata."""
+    os.makedirs(path)
+    columns = {}
+    for col, kind in schema.items():
+        s = df[col]
+        info = {"kind": kind}
+        if kind == "category":
+            arr = s.cat.codes.to_numpy()
+            info["categories"] = [str(c) for c in s.cat.categories]
+        elif kind == "datetime":
+            arr = s.to_numpy(dtype="datetime64[ns]").view("int64")
+        elif kind == "str":
+            arr = s.fillna("").to_numpy(dtype=str)
+        else:
+            arr = s.to_numpy()
+        np.save(os.path.join(path, f"{col}.npy"), arr)
+        columns[col] = info
+    return _write_meta(path, len(df), columns, meta)
+
+
+def _write_meta(path, rows, columns, meta):
+    meta = dict({"rows": int(rows), "columns": columns, "format": STORE_FORMAT}, **meta)
+    with open(os.path.join(path, META_FILE), "w") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+class ColumnWriter:
+    """Streams typed chunks into the new directory `path` in the
+    write_columns layout, without holding the table in memory. The row
+    count, each category column's categories (sorted) and each str
+    column's maximum length must be known upfront."""
+
+    def __init__(self, path, schema, rows, categories, str_widths):
+        os.makedirs(path)
+        self.path = path
+        self.schema = schema
+        self.rows = rows
+        self.categories = {c: list(v) for c, v in categories.items()}
+        self._arrays = {}
+        for col, kind in schema.items():
+            if kind == "category":
+                dtype = pd.Categorical.from_codes([], categories=self.categories[col]).codes.dtype
+            elif kind == "str":
+                dtype = f"<U{max(1, str_widths[col])}"
+            else:
+                dtype = {"float": np.float64, "int": np.float64, "datetime": np.int64}[kind]
+            self._arrays[col] = np.lib.format.open_memmap(
+                os.path.join(path, f"{col}.npy"), mode="w+", dtype=dtype, shape=(rows,)
+            )
+        self.written = 0
+
+    def write(self, df):
+        start, end = self.written, self.written + len(df)
+        if end > self.rows:
+            raise ValueError(f"more than the {self.rows} rows declared")
+        for col, kind in self.schema.items():
+            s = df[col]
+            if kind == "category":
+                arr = pd.Categorical(s, categories=self.categories[col]).codes
+            elif kind == "datetime":
+                arr = s.to_numpy(dtype="datetime64[ns]").view("int64")
+            elif kind == "str":
+                arr = s.fillna("").to_numpy(dtype=str)
+            else:
+                arr = s.to_numpy()
+            self._arrays[col][start:end] = arr
+        self.written = end
+
+    def close(self, **meta):
+        if self.written != self.rows:
+            raise ValueError(f"{self.written} rows written, {self.rows} declared")
+        columns = {}
+        for col, kind in self.schema.items():
+            self._arrays[col].flush()
+            columns[col] = {"kind": kind}
+            if kind == "category":
+                columns[col]["categories"] = [str(c) for c in self.categories[col]]
+        self._arrays = {}
+        return _write_meta(self.path, self.rows, columns, meta)
+
+
+def read_columns(path, schema, meta, columns=None, mmap_mode=None):
+    """Typed frame from a directory written by write_columns."""
+    columns = list(schema) if columns is None else list(columns)
+    out = {}
+    for col in columns:
+        info = meta["columns"].get(col)
+        if info is None:
+            out[col] = coerce_column(pd.Series([None] * meta["rows"], dtype=object), schema[col])
+            continue
+        arr = np.load(os.path.join(path, f"{col}.npy"), mmap_mode=mmap_mode)
+        kind = info["kind"]
+        if kind == "category":
+            out[col] = pd.Categorical.from_codes(arr, categories=info["categories"])
+        elif kind == "datetime":
+            out[col] = np.asarray(arr).view("datetime64[ns]")
+        elif kind == "str":
+            out[col] = pd.Series(arr, dtype=object).where(arr != "", None)
+        elif kind == "int":
+            out[col] = np.asarray(arr, dtype=np.float64)  # a copy only for format 1's int64
+        else:
+            out[col] = np.asarray(arr)  # a plain ndarray view, also when memory-mapped
+    return pd.DataFrame(out, columns=columns, copy=False)
+
+
+def write_store(df, data_dir, table, source_signature=None):
+    schema = TABLES[table][1]
+    attrs = dict(df.attrs)
+    df = apply_schema(df, schema)
+    final = store_path(data_dir, table)
+    tmp = f"{final}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    meta = write_columns(
+        df, schema, tmp,
+        source_signature=list(source_signature) if source_signature else None,
+        source_bytes=attrs.get("source_bytes"),
+        source_fingerprint=attrs.get("source_fingerprint"),
+    )
+
+    replace_dir(tmp, final)
+    return meta
+
+
+def replace_dir(tmp, final):
+    """Swap directories so readers never see a partially written store."""
+    old = f"{final}.old-{os.getpid()}"
+    if os.path.exists(final):
+        os.rename(final, old)
+    os.rename(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_store(data_dir, table, columns=None, meta=None, mmap_mode=None):
+    meta = read_meta(data_dir, table) if meta is None else meta
+    df = read_columns(store_path(data_dir, table), TABLES[table][1], meta, columns, mmap_mode)
+    df.attrs["source_bytes"] = meta.get("source_bytes")
+    df.attrs["source_fingerprint"] = meta.get("source_fingerprint")
+    return df
+
+
+def read_table(data_dir, table, columns=None):
+    """Typed read of one table: the columnar store when current, the store
+    plus the rows appended to the CSV since it was built, or the CSV."""
+    path = csv_path(data_dir, table)
+    meta = read_meta(data_dir, table)
+    if meta is not None:
+        if store_is_current(data_dir, table, meta):
+            return read_store(data_dir, table, columns, meta=meta)
+        if meta.get("format") == STORE_FORMAT and is_append_of(
+            path, meta.get("source_bytes"), meta.get("source_fingerprint")
+        ):
+            tail = read_csv_typed(path, TABLES[table][1], columns, start=meta["source_bytes"])
+            return concat_typed(read_store(data_dir, table, columns, meta=meta), tail)
+    return read_csv_typed(path, TABLES[table][1], columns)
+
+
+def read_appended(data_dir, table, old, columns=None):
+    """`old` (an earlier read_table result) extended with the rows appended
+    to the CSV since, or None if the CSV was rewritten rather than appended."""
+    path = csv_path(data_dir, table)
+    start = old.attrs.get("source_bytes")
+    if not is_append_of(path, start, old.attrs.get("source_fingerprint")):
+        return None
+    tail = read_csv_typed(path, TABLES[table][1], columns, start=start)
+    if tail.empty:
+        return old
+    return concat_typed(old, tail)
+
+
+def start_csv(data_dir, table):
+    """Give a table that only has the columnar store a header-only CSV,
+    and mark the store as built from it, so rows appended to the CSV
+    are read as the store plus a tail (see read_table). The CSV's first
+    row is row `csv_first_row` of the table."""
+    path = csv_path(data_dir, table)
+    meta = read_meta(data_dir, table)
+    if os.path.exists(path) or meta is None:
+        return
+    with open(path, "w", newline="") as fh:
+        csv.writer(fh).writerow(list(TABLES[table][1]))
+    size = os.path.getsize(path)
+    meta.update(
+        source_signature=list(file_signature(path)),
+        source_bytes=size,
+        source_fingerprint=source_fingerprint(path, size),
+        csv_first_row=meta["rows"],
+    )
+    meta_path = os.path.join(store_path(data_dir, table), META_FILE)
+    with open(f"{meta_path}.tmp-{os.getpid()}", "w") as fh:
+        json.dump(meta, fh)
+    os.replace(f"{meta_path}.tmp-{os.getpid()}", meta_path)
+
+
+def convert_table(data_dir, table):
+    path = csv_path(data_dir, table)
+    signature = file_signature(path)
+    df = read_csv_typed(path, TABLES[table][1])
+    return write_store(df, data_dir, table, source_signature=signature)
+
+
+def convert_all(data_dir):
+    for table in TABLES:
+        if not os.path.exists(csv_path(data_dir, table)):
+            print(f"Skipping {table} (no CSV)")
+            continue
+        meta = convert_table(data_dir, table)
+        print(f"Converted {table}: rows={meta['rows']}")
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    convert_all(data_dir)
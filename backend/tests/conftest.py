@@ -0,0 +1,24 @@
+# backend/tests/conftest.py
+import os
+import sys
+from datetime import date
+
+import pytest
+
+# backend modules import each other by bare name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_mock_data import generate  # noqa: E402
+
+END_DATE = date(2025, 1, 31)
+
+
+def make_dataset(data_dir, rows=3000, fmt="csv"):
+    generate(data_dir, rows=rows, n_sellers=6, n_marketplaces=2, days=30, end_date=END_DATE, seed=7, fmt=fmt)
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """A small generated CSV dataset, shared by tests that only read it."""
+    return make_dataset(str(tmp_path_factory.mktemp("data")))
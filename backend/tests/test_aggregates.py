@@ -0,0 +1,86 @@
+# backend/tests/test_aggregates.py
+import pytest
+
+import numpy as np
+
+from aggregates import ORDER_COLUMNS, PRED_COLUMNS, MarketplaceAggregates, limb_total, risk_limbs
+from responses import dumps
+from utils import compute_category_risk, compute_category_trend, compute_marketplace_stats, load_batch_predictions, load_orders
+
+MARKETPLACES = [None, "M001", "M002"]
+
+
+@pytest.fixture(scope="module")
+def frames(dataset):
+    return load_orders(dataset, columns=ORDER_COLUMNS), load_batch_predictions(dataset, columns=PRED_COLUMNS)
+
+
+def _render(agg, m):
+    return {
+        "stats": agg.stats(m),
+        "category_risk": agg.category_risk(m),
+        "category_trend": agg.category_trend(m, top_n=3, bucket="week"),
+    }
+
+
+@pytest.fixture(scope="module")
+def noisy_frames(frames):
+    """Risk scores using all 53 bits, where naive sums depend on order."""
+    orders, preds = frames
+    rng = np.random.default_rng(3)
+    risk = rng.random(len(preds)) ** 3
+    risk[::97] = np.nan
+    return orders, preds.assign(risk_score=risk)
+
+
+def test_risk_limbs_are_exact_and_close():
+    rng = np.random.default_rng(0)
+    values = np.r_[rng.random(1000), -rng.random(10), 1e-300, 0.0, 1.0, 2047.5, np.nan]
+    limbs = risk_limbs(values)
+    assert np.array_equal(limbs, np.trunc(limbs))
+    q = limbs[0] * 2.0 ** 42 + limbs[1] * 2.0 ** 21 + limbs[2]  # exact: below 2^53 for |v| < 2
+    small = np.abs(np.nan_to_num(values)) < 2
+    assert np.array_equal(q[small], np.trunc(np.nan_to_num(values[small]) * 2.0 ** 52))
+    assert abs(float(limb_total(*limbs.sum(axis=1))) - np.nansum(values)) < 1e-12
+
+
+def test_risk_limbs_reject_out_of_range():
+    with pytest.raises(ValueError):
+        risk_limbs(np.array([0.5, 4096.0]))
+
+
+def test_build_matches_compute_functions(frames):
+    orders, preds = frames
+    agg = MarketplaceAggregates.build(orders, preds)
+    for m in MARKETPLACES:
+        p = preds[preds["marketplace_id"] == m] if m else preds
+        assert agg.stats(m) == compute_marketplace_stats(orders, preds, m)
+        assert agg.category_risk(m) == compute_category_risk(orders, preds, m)
+        assert agg.category_trend(m, top_n=3, bucket="week") == compute_category_trend(
+            orders, p, top_n=3, bucket="week"
+        )
+
+
+@pytest.mark.parametrize("noisy", [False, True])
+@pytest.mark.parametrize("splits", [[1500], [1, 2999], [700, 1400, 2100, 2800]])
+def test_extend_matches_full_build(frames, noisy_frames, splits, noisy):
+    orders, preds = noisy_frames if noisy else frames
+    full = MarketplaceAggregates.build(orders, preds)
+
+    bounds = [0] + splits + [len(orders)]
+    agg = MarketplaceAggregates.build(orders.iloc[:bounds[1]], preds.iloc[:bounds[1]])
+    for lo, hi in zip(bounds[1:], bounds[2:]):
+        agg = agg.extend(orders.iloc[lo:hi], preds.iloc[lo:hi])
+
+    assert (agg.n_orders, agg.n_preds) == (full.n_orders, full.n_preds)
+    for m in MARKETPLACES + ["M404"]:
+        assert dumps(_render(agg, m)) == dumps(_render(full, m))
+
+
+def test_extend_adds_new_marketplace(frames):
+    orders, preds = frames
+    in_m1 = (orders["marketplace_id"] == "M001").to_numpy()
+    agg = MarketplaceAggregates.build(orders[in_m1], preds[in_m1])
+    assert agg.stats("M002")["total_orders"] == 0
+    agg = agg.extend(orders[~in_m1], preds[~in_m1])
+    assert dumps(agg.stats("M002")) == dumps(compute_marketplace_stats(orders, preds, "M002"))
@@ -0,0 +1,36 @@
+# backend/tests/test_batch_score.py
+import numpy as np
+import pandas as pd
+
+from batch_score import _hash_ids, scored_order_hashes
+from ingest import prediction_log
+from storage import read_table
+
+
+def _log_with_segments(data_dir, preds, n_segments):
+    log = prediction_log(data_dir)
+    for part in np.array_split(np.arange(len(preds)), n_segments):
+        log.append(preds.iloc[part])
+    return log
+
+
+def test_iter_read_yields_every_row_once(dataset, tmp_path):
+    preds = read_table(dataset, "predictions").iloc[:1000]
+    log = _log_with_segments(str(tmp_path), preds, 8)
+
+    frames = log.iter_read(["Order_ID"])
+    first = next(frames)
+    assert log.compact() > 0  # the segments still to come are merged meanwhile
+    ids = pd.concat([first] + list(frames))["Order_ID"].tolist()
+    assert ids == preds["Order_ID"].tolist()
+    assert ids == log.read(columns=["Order_ID"])["Order_ID"].tolist()
+
+
+def test_scored_order_hashes_covers_csv_and_log(dataset, tmp_path):
+    preds = read_table(dataset, "predictions")
+    csv_path = str(tmp_path / "batch_predictions.csv")
+    preds.iloc[:500].to_csv(csv_path, index=False)
+    log = _log_with_segments(str(tmp_path), preds.iloc[400:900], 5)
+
+    hashes = scored_order_hashes(csv_path, log, chunk_rows=128)
+    np.testing.assert_array_equal(hashes, np.unique(_hash_ids(preds["Order_ID"].iloc[:900].to_numpy())))
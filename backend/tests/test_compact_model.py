@@ -0,0 +1,59 @@
+# backend/tests/test_compact_model.py
+import joblib
+import numpy as np
+import pytest
+
+from compact_model import compact_path, load_compact
+from features import CATEGORICAL_FEATURES
+from scoring import model_path, predict_proba_for_bundle
+from train_seller_models import train_all, train_for_seller
+from utils import load_orders
+
+
+def _bundles(models_dir, seller_id):
+    return joblib.load(model_path(models_dir, seller_id)), load_compact(compact_path(models_dir, seller_id))
+
+
+def _seller_orders(data_dir, seller_id):
+    """The seller's orders with CSV-like object columns."""
+    o = load_orders(data_dir)
+    o = o[o["seller_id"] == seller_id]
+    return o.astype({c: object for c in o.columns if str(o[c].dtype) == "category"})
+
+
+def test_compact_matches_sklearn_with_missing_categories(dataset, tmp_path):
+    df = _seller_orders(dataset, "S001").copy()
+    df.loc[df.index[::7], "Product_Category"] = np.nan
+    df.loc[df.index[::11], "Payment_Method"] = None
+    assert train_for_seller(df, "S001", str(tmp_path))
+
+    sk, compact = _bundles(str(tmp_path), "S001")
+    X = df[CATEGORICAL_FEATURES]
+    np.testing.assert_array_equal(compact["encoder"].transform(X), sk["encoder"].transform(X))
+    np.testing.assert_allclose(
+        predict_proba_for_bundle(compact, df), predict_proba_for_bundle(sk, df), rtol=0, atol=1e-12
+    )
+
+
+def test_compact_matches_sklearn_from_feature_matrix(dataset, tmp_path):
+    summary = train_all(dataset, str(tmp_path), workers=1)
+    assert summary["trained"] > 0
+
+    for seller_id in ("S001", "S004"):
+        df = _seller_orders(dataset, seller_id).copy()
+        df.loc[df.index[:5], "Product_Category"] = "Unseen"  # unknown -> all zeros
+        sk, compact = _bundles(str(tmp_path), seller_id)
+        np.testing.assert_allclose(
+            predict_proba_for_bundle(compact, df), predict_proba_for_bundle(sk, df), rtol=0, atol=1e-12
+        )
+
+
+@pytest.mark.parametrize("n_rows", [1, 257])
+def test_compact_batch_sizes(dataset, tmp_path, n_rows):
+    df = _seller_orders(dataset, "S002")
+    assert train_for_seller(df, "S002", str(tmp_path))
+    sk, compact = _bundles(str(tmp_path), "S002")
+    rows = df.iloc[:n_rows]
+    np.testing.assert_allclose(
+        predict_proba_for_bundle(compact, rows), predict_proba_for_bundle(sk, rows), rtol=0, atol=1e-12
+    )
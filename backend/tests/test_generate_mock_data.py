@@ -0,0 +1,68 @@
+# backend/tests/test_generate_mock_data.py
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import END_DATE, make_dataset
+from generate_mock_data import append_days
+from ingest import prediction_log
+from storage import read_table
+from utils import load_batch_predictions, load_orders
+
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar", "both"])
+def test_append_days_round_trip(tmp_path, fmt):
+    data_dir = make_dataset(str(tmp_path), rows=2000, fmt=fmt)
+    before = read_table(data_dir, "orders")
+
+    append_days(data_dir, n_days=2, rows_per_day=300, seed=1)
+
+    after = read_table(data_dir, "orders")
+    assert len(after) == 2600
+    pd.testing.assert_frame_equal(
+        after.iloc[:2000].astype(object), before.astype(object), check_index_type=False
+    )
+    new = after.iloc[2000:]
+    assert new["Order_ID"].tolist() == [f"ORD{i:05d}" for i in range(2001, 2601)]
+    assert sorted(set(new["order_timestamp"].dt.date)) == [END_DATE + timedelta(days=1), END_DATE + timedelta(days=2)]
+
+    logged = prediction_log(data_dir).read()
+    assert len(logged) == 600
+    assert logged["Order_ID"].tolist() == new["Order_ID"].tolist()
+
+    # the API loaders see the same rows
+    assert len(load_orders(data_dir)) == 2600
+    assert load_batch_predictions(data_dir)["Order_ID"].iloc[-600:].tolist() == new["Order_ID"].tolist()
+
+
+def test_append_days_twice_continues_ids_and_days(tmp_path):
+    data_dir = make_dataset(str(tmp_path), rows=1000, fmt="columnar")
+    append_days(data_dir, n_days=1, rows_per_day=100)
+    append_days(data_dir, n_days=1, rows_per_day=100)
+
+    orders = read_table(data_dir, "orders")
+    assert orders["Order_ID"].is_unique
+    assert orders["Order_ID"].iloc[-1] == "ORD01200"
+    assert orders["order_timestamp"].max().date() == END_DATE + timedelta(days=2)
+
+
+def test_append_days_keeps_existing_id_width(tmp_path):
+    data_dir = make_dataset(str(tmp_path), rows=500, fmt="csv")
+    path = f"{data_dir}/orders.csv"
+    orders = pd.read_csv(path, dtype=str)
+    orders["Order_ID"] = "ORD" + orders["Order_ID"].str[3:].str.zfill(8)
+    orders.to_csv(path, index=False)
+
+    append_days(data_dir, n_days=1, rows_per_day=10)
+
+    assert read_table(data_dir, "orders")["Order_ID"].iloc[-1] == "ORD00000510"
+
+
+def test_generate_is_deterministic(tmp_path):
+    a = make_dataset(str(tmp_path / "a"), rows=1500)
+    b = make_dataset(str(tmp_path / "b"), rows=1500)
+    for table in ("orders", "predictions"):
+        pd.testing.assert_frame_equal(read_table(a, table), read_table(b, table))
+    assert read_table(a, "orders")["order_timestamp"].max().date() <= END_DATE
+    assert read_table(a, "orders")["order_timestamp"].min().date() >= END_DATE - timedelta(days=29)
@@ -0,0 +1,134 @@
+# backend/tests/test_scoring.py
+import threading
+
+import pytest
+
+from batching import InferenceBatcher
+from features import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from scoring import ModelCache, order_error, predict_proba_for_bundle, risk_label, score_orders
+from train_seller_models import train_for_seller
+from utils import load_orders
+
+
+class FailingCache:
+    def get(self, seller_id):
+        raise OSError("corrupt model file")
+
+
+class BlockingCache:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get(self, seller_id):
+        self.release.wait(5)
+        return None
+
+
+def _order(**overrides):
+    order = {"Order_ID": "ORD1", "seller_id": "S001"}
+    order.update({c: 1.0 for c in NUMERIC_FEATURES})
+    order.update({c: "x" for c in CATEGORICAL_FEATURES})
+    order.update(overrides)
+    return order
+
+
+@pytest.fixture(scope="module")
+def trained(dataset, tmp_path_factory):
+    """Models for S001 and S002, and their orders as API dicts."""
+    models_dir = str(tmp_path_factory.mktemp("models"))
+    orders = load_orders(dataset)
+    orders = orders.astype({c: object for c in orders.columns if str(orders[c].dtype) == "category"})
+    for seller_id in ("S001", "S002"):
+        assert train_for_seller(orders[orders["seller_id"] == seller_id], seller_id, models_dir)
+    rows = orders[orders["seller_id"].isin(["S001", "S002"])].iloc[:40]
+    records = rows[["Order_ID", "seller_id"] + NUMERIC_FEATURES + CATEGORICAL_FEATURES].to_dict("records")
+    return models_dir, rows, records
+
+
+def test_score_orders_matches_seller_models(trained):
+    models_dir, rows, records = trained
+    cache = ModelCache(models_dir)
+    results = score_orders(records, cache)
+
+    assert [r["Order_ID"] for r in results] == rows["Order_ID"].tolist()
+    for seller_id in ("S001", "S002"):
+        mine = (rows["seller_id"] == seller_id).to_numpy()
+        expected = predict_proba_for_bundle(cache.get(seller_id), rows[mine])
+        got = [r for r, m in zip(results, mine) if m]
+        assert [r["risk_score"] for r in got] == [round(float(p), 4) for p in expected]
+        assert [r["risk_label"] for r in got] == [risk_label(p) for p in expected]
+
+
+def test_unscorable_orders_get_errors(trained):
+    models_dir, _, records = trained
+    results = score_orders([records[0], _order(Order_ID="a", seller_id="S999"), _order(Order_ID="b", seller_id=None)],
+                           ModelCache(models_dir))
+    assert "risk_score" in results[0]
+    assert [r.get("error") for r in results[1:]] == ["no_model", "missing_seller_id"]
+
+
+def test_valid_order_has_no_error():
+    assert order_error(_order()) is None
+    assert order_error(_order(seller_id=7, **{NUMERIC_FEATURES[0]: "2.5", CATEGORICAL_FEATURES[0]: None})) is None
+
+
+@pytest.mark.parametrize("field, value", [
+    ("seller_id", ["S001"]),
+    ("seller_id", {"id": 1}),
+    ("seller_id", True),
+    (NUMERIC_FEATURES[0], "abc"),
+    (NUMERIC_FEATURES[0], [1]),
+    (CATEGORICAL_FEATURES[0], 3),
+])
+def test_invalid_field_is_reported(field, value):
+    error = order_error(_order(**{field: value}))
+    assert error["error"] == "invalid_fields"
+    assert error["invalid"] == [field]
+    assert error["Order_ID"] == "ORD1"
+
+
+def test_failing_model_gives_per_order_errors():
+    results = score_orders([_order(Order_ID="a"), _order(Order_ID="b"), _order(Order_ID="c", seller_id=None)],
+                           FailingCache())
+    assert [r["Order_ID"] for r in results] == ["a", "b", "c"]
+    assert [r["error"] for r in results] == ["scoring_failed", "scoring_failed", "missing_seller_id"]
+
+
+def test_batcher_turns_failures_into_errors():
+    batcher = InferenceBatcher(FailingCache(), window_ms=1, workers=2)
+    results = batcher.score([_order(Order_ID="a"), _order(Order_ID="b", seller_id="S002")], timeout=5)
+    assert [(r["Order_ID"], r["error"]) for r in results] == [("a", "scoring_failed"), ("b", "scoring_failed")]
+
+
+def test_batcher_times_out_per_order():
+    cache = BlockingCache()
+    batcher = InferenceBatcher(cache, window_ms=1, workers=1)
+    try:
+        results = batcher.score([_order(Order_ID="a")], timeout=0.2)
+    finally:
+        cache.release.set()
+    assert results == [{"Order_ID": "a", "seller_id": "S001", "error": "timeout"}]
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_batcher_thread_fails_queued_orders_and_restarts(monkeypatch):
+    batcher = InferenceBatcher(FailingCache(), window_ms=50, workers=1)
+    crash = threading.Event()
+    take_due = batcher._take_due
+
+    def crashing_take_due():
+        if crash.is_set():
+            raise RuntimeError("dispatch bug")
+        return take_due()
+
+    monkeypatch.setattr(batcher, "_take_due", crashing_take_due)
+    first = batcher.submit(_order(Order_ID="a"))
+    with batcher._cond:
+        crash.set()
+        batcher._cond.notify()
+    assert first.result(timeout=5) == {"Order_ID": "a", "seller_id": "S001", "error": "scoring_failed"}
+
+    crash.clear()
+    results = batcher.score([_order(Order_ID="b")], timeout=5)
+    assert results == [{"Order_ID": "b", "seller_id": "S001", "error": "scoring_failed"}]
+    assert batcher._worker.is_alive()
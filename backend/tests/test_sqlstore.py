@@ -0,0 +1,119 @@
+# backend/tests/test_sqlstore.py
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import prediction_log
+from responses import dumps
+from storage import read_table
+from utils import (
+    compute_category_risk, compute_category_trend, compute_marketplace_stats, compute_seller_trend,
+    explain_seller_risk, load_batch_predictions, load_orders, parse_time_window, sync_sqlite_store,
+)
+
+pytest.importorskip("orjson")  # dumps() renders both paths the way the API does
+
+MARKETPLACES = [None, "M001", "M002"]
+SELLERS = ["S001", "S003", "S006", "S999"]
+
+
+def _frames(data_dir):
+    return load_orders(data_dir), load_batch_predictions(data_dir)
+
+
+def _in_window(df, column, start, end):
+    ns = df[column].to_numpy(dtype="datetime64[ns]").view("int64")
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= ns >= start
+    if end is not None:
+        keep &= ns < end
+    return df[keep.to_numpy()]
+
+
+def _assert_parity(store, data_dir):
+    orders, preds = _frames(data_dir)
+    for m in MARKETPLACES:
+        assert dumps(store.marketplace_stats(m)) == dumps(compute_marketplace_stats(orders, preds, m))
+        assert dumps(store.category_risk(m)) == dumps(compute_category_risk(orders, preds, m))
+        for bucket, top_only in (("day", False), ("week", True), ("month", False)):
+            p = preds[preds["marketplace_id"] == m] if m else preds
+            assert dumps(store.category_trend(m, 3, bucket, top_only)) == dumps(
+                compute_category_trend(orders, p, top_n=3, bucket=bucket, top_only=top_only)
+            )
+    for s in SELLERS:
+        assert dumps(store.seller_trend(s)) == dumps(compute_seller_trend(preds[preds["seller_id"] == s]))
+        assert store.seller_explanation(s) == explain_seller_risk(orders, preds, s)
+
+
+@pytest.fixture
+def data_dir(dataset, tmp_path):
+    """A private copy of the dataset, for tests that append to it."""
+    return shutil.copytree(dataset, os.path.join(tmp_path, "data"))
+
+
+def test_sqlite_matches_pandas(dataset, tmp_path):
+    store = sync_sqlite_store(dataset, str(tmp_path / "analytics.sqlite"))
+    _assert_parity(store, dataset)
+
+
+@pytest.mark.parametrize("start, end", [("2025-01-10", "2025-01-20"), (None, "2025-01-05"), ("2025-01-25", None)])
+def test_sqlite_windowed_stats_match_pandas(dataset, tmp_path, start, end):
+    store = sync_sqlite_store(dataset, str(tmp_path / "analytics.sqlite"))
+    lo, hi = parse_time_window(start, end)
+    orders, preds = _frames(dataset)
+    orders = _in_window(orders, "order_timestamp", lo, hi)
+    preds = _in_window(preds, "timestamp", lo, hi)
+    for m in MARKETPLACES:
+        assert dumps(store.marketplace_stats(m, lo, hi)) == dumps(compute_marketplace_stats(orders, preds, m))
+        s = "S002"
+        assert dumps(store.seller_trend(s, lo, hi)) == dumps(compute_seller_trend(preds[preds["seller_id"] == s]))
+
+
+def test_sqlite_matches_pandas_after_append(data_dir, tmp_path):
+    path = str(tmp_path / "analytics.sqlite")
+    sync_sqlite_store(data_dir, path).close()
+
+    orders = read_table(data_dir, "orders")
+    preds = read_table(data_dir, "predictions")
+    extra = orders.iloc[:200].assign(Order_ID=orders["Order_ID"].iloc[:200] + "X")
+    extra.assign(order_timestamp=extra["order_timestamp"].dt.strftime("%Y-%m-%d")).to_csv(
+        os.path.join(data_dir, "orders.csv"), mode="a", header=False, index=False
+    )
+    prediction_log(data_dir).append(preds.iloc[:300].assign(Order_ID=preds["Order_ID"].iloc[:300] + "X"))
+
+    store = sync_sqlite_store(data_dir, path)
+    assert store.query("SELECT COUNT(*) FROM orders")[0][0] == len(orders) + 200
+    assert store.query("SELECT COUNT(*) FROM predictions")[0][0] == len(preds) + 300
+    _assert_parity(store, data_dir)
+
+
+def test_seller_trend_day_without_scores_is_null(data_dir, tmp_path):
+    path = os.path.join(data_dir, "batch_predictions.csv")
+    preds = pd.read_csv(path)
+    preds.loc[preds["timestamp"] == preds["timestamp"].iloc[0], "risk_score"] = None
+    preds.to_csv(path, index=False)
+
+    store = sync_sqlite_store(data_dir, str(tmp_path / "analytics.sqlite"))
+    trend = store.seller_trend(preds["seller_id"].iloc[0])
+    assert any(point["avg_risk"] is None for point in trend)
+    _assert_parity(store, data_dir)
+
+
+def test_sqlite_matches_pandas_with_full_precision_scores(data_dir, tmp_path):
+    path = os.path.join(data_dir, "batch_predictions.csv")
+    preds = pd.read_csv(path)
+    preds["risk_score"] = np.random.default_rng(5).random(len(preds)) ** 3
+    preds.to_csv(path, index=False, float_format="%.17g")
+
+    _assert_parity(sync_sqlite_store(data_dir, str(tmp_path / "analytics.sqlite")), data_dir)
+
+
+def test_closed_store_still_answers(dataset, tmp_path):
+    store = sync_sqlite_store(dataset, str(tmp_path / "analytics.sqlite"))
+    n = store.query("SELECT COUNT(*) FROM orders")
+    store.close()
+    assert store.query("SELECT COUNT(*) FROM orders") == n
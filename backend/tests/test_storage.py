@@ -0,0 +1,57 @@
+# backend/tests/test_storage.py
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage import META_FILE, convert_table, csv_path, read_table, store_is_current, store_path
+from utils import order_records
+
+
+@pytest.fixture
+def data_dir(dataset, tmp_path):
+    """A copy of the dataset whose orders miss some Returned values."""
+    data_dir = shutil.copytree(dataset, os.path.join(tmp_path, "data"))
+    path = csv_path(data_dir, "orders")
+    orders = pd.read_csv(path, dtype=str)
+    orders.loc[orders.index[:10], "Returned"] = None
+    orders.to_csv(path, index=False)
+    return data_dir
+
+
+def _check_missing_returned(orders, data_dir):
+    assert orders["Returned"].iloc[:10].isna().all()
+    assert orders["Returned"].iloc[10:].notna().all()
+    raw = pd.read_csv(csv_path(data_dir, "orders"), dtype=str)
+    # the return rate skips missing values, as the CSV's astype(float) did
+    assert orders["Returned"].mean() == raw["Returned"].astype(float).mean()
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_missing_whole_numbers_stay_missing(data_dir, columnar):
+    if columnar:
+        convert_table(data_dir, "orders")
+        assert store_is_current(data_dir, "orders")
+    orders = read_table(data_dir, "orders")
+    _check_missing_returned(orders, data_dir)
+
+    records = order_records(orders, np.arange(12))
+    assert [r["Returned"] for r in records[:10]] == [""] * 10
+    assert {type(r["Returned"]) for r in records[10:]} == {int}
+    assert {type(r["Delivery_Time_Days"]) for r in records} == {int}
+
+
+def test_store_in_old_format_is_not_used(data_dir):
+    convert_table(data_dir, "orders")
+    meta_path = os.path.join(store_path(data_dir, "orders"), META_FILE)
+    with open(meta_path) as fh:
+        meta = json.load(fh)
+    del meta["format"]  # as written before missing whole numbers were kept
+    with open(meta_path, "w") as fh:
+        json.dump(meta, fh)
+
+    assert not store_is_current(data_dir, "orders")
+    assert read_table(data_dir, "orders")["Returned"].iloc[:10].isna().all()
@@ -0,0 +1,22 @@
+# backend/tests/test_train_seller_models.py
+import train_seller_models
+from train_seller_models import load_manifest, train_all
+
+
+def test_schema_change_retrains_sellers_a_partial_run_missed(dataset, tmp_path, monkeypatch):
+    models_dir = str(tmp_path)
+    first = train_all(dataset, models_dir, workers=1)
+    assert first["trained"] + first["skipped"] == 6
+
+    monkeypatch.setattr(train_seller_models, "feature_schema_hash", lambda: "new-layout")
+    partial = train_all(dataset, models_dir, workers=1, sellers=["S001"])
+    assert [r["seller_id"] for r in partial["sellers"]] == ["S001"]
+
+    # the other five were built on the old layout and must not count as unchanged
+    rest = train_all(dataset, models_dir, workers=1)
+    assert rest["unchanged"] == 1
+    assert sorted(r["seller_id"] for r in rest["sellers"]) == ["S002", "S003", "S004", "S005", "S006"]
+
+    entries = load_manifest(models_dir)["sellers"]
+    assert {e["feature_schema"] for e in entries.values()} == {"new-layout"}
+    assert train_all(dataset, models_dir, workers=1)["unchanged"] == 6
@@ -3,40 +3,68 @@ import pandas as pd
 import joblib
 import os
 import json
+import time
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
-FEATURES = [
-    "Product_Category","Product_Price","Discount_Applied",
-    "Delivery_Time_Days","Customer_Type","Payment_Method",
-    "Customer_Return_Rate","Product_Rating"
-]
+from compact_model import CompactEncoder, compact_path, save_compact
+from features import CATEGORICAL_FEATURES, FEATURES, NUMERIC_FEATURES, FeatureMatrix, encode_frame
+from storage import read_table
+from utils import load_feature_matrix
 
-def train_for_seller(df, seller_id, models_dir):
-    sdf = df[df['seller_id'] == seller_id].copy()
-    if len(sdf) < 30:
-        print(f"Skipping seller {seller_id} (rows={len(sdf)})")
-        return False
+def prepare_features(df):
+    """FEATURES columns of `df` with the numeric ones coerced (bad values -> 0)."""
+    X = df[FEATURES].copy()
+    for c in NUMERIC_FEATURES:
+        X[c] = pd.to_numeric(X[c], errors='coerce').fillna(0.0)
+    return X
+
+def encode_features(X, encoder, fit=False):
+    """Model input matrix: numeric features followed by the one-hot categoricals
+    in the encoder's categories (features.encode_frame, float32).
+    Training and scoring must both build X through here."""
+    if fit:
+        encoder.fit(X[CATEGORICAL_FEATURES])
+    return encode_frame(X, encoder.categories_)
 
-    # numeric conversion
-    for c in ['Product_Price','Discount_Applied','Delivery_Time_Days','Customer_Return_Rate','Product_Rating']:
-        sdf[c] = pd.to_numeric(sdf[c], errors='coerce').fillna(0.0)
+def vocabulary_encoder(categories):
+    """sklearn OneHotEncoder fixed to `categories` (a feature matrix's
+    vocabulary), so bundles keep the encoder type external loaders of
+    models/*.joblib expect. Only a column with no values at all, which
+    OneHotEncoder cannot represent, falls back to a CompactEncoder."""
+    if any(len(cats) == 0 for cats in categories):
+        return CompactEncoder(categories)
+    encoder = OneHotEncoder(categories=[list(c) for c in categories], sparse_output=False, handle_unknown="ignore")
+    return encoder.fit(pd.DataFrame({c: [cats[0]] for c, cats in zip(CATEGORICAL_FEATURES, categories)}))
 
-    X = sdf[FEATURES]
-    y = pd.to_numeric(sdf['Returned'], errors='coerce').fillna(0).astype(int)
+def train_for_seller(df, seller_id, models_dir, n_jobs=None, features=None):
+    """Train and save one seller's model. With `features` (a FeatureMatrix)
+    the seller's rows are sliced from it, encoded with its global
+    vocabulary, and `df` is not used."""
+    if features is not None:
+        X_final, y = features.seller_rows(seller_id)
+        encoder = vocabulary_encoder(features.categories())
+    else:
+        sdf = df[df['seller_id'] == seller_id].copy()
+        y = pd.to_numeric(sdf['Returned'], errors='coerce').fillna(0).astype(int)
+    if len(y) < 30:
+        print(f"Skipping seller {seller_id} (rows={len(y)})")
+        return False
 
-    cat_cols = ['Product_Category','Customer_Type','Payment_Method']
-    encoder = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
-    X_cat = encoder.fit_transform(X[cat_cols])
-    X_num = X.drop(columns=cat_cols).select_dtypes(include=[int,float]).values
-    import numpy as np
-    X_final = np.hstack([X_num, X_cat])
+    if features is None:
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown="ignore")
+        X_final = encode_features(prepare_features(sdf), encoder, fit=True)
 
     X_train, X_test, y_train, y_test = train_test_split(X_final, y, test_size=0.2, random_state=42, stratify=y)
-    clf = RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42)
+    clf = RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42, n_jobs=n_jobs)
     clf.fit(X_train, y_train)
+    # n_jobs is a training setting; scoring a few rows is faster single-threaded
+    clf.set_params(n_jobs=None)
 
     # metrics
     y_pred = clf.predict(X_test)
@@ -48,10 +76,12 @@ def train_for_seller(df, seller_id, models_dir):
     os.makedirs(models_dir, exist_ok=True)
     model_bundle = {'model': clf, 'encoder': encoder, 'features': FEATURES}
     joblib.dump(model_bundle, os.path.join(models_dir, f"model_{seller_id}.joblib"))
+    # array-backed copy for fast, memory-mapped loading when scoring
+    save_compact(model_bundle, compact_path(models_dir, seller_id))
 
     stats = {
         'seller_id': seller_id,
-        'n_rows': int(len(sdf)),
+        'n_rows': int(len(y)),
         'accuracy': float(acc),
         'precision': float(prec),
         'recall': float(rec),
@@ -63,21 +93,190 @@ def train_for_seller(df, seller_id, models_dir):
     print(f"Trained {seller_id}: acc={acc:.3f} prec={prec:.3f} rec={rec:.3f} f1={f1:.3f}")
     return True
 
-def train_all(data_dir, models_dir):
-    orders_path = os.path.join(data_dir, 'orders.csv')
-    if not os.path.exists(orders_path):
-        print("No orders.csv in data_dir")
+_worker_features = {}
+
+def _open_features(path):
+    """The FeatureMatrix at `path`, memory-mapped once per process."""
+    if path not in _worker_features:
+        _worker_features[path] = FeatureMatrix.open(path)
+    return _worker_features[path]
+
+def _train_job(sdf, seller_id, models_dir, n_jobs, features_dir=None):
+    """Worker entry point: train one seller and time it. With
+    `features_dir` its rows come from the shared feature matrix."""
+    start = time.perf_counter()
+    features = _open_features(features_dir) if features_dir else None
+    n_rows = len(features.seller_rows(seller_id)[1]) if features is not None else len(sdf)
+    try:
+        trained = train_for_seller(sdf, seller_id, models_dir, n_jobs=n_jobs, features=features)
+        status, error = ("trained" if trained else "skipped"), None
+    except Exception as e:
+        status, error = "error", str(e)
+    return {
+        'seller_id': seller_id,
+        'status': status,
+        'n_rows': int(n_rows),
+        'seconds': round(time.perf_counter() - start, 3),
+        'error': error,
+    }
+
+def plan_workers(n_sellers, workers=None, cores=None):
+    """(process count, RandomForest n_jobs per process) that together use
+    about one thread per core without oversubscribing."""
+    cores = cores or os.cpu_count() or 1
+    workers = workers or min(cores, n_sellers) or 1
+    return workers, max(1, cores // workers)
+
+# ------------------------------------------------------------
+# Training manifest
+#
+# models/train_manifest.json records, per seller, a fingerprint of the
+# training slice the current model was built from and a hash of the
+# feature schema it was encoded with. Sellers whose fingerprint and
+# schema are both unchanged are not retrained.
+# ------------------------------------------------------------
+
+MANIFEST_FILE = "train_manifest.json"
+TRAINING_COLUMNS = ['Order_ID'] + FEATURES + ['Returned']
+
+def feature_schema_hash():
+    spec = {
+        'features': FEATURES,
+        'numeric': NUMERIC_FEATURES,
+        'categorical': CATEGORICAL_FEATURES,
+        'training_columns': TRAINING_COLUMNS,
+        'encoding': 'global_vocabulary_float32',
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+def seller_fingerprints(df):
+    """({seller_id: content hash of that seller's training rows},
+    {seller_id: row count}). Rows are hashed once, vectorized, and then
+    combined per seller; no per-seller frames are built."""
+    cols = [c for c in TRAINING_COLUMNS if c in df.columns]
+    row_hashes = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    fingerprints, sizes = {}, {}
+    for seller_id, positions in df.groupby('seller_id', sort=False, observed=True).indices.items():
+        fingerprints[seller_id] = hashlib.sha1(row_hashes[positions].tobytes()).hexdigest()
+        sizes[seller_id] = len(positions)
+    return fingerprints, sizes
+
+def load_manifest(models_dir):
+    path = os.path.join(models_dir, MANIFEST_FILE)
+    try:
+        with open(path) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('sellers', {})
+    return manifest
+
+def save_manifest(models_dir, manifest):
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, MANIFEST_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def is_unchanged(manifest, seller_id, fingerprint, models_dir, schema):
+    entry = manifest['sellers'].get(str(seller_id))
+    if entry is None or entry.get('fingerprint') != fingerprint:
+        return False
+    if entry.get('feature_schema') != schema:
+        return False  # built on another feature layout
+    if entry.get('status') == 'trained':
+        return os.path.exists(os.path.join(models_dir, f"model_{seller_id}.joblib"))
+    return entry.get('status') == 'skipped'
+
+def train_all(data_dir, models_dir, workers=None, force=False, sellers=None):
+    # only the columns that are fingerprinted, typed (columnar store when current)
+    df = read_table(data_dir, 'orders', ['seller_id'] + TRAINING_COLUMNS)
+    if df.empty:
+        print("No orders in data_dir")
         return
-    df = pd.read_csv(orders_path)
-    sellers = df['seller_id'].unique()
-    for s in sellers:
-        try:
-            train_for_seller(df, s, models_dir)
-        except Exception as e:
-            print("Error training", s, e)
+
+    manifest = load_manifest(models_dir)
+    schema = feature_schema_hash()
+    manifest.pop('feature_schema', None)  # older manifests kept one for all sellers
+    fingerprints, sizes = seller_fingerprints(df)
+    del df
+
+    groups = list(sizes)
+    if sellers:
+        wanted = set(sellers)
+        groups = [s for s in groups if str(s) in wanted]
+    unchanged = [] if force else [
+        s for s in groups if is_unchanged(manifest, s, fingerprints[s], models_dir, schema)
+    ]
+    skip = set(unchanged)
+    groups = [s for s in groups if s not in skip]
+
+    # every seller's rows, encoded once and memory-mapped by the workers
+    features_dir = load_feature_matrix(data_dir).path if groups else None
+
+    workers, n_jobs = plan_workers(len(groups), workers)
+    print(f"Training {len(groups)} sellers with {workers} process(es) x {n_jobs} thread(s)"
+          f" ({len(unchanged)} unchanged)")
+
+    start = time.perf_counter()
+    results = []
+
+    def report(res):
+        results.append(res)
+        if res['status'] in ('trained', 'skipped'):
+            manifest['sellers'][str(res['seller_id'])] = {
+                'fingerprint': fingerprints[res['seller_id']],
+                'feature_schema': schema,
+                'n_rows': res['n_rows'],
+                'status': res['status'],
+                'trained_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        note = f" ({res['error']})" if res['error'] else ""
+        print(f"[{len(results)}/{len(groups)}] {res['seller_id']}: {res['status']} in {res['seconds']:.2f}s{note}")
+
+    try:
+        if workers == 1:
+            for s in groups:
+                report(_train_job(None, s, models_dir, n_jobs, features_dir))
+        else:
+            # largest sellers first so a big one does not start last
+            groups.sort(key=lambda s: sizes[s], reverse=True)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_train_job, None, s, models_dir, n_jobs, features_dir) for s in groups]
+                for fut in as_completed(futures):
+                    report(fut.result())
+    finally:
+        # keep whatever finished, even if the run is interrupted
+        save_manifest(models_dir, manifest)
+
+    summary = {
+        'workers': workers,
+        'n_jobs_per_worker': n_jobs,
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'trained': sum(r['status'] == 'trained' for r in results),
+        'skipped': sum(r['status'] == 'skipped' for r in results),
+        'errors': sum(r['status'] == 'error' for r in results),
+        'unchanged': len(unchanged),
+        'sellers': sorted(results, key=lambda r: str(r['seller_id'])),
+    }
+    os.makedirs(models_dir, exist_ok=True)
+    with open(os.path.join(models_dir, "train_summary.json"), "w") as fh:
+        json.dump(summary, fh, indent=2)
+    print(f"Done in {summary['total_seconds']:.1f}s: trained={summary['trained']} "
+          f"skipped={summary['skipped']} errors={summary['errors']} unchanged={summary['unchanged']}")
+    return summary
 
 if __name__ == "__main__":
-    import sys
-    data_dir = sys.argv[1] if len(sys.argv)>1 else './data'
-    models_dir = sys.argv[2] if len(sys.argv)>2 else './models'
-    train_all(data_dir, models_dir)
+    parser = argparse.ArgumentParser(description="Train one return-risk model per seller.")
+    parser.add_argument('data_dir', nargs='?', default='./data')
+    parser.add_argument('models_dir', nargs='?', default='./models')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="training processes (default: one per core, at most one per seller)")
+    parser.add_argument('--force', action='store_true',
+                        help="retrain even if a seller's data is unchanged since the last run")
+    parser.add_argument('--sellers', default=None,
+                        help="comma-separated seller ids to consider (default: all)")
+    args = parser.parse_args()
+    sellers = [s.strip() for s in args.sellers.split(',') if s.strip()] if args.sellers else None
+    train_all(args.data_dir, args.models_dir, workers=args.workers, force=args.force, sellers=sellers)
@@ -1,73 +1,540 @@
 # backend/utils.py
 import pandas as pd
 import os
-import joblib
+import json
+import base64
+import hashlib
+import sys
 import numpy as np
-from datetime import datetime
+
+from alerts import evaluate_alerts
+from cache import dataset_cache, file_signature
+from features import MATRIX_COLUMNS, FeatureMatrix, features_path
+from explain import ORDER_COLUMNS as EXPLAIN_ORDER_COLUMNS, PRED_COLUMNS as EXPLAIN_PRED_COLUMNS, SellerFeatures
+from aggregates import MarketplaceAggregates, ScopeAggregates, RISK_LIMBS, limb_means, risk_limbs, ORDER_COLUMNS as AGG_ORDER_COLUMNS, PRED_COLUMNS as AGG_PRED_COLUMNS
+from index import PartitionIndex, TimeIndex
+from ingest import log_path, prediction_log
+from metrics import stage, timed
+from responses import frame_records, orjson
+from shared import SHARED_DATASET, SHARED_TABLES, shared_table
+from sqlstore import SQL_COLUMNS, SqliteStore, sqlite_path
+from storage import META_FILE, ORDERS_SCHEMA, PREDICTIONS_SCHEMA, TABLES, concat_typed, csv_path, empty_frame, is_append_of, read_appended, read_table, store_path
 
 # ------------------------------------------------------------
 # Loaders
+#
+# All loaders return typed frames (see storage.py for the schemas) and
+# go through the shared dataset cache, so each table is read once per
+# change on disk. Pass `columns` to read only what an endpoint needs.
+# Returned frames are shared between requests: do not modify them in place.
 # ------------------------------------------------------------
 
-def load_sellers(data_dir):
-    path = os.path.join(data_dir, "sellers.csv")
-    if not os.path.exists(path):
-        return pd.DataFrame(columns=["seller_id", "seller_name", "marketplace_id"])
-    return pd.read_csv(path, dtype=str)
+# timestamp column each table's time index is ordered by
+TIME_COLUMNS = {"orders": "order_timestamp", "predictions": "timestamp"}
+
+
+@timed
+def load_sellers(data_dir, columns=None):
+    return _load_table(data_dir, "sellers", columns)
+
+
+@timed
+def load_orders(data_dir, columns=None):
+    return _load_table(data_dir, "orders", columns)
+
+
+@timed
+def load_batch_predictions(data_dir, columns=None):
+    return _load_table(data_dir, "predictions", columns)
+
+
+def _load_table(data_dir, table, columns=None):
+    """Typed, optionally column-projected read of one table.
+
+    Reads the columnar store (see storage.py) when it is up to date with
+    the CSV and falls back to parsing the CSV otherwise. Rows appended to
+    the CSV after the cached read are parsed on their own and added on.
+    Predictions also include the ingestion log (see ingest.py) after the
+    CSV rows; new segments are likewise read on their own.
+    """
+    columns = tuple(columns) if columns is not None else None
+    if SHARED_DATASET and table in SHARED_TABLES:
+        return _load_shared(data_dir, table, columns)
+
+    def update(old, old_signature, signature):
+        if old_signature[1] != signature[1]:
+            return None  # columnar store rebuilt
+        if table != "predictions":
+            return read_appended(data_dir, table, old, columns)
+        if old.attrs.get("log_rows"):
+            # CSV rows added now would land before rows already read from the log
+            if not _csv_unchanged(data_dir, table, old.attrs):
+                return None
+            base = old
+        else:
+            base = read_appended(data_dir, table, old, columns)
+            if base is None:
+                return None
+        return prediction_log(data_dir).read_onto(base, columns, after=old.attrs.get("log_seq", 0))
+
+    return dataset_cache.get(
+        (table, data_dir, columns), _table_paths(data_dir, table),
+        lambda: _read_table(data_dir, table, columns), update,
+    )
+
+
+def _load_shared(data_dir, table, columns):
+    """The table attached from its shared snapshot (see shared.py), which
+    is re-published first if the files changed since."""
+    shared = shared_table(data_dir, table)
 
+    def attach():
+        publish_shared_table(data_dir, table)
+        return shared.attach(columns)
+
+    return dataset_cache.get(
+        ("shared", table, data_dir, columns), _table_paths(data_dir, table) + (shared.state_path,), attach,
+    )
+
+
+def publish_shared_table(data_dir, table):
+    """Publish a new snapshot of `table` unless the current one is up to
+    date; the first process to notice a change does it, the others wait
+    and reuse it. Appended rows are added onto the previous snapshot."""
+    shared = shared_table(data_dir, table)
+    version = dataset_version(data_dir, [table])
+    if shared.state().get("dataset_version") == version:
+        return
+
+    with shared.locked():
+        state = shared.state()
+        if state.get("dataset_version") == version:
+            return
+        new = read_new_rows(data_dir, table, state["source"]) if state else None
+        if new is None:
+            shared.publish(_read_table(data_dir, table, None), version)
+        elif new.empty:
+            shared.relabel(version, dict(new.attrs))
+        else:
+            shared.publish(concat_typed(shared.attach(), new), version)
 
-def load_orders(data_dir):
-    path = os.path.join(data_dir, "orders.csv")
-    if not os.path.exists(path):
-        cols = [
-            'Order_ID','Product_Category','Product_Price','Discount_Applied',
-            'Delivery_Time_Days','Customer_Type','Payment_Method',
-            'Customer_Return_Rate','Product_Rating','Returned',
-            'seller_id','marketplace_id','order_timestamp'
-        ]
-        return pd.DataFrame(columns=cols)
 
-    df = pd.read_csv(path, dtype=str)
+def _table_paths(data_dir, table):
+    paths = (csv_path(data_dir, table), os.path.join(store_path(data_dir, table), META_FILE))
+    if table == "predictions":
+        paths += (log_path(data_dir),)  # directory mtime changes as segments come and go
+    return paths
 
-    if 'order_timestamp' not in df.columns:
-        df['order_timestamp'] = pd.NaT
+
+def _read_table(data_dir, table, columns):
+    # timed separately from load_*, which is mostly cache hits
+    with stage(f"read_table.{table}"):
+        if table != "predictions":
+            return read_table(data_dir, table, columns)
+        try:
+            base = read_table(data_dir, table, columns)
+        except Exception as e:
+            # unreadable CSV: serve the log alone and leave the file for inspection
+            print(f"Could not read {csv_path(data_dir, table)}: {e}", file=sys.stderr)
+            base = empty_frame(PREDICTIONS_SCHEMA, columns)
+        return prediction_log(data_dir).read_onto(base, columns)
+
+
+@timed
+def load_partition_index(data_dir, table, column):
+    """PartitionIndex of `table` by `column` (e.g. orders by seller_id).
+
+    Built once per dataset version and extended with appended rows only.
+    Positions refer to rows of any load_* result for the same table.
+    """
+    def build():
+        keys = _load_table(data_dir, table, [column])
+        return PartitionIndex.build(keys[column], source=dict(keys.attrs))
+
+    def update(index, old_signature, signature):
+        if not _only_appended(data_dir, table, index.source):
+            return None
+        keys = _load_table(data_dir, table, [column])
+        if len(keys) < index.n_rows:
+            return None
+        return index.extend(keys[column].iloc[index.n_rows:], source=dict(keys.attrs))
+
+    return dataset_cache.get(("index", table, data_dir, column), _table_paths(data_dir, table), build, update)
+
+
+@timed
+def load_time_index(data_dir, table, column=None):
+    """TimeIndex of `table` by `column` (None: whole table only), ordered
+    by the table's TIME_COLUMNS entry. Cached and extended like
+    load_partition_index."""
+    time_column = TIME_COLUMNS[table]
+    columns = [time_column] if column is None else [column, time_column]
+
+    def keys_of(df):
+        return None if column is None else df[column]
+
+    def build():
+        df = _load_table(data_dir, table, columns)
+        return TimeIndex.build(keys_of(df), df[time_column], source=dict(df.attrs))
+
+    def update(index, old_signature, signature):
+        if not _only_appended(data_dir, table, index.source):
+            return None
+        df = _load_table(data_dir, table, columns)
+        if len(df) < index.n_rows:
+            return None
+        new = df.iloc[index.n_rows:]
+        return index.extend(keys_of(new), new[time_column], source=dict(df.attrs))
+
+    return dataset_cache.get(("time_index", table, data_dir, column), _table_paths(data_dir, table), build, update)
+
+
+@timed
+def load_marketplace_aggregates(data_dir):
+    """MarketplaceAggregates over the current orders and predictions,
+    extended in place of a rebuild when rows are only appended."""
+    def frames():
+        o = _load_table(data_dir, "orders", AGG_ORDER_COLUMNS)
+        p = _load_table(data_dir, "predictions", AGG_PRED_COLUMNS)
+        return o, p, {"orders": dict(o.attrs), "predictions": dict(p.attrs)}
+
+    def build():
+        o, p, source = frames()
+        return MarketplaceAggregates.build(o, p, source)
+
+    def update(agg, old_signature, signature):
+        if not all(_only_appended(data_dir, t, agg.source.get(t, {})) for t in ("orders", "predictions")):
+            return None
+        o, p, source = frames()
+        if len(o) < agg.n_orders or len(p) < agg.n_preds:
+            return None
+        return agg.extend(o.iloc[agg.n_orders:], p.iloc[agg.n_preds:], source)
+
+    paths = _table_paths(data_dir, "orders") + _table_paths(data_dir, "predictions")
+    return dataset_cache.get(("aggregates", data_dir), paths, build, update)
+
+
+@timed
+def load_seller_features(data_dir):
+    """SellerFeatures (see explain.py) over the current orders and
+    predictions, extended in place of a rebuild when rows are only appended."""
+    def frames():
+        o = _load_table(data_dir, "orders", EXPLAIN_ORDER_COLUMNS)
+        p = _load_table(data_dir, "predictions", EXPLAIN_PRED_COLUMNS)
+        return o, p, {"orders": dict(o.attrs), "predictions": dict(p.attrs)}
+
+    def build():
+        o, p, source = frames()
+        return SellerFeatures.build(o, p, source)
+
+    def update(features, old_signature, signature):
+        if not all(_only_appended(data_dir, t, features.source.get(t, {})) for t in ("orders", "predictions")):
+            return None
+        o, p, source = frames()
+        if len(o) < features.n_orders or len(p) < features.n_preds:
+            return None
+
+        def orders_of(seller_ids):
+            index = load_partition_index(data_dir, "orders", "seller_id")
+            rows = np.sort(np.concatenate([index.rows(s) for s in seller_ids]))
+            return o.iloc[rows[rows < len(o)]]
+
+        return features.extend(o.iloc[features.n_orders:], p.iloc[features.n_preds:], orders_of, source)
+
+    paths = _table_paths(data_dir, "orders") + _table_paths(data_dir, "predictions")
+    return dataset_cache.get(("seller_features", data_dir), paths, build, update)
+
+
+@timed
+def load_feature_matrix(data_dir):
+    """FeatureMatrix (see features.py) of the current orders: the one on
+    disk if it was built from the same files, otherwise rebuilt there."""
+    path = features_path(data_dir)
+
+    def load():
+        source = dataset_version(data_dir, ["orders"])
+        matrix = FeatureMatrix.open(path)
+        if matrix is None or matrix.source != source:
+            matrix = FeatureMatrix.build(read_table(data_dir, "orders", MATRIX_COLUMNS), path, source)
+        return matrix
+
+    return dataset_cache.get(("feature_matrix", data_dir), _table_paths(data_dir, "orders"), load)
+
+
+def current_feature_matrix(data_dir):
+    """The FeatureMatrix on disk if it was built from the current orders,
+    else None; unlike load_feature_matrix it never builds one."""
+    matrix = FeatureMatrix.open(features_path(data_dir))
+    if matrix is None or matrix.source != dataset_version(data_dir, ["orders"]):
+        return None
+    return matrix
+
+
+@timed
+def load_sqlite_store(data_dir, path=None):
+    """SqliteStore (see sqlstore.py) holding the current orders and
+    predictions. Checked against the files on every call like the other
+    loaders; on a change the first caller in any process syncs the file."""
+    path = path or sqlite_path(data_dir)
+    paths = _table_paths(data_dir, "orders") + _table_paths(data_dir, "predictions")
+
+    def update(old, old_signature, signature):
+        store = sync_sqlite_store(data_dir, path)
+        old.close()  # the replaced store's per-thread reader connections
+        return store
+
+    return dataset_cache.get(("sqlite", path), paths, lambda: sync_sqlite_store(data_dir, path), update)
+
+
+def sync_sqlite_store(data_dir, path=None):
+    """Bring the SQLite file up to date: rows appended since the last sync
+    are inserted, a table that was rewritten is replaced."""
+    store = SqliteStore(path or sqlite_path(data_dir))
+    version = dataset_version(data_dir, SQL_COLUMNS)
+    if store.source().get("version") == version:
+        return store
+
+    with store.writing() as conn:
+        # another process may have synced while we waited for the lock
+        source = store.source()
+        if source.get("version") == version:
+            return store
+        for table, columns in SQL_COLUMNS.items():
+            new = read_new_rows(data_dir, table, source[table], columns) if table in source else None
+            if new is None:
+                new = _read_table(data_dir, table, columns)
+                store.replace_rows(conn, table, new)
+            else:
+                store.append_rows(conn, table, new)
+            source[table] = dict(new.attrs)
+        source["version"] = version
+        store.write_source(conn, source)
+    return store
+
+
+def read_new_rows(data_dir, table, source, columns=None):
+    """Rows appended to `table` since the read whose attrs were `source`,
+    with attrs as of a full read now; None if the table was rewritten."""
+    if not _only_appended(data_dir, table, source):
+        return None
+    df = empty_frame(TABLES[table][1], columns)
+    df.attrs = dict(source)
+    if not (table == "predictions" and source.get("log_rows")):
+        df = read_appended(data_dir, table, df, columns)
+        if df is None:
+            return None
+    if table != "predictions":
+        return df
+    return prediction_log(data_dir).read_onto(df, columns, after=source.get("log_seq", 0))
+
+
+def dataset_version(data_dir, tables, extra_paths=()):
+    """Short hash of the on-disk signatures of `tables` (CSV and columnar
+    store) and `extra_paths`; it changes whenever any of them does."""
+    paths = [p for t in tables for p in _table_paths(data_dir, t)] + list(extra_paths)
+    raw = json.dumps([paths, file_signature(tuple(paths))])
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _only_appended(data_dir, table, source):
+    """True if the table has only had rows appended since `source` (the
+    attrs of an earlier read) was loaded: to the CSV, or for predictions
+    to the ingestion log (CSV unchanged once log rows have been read)."""
+    if table != "predictions":
+        return is_append_of(csv_path(data_dir, table), source.get("source_bytes"), source.get("source_fingerprint"))
+    if source.get("log_rows"):
+        csv_ok = _csv_unchanged(data_dir, table, source)
     else:
-        df['order_timestamp'] = pd.to_datetime(df['order_timestamp'], errors='coerce')
+        csv_ok = is_append_of(csv_path(data_dir, table), source.get("source_bytes"), source.get("source_fingerprint"))
+    return csv_ok and prediction_log(data_dir).last_seq() >= source.get("log_seq", 0)
+
+
+def _csv_unchanged(data_dir, table, source):
+    path = csv_path(data_dir, table)
+    if not source.get("source_bytes"):
+        return not os.path.exists(path)
+    return (
+        is_append_of(path, source["source_bytes"], source.get("source_fingerprint"))
+        and os.path.getsize(path) == source["source_bytes"]
+    )
+
+
+@timed
+def select_partition(df, data_dir, table, column, key):
+    """Rows of `df` (loaded from `table`) where `column == key`, looked up
+    through the partition index instead of a full boolean scan."""
+    if not key:
+        return df
+    return load_partition_index(data_dir, table, column).take(df, key)
 
-    return df
 
+def parse_time_window(start=None, end=None):
+    """(start, end) query values -> int64 ns [start, end) bounds, None when
+    not given. A date-only `end` includes that whole day. ValueError if
+    either does not parse."""
+    def parse(value, name):
+        try:
+            ts = pd.Timestamp(value)
+        except (ValueError, TypeError):
+            raise ValueError(f"{name} must be an ISO date or datetime")
+        if pd.isna(ts) or ts.tzinfo is not None:
+            raise ValueError(f"{name} must be an ISO date or datetime without a timezone")
+        return ts
+
+    lo = parse(start, "start").value if start else None
+    hi = None
+    if end:
+        ts = parse(end, "end")
+        if len(end.strip()) <= 10:  # date only
+            ts += pd.Timedelta(days=1)
+        hi = ts.value
+    return lo, hi
+
+
+@timed
+def select_window(df, data_dir, table, column, key, start=None, end=None):
+    """Rows of `df` (loaded from `table`) for `column == key` (all rows if
+    key is empty) with TIME_COLUMNS[table] in [start, end), found by
+    binary search in the time index; cost follows the window size, not
+    the table size. Without a window this is select_partition."""
+    if start is None and end is None:
+        return select_partition(df, data_dir, table, column, key)
+    if not key:
+        return load_time_index(data_dir, table).take(df, None, start, end)
+    return load_time_index(data_dir, table, column).take(df, key, start, end)
 
-def load_batch_predictions(data_dir):
-    path = os.path.join(data_dir, "batch_predictions.csv")
 
-    required = [
-        "Order_ID","seller_id","marketplace_id",
-        "Product_Category","Customer_Type","Payment_Method",
-        "risk_score","risk_label","timestamp"
-    ]
+# ------------------------------------------------------------
+# Order listing: keyset pagination + streaming
+# ------------------------------------------------------------
 
-    if not os.path.exists(path):
-        return pd.DataFrame(columns=required)
+def encode_cursor(ts_ns, order_id):
+    raw = json.dumps([int(ts_ns), order_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
 
+
+def decode_cursor(cursor):
+    """(timestamp ns, Order_ID) from a cursor; ValueError if malformed."""
     try:
-        df = pd.read_csv(path)
+        ts_ns, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(ts_ns), str(order_id)
     except Exception:
-        df = pd.DataFrame(columns=required)
-        df.to_csv(path, index=False)
-        return df
+        raise ValueError("invalid cursor")
+
+
+def newest_first_order(orders):
+    """(positions, ts, ids): row positions of `orders` sorted by
+    (order_timestamp, Order_ID) descending, with the int64 ns timestamps
+    and Order_IDs in that order. Only the two key columns are touched."""
+    ts = orders["order_timestamp"].to_numpy(dtype="datetime64[ns]").view("int64")  # NaT sorts last
+    ids = orders["Order_ID"].fillna("").to_numpy(dtype=object)
+    id_codes, _ = pd.factorize(ids, sort=True)
+    positions = np.lexsort((id_codes, ts))[::-1]
+    return positions, ts[positions], ids[positions]
+
+
+@timed
+def load_newest_first(data_dir, seller_id=None):
+    """newest_first_order() of the seller's orders (all orders without
+    one), as select_partition returns them; sorted once per change of the
+    orders files and reused by every page."""
+    def build():
+        orders = load_orders(data_dir, columns=["seller_id", "order_timestamp", "Order_ID"])
+        return newest_first_order(select_partition(orders, data_dir, "orders", "seller_id", seller_id))
+
+    return dataset_cache.get(("newest_first", data_dir, seller_id or None), _table_paths(data_dir, "orders"), build)
+
+
+@timed
+def orders_newest_first(orders, cursor=None, limit=None, order=None):
+    """Row positions of `orders` sorted by (order_timestamp, Order_ID)
+    descending, starting after `cursor`, at most `limit` of them; plus the
+    cursor for the next page (None on the last page). `order` is
+    newest_first_order(orders) if already known (see load_newest_first);
+    a page is then two binary searches instead of a sort."""
+    if order is None or len(order[0]) != len(orders):
+        order = newest_first_order(orders)
+    positions, ts, ids = order
+
+    start = 0
+    if cursor is not None:
+        c_ts, c_id = decode_cursor(cursor)
+        # ts is descending: [newer, equal) bounds the rows stamped c_ts,
+        # whose ids are descending too; the page starts at the first id < c_id
+        ascending = ts[::-1]
+        newer = len(ts) - np.searchsorted(ascending, c_ts, side="right")
+        equal = len(ts) - np.searchsorted(ascending, c_ts, side="left")
+        start = newer + int(np.count_nonzero(ids[newer:equal] >= c_id))
+    positions = positions[start:]
+
+    next_cursor = None
+    if limit is not None and len(positions) > limit:
+        positions = positions[:limit]
+        last = start + limit - 1
+        next_cursor = encode_cursor(ts[last], ids[last])
+    return positions, next_cursor
+
+
+def iter_json_records(df, positions, fields=None, ndjson=False, chunk_rows=1000):
+    """Serialize df.iloc[positions] as a JSON array (or NDJSON lines),
+    one chunk at a time, so no full record list is ever built. The
+    "iter_json_records" stage also covers the time spent sending."""
+    with stage("iter_json_records"):
+        if not ndjson:
+            yield "["
+        first = True
+        for start in range(0, len(positions), chunk_rows):
+            records = order_records(df, positions[start:start + chunk_rows], fields)
+            if not records:
+                continue
+            if ndjson:
+                yield "".join(_json_line(rec) + "\n" for rec in records)
+            elif orjson is not None:
+                # one call per chunk: the array body, without its brackets
+                body = orjson.dumps(records).decode()[1:-1]
+                yield body if first else "," + body
+            else:
+                body = ",".join(json.dumps(rec) for rec in records)
+                yield body if first else "," + body
+            first = False
+        if not ndjson:
+            yield "]"
+
+
+def _json_line(rec):
+    return orjson.dumps(rec).decode() if orjson is not None else json.dumps(rec)
+
+
+def order_frame(df, positions, fields=None):
+    """df.iloc[positions] formatted like /seller_orders rows."""
+    chunk = df.iloc[positions]
+    if fields is not None:
+        chunk = chunk[fields]
+    if "order_timestamp" in chunk.columns:
+        chunk = chunk.assign(order_timestamp=chunk["order_timestamp"].astype(str))
+    # whole-number columns are float64 so missing stays NaN; show them as integers
+    whole = {
+        c: "Int64" for c in chunk.columns
+        if ORDERS_SCHEMA.get(c) == "int" and (chunk[c].dropna() % 1 == 0).all()
+    }
+    return chunk.astype(whole) if whole else chunk
+
 
-    for col in required:
-        if col not in df.columns:
-            df[col] = None
+@timed
+def order_records(df, positions, fields=None):
+    """Records for df.iloc[positions], formatted like /seller_orders rows."""
+    return to_records(order_frame(df, positions, fields))
 
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
 
-    return df
+@timed
+def to_records(df):
+    """JSON-safe records with missing values rendered as "" (works for categoricals too)."""
+    return frame_records(df)
 
 
 def get_seller_marketplace(seller_id, data_dir):
     sellers = load_sellers(data_dir)
-    row = sellers[sellers["seller_id"] == seller_id]
+    row = select_partition(sellers, data_dir, "sellers", "seller_id", seller_id)
     if row.empty:
         return None
     return row.iloc[0]["marketplace_id"]
@@ -77,84 +544,23 @@ def get_seller_marketplace(seller_id, data_dir):
 # Aggregations
 # ------------------------------------------------------------
 
+@timed
 def compute_marketplace_stats(orders_df, preds_df, marketplace_id=None):
-    o = orders_df.copy()
-    p = preds_df.copy()
+    """Marketplace dashboard stats; every group-by (date, category, seller)
+    and the health score come from one ScopeAggregates pass over the rows."""
+    o = orders_df
+    p = preds_df
 
     if marketplace_id:
         o = o[o["marketplace_id"] == marketplace_id]
         p = p[p["marketplace_id"] == marketplace_id]
 
-    total_orders = len(o)
-    total_sellers = o["seller_id"].nunique()
-
-    # Trend
-    if not p.empty:
-        p["timestamp"] = pd.to_datetime(p["timestamp"], errors="coerce")
-        p["date"] = p["timestamp"].dt.date
-        trend = (
-            p.groupby("date")["risk_score"]
-            .mean()
-            .reset_index()
-            .to_dict(orient="records")
-        )
-    else:
-        trend = []
-
-    # Category risk
-    if not p.empty and "Product_Category" in p.columns:
-        cat = (
-            p.groupby("Product_Category")["risk_score"]
-            .mean()
-            .reset_index()
-            .to_dict(orient="records")
-        )
-    else:
-        cat = []
-
-    # Top risky sellers
-    if not p.empty:
-        top = (
-            p.groupby("seller_id")["risk_score"]
-            .mean()
-            .reset_index()
-            .sort_values("risk_score", ascending=False)
-            .to_dict(orient="records")
-        )
-    else:
-        top = []
-
-    if not p.empty:
-        high_risk_orders = int((p["risk_score"] >= 0.75).sum())
-        high_risk_ratio = float((p["risk_score"] >= 0.75).mean())
-        max_risk = float(p["risk_score"].max())
-    else:
-        high_risk_orders = 0
-        high_risk_ratio = 0.0
-        max_risk = 0.0
-
-    # ---------------------------------------------------------
-    # NEW: Marketplace Health Score
-    # ---------------------------------------------------------
-    health_score = compute_marketplace_health(o, p)
-    alerts = compute_risk_alerts(p, o)
-
-    return {
-        "total_orders": int(total_orders),
-        "total_sellers": int(total_sellers),
-        "trend": trend,
-        "category_risk": cat,
-        "top_risky_sellers": top,
-        "health_score": health_score,
-        "alerts": alerts,
-        "high_risk_orders": high_risk_orders,
-        "high_risk_ratio": round(high_risk_ratio, 3),
-        "max_risk": round(max_risk, 3),
-    }
+    return ScopeAggregates.from_frames(o, p).stats()
 
 
+@timed
 def compute_category_risk(orders_df, preds_df, marketplace_id=None):
-    p = preds_df.copy()
+    p = preds_df
 
     if marketplace_id:
         p = p[p["marketplace_id"] == marketplace_id]
@@ -162,48 +568,57 @@ def compute_category_risk(orders_df, preds_df, marketplace_id=None):
     if p.empty:
         return []
 
-    agg = (
-        p.groupby("Product_Category")
-        .agg(avg_risk=("risk_score", "mean"))
-        .reset_index()
-        .sort_values("avg_risk", ascending=False)
-    )
-
-    return agg.to_dict(orient="records")
+    return ScopeAggregates.from_frames(None, p, groupings=("category",)).category_risk()
 
 
+@timed
 def compute_seller_trend(preds_df):
     p = preds_df.copy()
     if p.empty:
         return []
-    p['date'] = pd.to_datetime(p['timestamp']).dt.date
-    t = p.groupby(['date']).agg(
-        avg_risk=('risk_score','mean'),
-        high_count=('risk_label', lambda x: (x=='High').sum())
-    ).reset_index()
+    with stage("to_datetime"):
+        p['date'] = pd.to_datetime(p['timestamp']).dt.date
+    p['high'] = (p['risk_label'] == 'High').to_numpy()
+    # exact risk sums, as for the marketplace aggregates (see aggregates.py)
+    p[RISK_LIMBS] = risk_limbs(p['risk_score']).T
+    g = p.groupby(['date'])
+    t = g[RISK_LIMBS].sum().assign(count=g['risk_score'].count())
+    t = pd.DataFrame({
+        'date': t.index,
+        'avg_risk': limb_means(t),
+        'high_count': g['high'].sum().to_numpy(),
+    })
+    # a day with no risk scores: null rather than NaN, which is not JSON
+    t['avg_risk'] = t['avg_risk'].astype(object).where(t['avg_risk'].notna(), None)
     return t.sort_values('date').to_dict(orient='records')
 
 
-def compute_category_trend(orders_df, preds_df, marketplace_id=None, top_n=6):
+@timed
+def compute_category_trend(orders_df, preds_df, marketplace_id=None, top_n=6, bucket="day", top_only=False):
     """
-    Returns time-series (daily) average risk per Product_Category.
+    Returns time-series average risk per Product_Category, one point per
+    day (or per week / month with `bucket`).
 
     Output structure:
-    [
-      {
-        "category": "Electronics",
-        "points": [
-          {"date": "2025-11-01", "avg_risk": 0.12},
-          {"date": "2025-11-02", "avg_risk": 0.14},
-          ...
-        ]
-      },
-      ...
-    ]
+    {
+      "series": [
+        {
+          "category": "Electronics",
+          "points": [
+            {"date": "2025-11-01", "avg_risk": 0.12},
+            {"date": "2025-11-02", "avg_risk": 0.14},
+            ...
+          ]
+        },
+        ...
+      ],
+      "top_categories": [...]   # top_n categories by average risk
+    }
     If marketplace_id provided, filters both orders & preds before computing.
+    With top_only, only the top_n categories' series are returned.
     """
-    o = orders_df.copy()
-    p = preds_df.copy()
+    o = orders_df
+    p = preds_df
 
     if marketplace_id:
         o = o[o.get("marketplace_id", "") == marketplace_id]
@@ -212,55 +627,28 @@ def compute_category_trend(orders_df, preds_df, marketplace_id=None, top_n=6):
     if p.empty:
         return []
 
-    # Ensure timestamp + date
-    p = p.copy()
-    p["timestamp"] = pd.to_datetime(p["timestamp"], errors="coerce")
-    p["date"] = p["timestamp"].dt.date
-
     # If Product_Category not present in predictions but present in orders,
     # do a left-merge to bring it in (safe merge)
     if "Product_Category" not in p.columns:
-        merged = p.merge(
+        p = p.merge(
             o[["Order_ID", "seller_id", "marketplace_id", "Product_Category"]],
             on=["Order_ID", "seller_id", "marketplace_id"],
             how="left",
         )
-    else:
-        merged = p.copy()
 
     # Drop rows without category
-    merged = merged[merged["Product_Category"].notna() & (merged["Product_Category"] != "")]
+    p = p[p["Product_Category"].notna() & (p["Product_Category"] != "")]
 
-    if merged.empty:
+    if p.empty:
         return []
 
-    # group by date + category -> average risk
-    grp = merged.groupby(["Product_Category", "date"])["risk_score"].mean().reset_index()
-    grp = grp.sort_values(["Product_Category", "date"])
-
-    # find top categories by overall avg risk (or volume) to limit series when no category filter
-    top_categories = (
-        grp.groupby("Product_Category")["risk_score"]
-        .mean()
-        .reset_index()
-        .sort_values("risk_score", ascending=False)
-        .head(top_n)
-        .Product_Category
-        .tolist()
-    )
-
-    # build time series points for each category found in data
-    series = []
-    categories = grp["Product_Category"].unique().tolist()
-
-    for cat in categories:
-        points_df = grp[grp["Product_Category"] == cat][["date", "risk_score"]]
-        points = [{"date": d.isoformat(), "avg_risk": float(r)} for d, r in zip(points_df["date"], points_df["risk_score"])]
-        series.append({"category": cat, "points": points})
+    # category + day risk sums and counts, as for the marketplace aggregates
+    p = p.assign(timestamp=pd.to_datetime(p["timestamp"], errors="coerce"))
+    agg = ScopeAggregates.from_frames(None, p, groupings=("category_daily",))
+    if agg.category_daily.empty:
+        return {"series": [], "top_categories": []}
 
-    # return all series, but frontend will choose a single one if user supplied category param
-    # also include a small metadata item 'top_categories' which helps frontend rendering decisions
-    return {"series": series, "top_categories": top_categories}
+    return agg.category_trend(top_n, bucket, top_only)
 
 
 def load_model_stats(models_dir, seller_id):
@@ -270,6 +658,7 @@ def load_model_stats(models_dir, seller_id):
     return pd.read_json(stats_path, typ='series').to_dict()
 
 
+@timed
 def compute_marketplace_health(o, p):
     if p.empty:
         return 60  # neutral if no predictions
@@ -310,71 +699,15 @@ def compute_marketplace_health(o, p):
 
     return max(0, min(100, round(score)))
 
-def compute_risk_alerts(p, o):
-    alerts = []
-
-    if p.empty:
-        return alerts
-
-    # -------------------------------
-    # Seller-based alerts (COUNT, not mean)
-    # -------------------------------
-    seller_stats = p.groupby("seller_id").agg(
-        high_risk_count=("risk_score", lambda x: (x >= 0.75).sum()),
-        total_orders=("risk_score", "count")
-    ).reset_index()
-
-    for _, row in seller_stats.iterrows():
-        ratio = row["high_risk_count"] / row["total_orders"]
-        if row["high_risk_count"] >= 10 and ratio >= 0.25:
-            alerts.append({
-                "type": "seller",
-                "message": (
-                    f"Seller {row['seller_id']} has "
-                    f"{row['high_risk_count']} high-risk orders "
-                    f"({ratio*100:.1f}%)"
-                )
-            })
-
-    # -------------------------------
-    # Category-based alerts (COUNT, not mean)
-    # -------------------------------
-    cat_stats = p.groupby("Product_Category").agg(
-        high_risk_count=("risk_score", lambda x: (x >= 0.75).sum()),
-        total_orders=("risk_score", "count")
-    )
-
-    for cat, row in cat_stats.iterrows():
-        ratio = row["high_risk_count"] / row["total_orders"]
-        if ratio >= 0.3:
-            alerts.append({
-                "type": "category",
-                "message": (
-                    f"{cat} category has "
-                    f"{ratio*100:.1f}% high-risk orders"
-                )
-            })
-
-    return alerts
+@timed
+def compute_risk_alerts(p, o, rules=None):
+    """Alerts from the declarative rules in alerts.py (ALERT_RULES by default)."""
+    return evaluate_alerts(p, rules)
 
+@timed
 def explain_seller_risk(orders_df, preds_df, seller_id):
+    """Reasons for one seller from frames; the API looks them up in the
+    precomputed load_seller_features table instead."""
     sdf = orders_df[orders_df["seller_id"] == seller_id]
     pdf = preds_df[preds_df["seller_id"] == seller_id]
-
-    reasons = []
-
-    if not sdf.empty:
-        if sdf["Returned"].astype(float).mean() > 0.3:
-            reasons.append("High return rate")
-
-        if (sdf["Payment_Method"] == "COD").mean() > 0.5:
-            reasons.append("High COD usage")
-
-        if sdf["Product_Rating"].astype(float).mean() < 3:
-            reasons.append("Low average product rating")
-
-    if not pdf.empty:
-        if pdf["risk_score"].mean() > 0.7:
-            reasons.append("Consistently high predicted risk")
-
-    return reasons
+    return SellerFeatures.build(sdf, pdf).reasons(seller_id)
@@ -4,6 +4,15 @@ import axios from "axios";
 const BASE = process.env.REACT_APP_API_BASE || 
              "https://ecommerce-risk-prediction.onrender.com";
 
+// One round trip per page; the server answers unchanged dashboards with 304
+export const getMarketplaceDashboard = (mid, category = "") =>
+  axios.get(`${BASE}/dashboard`, {
+    params: { marketplace_id: mid || undefined, category: category || undefined },
+  });
+
+export const getSellerDashboard = (sid) =>
+  axios.get(`${BASE}/dashboard`, { params: { seller_id: sid } });
+
 export const getInsights = (mid) =>
   axios.get(`${BASE}/marketplace_stats`, { params: { marketplace_id: mid } });
 
@@ -1,10 +1,5 @@
 import React, { useEffect, useState } from "react";
-import {
-  getInsights,
-  getCategoryRisk,
-  getSellers,
-  getCategoryTrend
-} from "../api";
+import { getMarketplaceDashboard } from "../api";
 
 import {
   LineChart,
@@ -41,12 +36,12 @@ export default function MarketplaceDashboard({ marketplaceId, onViewSeller }) {
   }, [marketplaceId, categoryFilter]);
 
   const loadAll = () => {
-    getInsights(marketplaceId).then((r) => setStats(r.data));
-    getCategoryRisk(marketplaceId).then((r) => setCategoryRisk(r.data));
-    getSellers(marketplaceId).then((r) => setSellers(r.data));
-    getCategoryTrend(marketplaceId, categoryFilter).then((r) =>
-      setCategoryTrend(r.data)
-    );
+    getMarketplaceDashboard(marketplaceId, categoryFilter).then((r) => {
+      setStats(r.data.stats);
+      setCategoryRisk(r.data.category_risk);
+      setSellers(r.data.sellers);
+      setCategoryTrend(r.data.category_trend);
+    });
   };
 
   /* ---------------- FILTER TREND ---------------- */
@@ -1,10 +1,5 @@
 import React, { useEffect, useState } from "react";
-import {
-  getSellerOrders,
-  getSellerTrend,
-  getSellerModelStats,
-  getSellerExplanation,
-} from "../api";
+import { getSellerDashboard } from "../api";
 import {
   LineChart,
   Line,
@@ -32,22 +27,13 @@ export default function SellerDashboard({ sellerId, marketplaceId, onBack }) {
   useEffect(() => {
     if (!sellerId) return;
 
-    getSellerOrders(sellerId).then((r) => {
-      const data = Array.isArray(r.data) ? r.data : [];
-      setOrders(data);
+    getSellerDashboard(sellerId).then((r) => {
+      const d = r.data || {};
+      setOrders(Array.isArray(d.orders) ? d.orders : []);
+      setTrend(Array.isArray(d.trend) ? d.trend : []);
+      setModelStats(d.model_stats || null);
+      setExplanation(Array.isArray(d.explanation) ? d.explanation : []);
     });
-
-    getSellerTrend(sellerId).then((r) =>
-      setTrend(Array.isArray(r.data) ? r.data : [])
-    );
-
-    getSellerModelStats(sellerId).then((r) =>
-      setModelStats(r.data || null)
-    );
-
-    getSellerExplanation(sellerId).then((r) =>
-      setExplanation(Array.isArray(r.data) ? r.data : [])
-    );
   }, [sellerId]);
 
   // FILTERING